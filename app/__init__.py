@@ -1,14 +1,18 @@
 import os
 import re
+import time
 import uuid
 from datetime import date, datetime, timedelta
+import click
 from flask import Flask, request, abort, redirect, jsonify, url_for, session
 from flask_login import LoginManager, current_user, login_user
 from flask_migrate import Migrate
 from sqlalchemy import func
 
 from .database import db, init_db
+from .read_routing import primary_reads
 from .models import User, Order
+from . import counters, eta, metrics, pooling, query_stats, rollups, snapshot, sql_metrics, sqlite_profile, status, transactions  # importing registers the trigger DDL and flush hooks
 
 login_manager = LoginManager()
 login_manager.login_view = 'auth.login'  # type: ignore
@@ -27,16 +31,40 @@ def create_app():
 
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev')
 
-    db_url = os.getenv('DATABASE_URL', default_db_uri)
-    if db_url.startswith('sqlite:///') and not db_url.startswith('sqlite:////'):
-        rel_path = db_url.replace('sqlite:///', '', 1).lstrip('/\\')
-        abs_path = os.path.join(basedir, rel_path)
-        os.makedirs(os.path.dirname(abs_path), exist_ok=True)
-        db_url = f"sqlite:///{abs_path.replace(os.sep, '/')}"
+    def _sqlite_abs(url):
+        if url.startswith('sqlite:///') and not url.startswith('sqlite:////'):
+            rel_path = url.replace('sqlite:///', '', 1).lstrip('/\\')
+            abs_path = os.path.join(basedir, rel_path)
+            os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+            url = f"sqlite:///{abs_path.replace(os.sep, '/')}"
+        return url
+
+    db_url = _sqlite_abs(os.getenv('DATABASE_URL', default_db_uri))
 
     app.config['SQLALCHEMY_DATABASE_URI'] = db_url
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+    # Connection pools per engine and worker (app/pooling.py)
+    threads = int(os.getenv('GUNICORN_THREADS', '1'))
+    app.config['DB_POOL_SIZE'] = int(os.getenv('DB_POOL_SIZE', str(threads + 2)))
+    app.config['DB_MAX_OVERFLOW'] = int(os.getenv('DB_MAX_OVERFLOW', '5'))
+    app.config['DB_POOL_TIMEOUT'] = int(os.getenv('DB_POOL_TIMEOUT', '30'))
+    app.config['DB_POOL_RECYCLE'] = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+    pre_ping = os.getenv('DB_POOL_PRE_PING')
+    app.config['DB_POOL_PRE_PING'] = None if pre_ping is None else pre_ping.lower() == 'true'
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = pooling.engine_options(db_url, app.config)
+
+    # Cold tier: old DeliveredGoods / ArchivedOrder rows move to a separate
+    # database so the hot one stays small (app/tiering.py, `flask tier-cold`).
+    default_archive_uri = f"sqlite:///{os.path.join(instance_dir, 'archive.db').replace(os.sep, '/')}"
+    archive_url = _sqlite_abs(os.getenv('ARCHIVE_DATABASE_URL', default_archive_uri))
+    app.config['SQLALCHEMY_BINDS'] = {
+        'archive': {'url': archive_url, **pooling.engine_options(archive_url, app.config)},
+    }
+    app.config['COLD_AFTER_DAYS'] = int(os.getenv('COLD_AFTER_DAYS', '365'))
+    app.config['TIERING_BATCH_SIZE'] = int(os.getenv('TIERING_BATCH_SIZE', '1000'))
+    app.config['WAREHOUSE_ARCHIVE_AFTER_DAYS'] = int(os.getenv('WAREHOUSE_ARCHIVE_AFTER_DAYS', '30'))
+
     # Demo flags
     app.config['DEMO_MODE'] = os.getenv('DEMO_MODE', 'false').lower() == 'true'
     app.config['DEMO_READONLY'] = os.getenv('DEMO_READONLY', 'true').lower() == 'true'
@@ -45,8 +73,60 @@ def create_app():
     app.config['AUTO_SEED_ON_EMPTY'] = os.getenv('AUTO_SEED_ON_EMPTY', 'true').lower() == 'true'
     app.config['USE_SEED_BOOT'] = os.getenv('USE_SEED_BOOT', 'true').lower() == 'true'  # prefer seed_boot by default
 
+    # Background order imports (POST /api/v1/imports)
+    app.config['IMPORT_JOBS_INLINE'] = os.getenv('IMPORT_JOBS_INLINE', 'false').lower() == 'true'
+    app.config['IMPORT_CHUNK_SIZE'] = int(os.getenv('IMPORT_CHUNK_SIZE', '1000'))
+    app.config['IMPORT_UPLOAD_DIR'] = os.getenv('IMPORT_UPLOAD_DIR', os.path.join(instance_dir, 'imports'))
+
+    # Daily job (app/status.py): cron runs `flask daily-jobs`; this also runs it from the workers
+    app.config['STATUS_RECOMPUTE_DAILY'] = os.getenv('STATUS_RECOMPUTE_DAILY', 'false').lower() == 'true'
+    app.config['STATUS_BATCH_SIZE'] = int(os.getenv('STATUS_BATCH_SIZE', '1000'))
+
+    # Lead-time percentiles (app/analytics.py): an arrival up to this many days after ETA is on time
+    app.config['ON_TIME_TOLERANCE_DAYS'] = int(os.getenv('ON_TIME_TOLERANCE_DAYS', '0'))
+
+    # ETA predictor (app/eta.py): seconds between checks for a retrained model
+    app.config['ETA_MODEL_TTL'] = int(os.getenv('ETA_MODEL_TTL', '300'))
+
+    # Per-process columnar order snapshot for the list endpoints (app/snapshot.py)
+    app.config['ORDER_SNAPSHOT'] = os.getenv('ORDER_SNAPSHOT', 'false').lower() == 'true'
+    app.config['ORDER_CHANGE_LOG_KEEP'] = int(os.getenv('ORDER_CHANGE_LOG_KEEP', '100000'))
+
+    # SQLite connection pragmas and WAL checkpoints (app/sqlite_profile.py)
+    app.config['SQLITE_PRAGMAS'] = sqlite_profile.parse_pragmas(os.getenv('SQLITE_PRAGMAS'))
+    app.config['SQLITE_CHECKPOINT_SECONDS'] = int(os.getenv('SQLITE_CHECKPOINT_SECONDS', '300'))
+    app.config['_SQLITE_CHECKPOINT_AT'] = time.monotonic()  # first checkpoint one interval after start
+
+    # Write contention (app/transactions.py): retries with jittered backoff, optional per-process writer lock
+    app.config['WRITE_RETRIES'] = int(os.getenv('WRITE_RETRIES', '5'))
+    app.config['WRITE_RETRY_BASE_MS'] = int(os.getenv('WRITE_RETRY_BASE_MS', '50'))
+    app.config['WRITE_RETRY_MAX_MS'] = int(os.getenv('WRITE_RETRY_MAX_MS', '1000'))
+    app.config['SINGLE_WRITER'] = os.getenv('SINGLE_WRITER', 'false').lower() == 'true'
+
+    # Read/write split (app/read_routing.py): GET reads on a read-only engine or replica
+    app.config['DB_READ_ROUTING'] = os.getenv('DB_READ_ROUTING', 'false').lower() == 'true'
+    app.config['READ_DATABASE_URL'] = os.getenv('READ_DATABASE_URL')
+    app.config['READ_YOUR_WRITES_SECONDS'] = float(os.getenv('READ_YOUR_WRITES_SECONDS', '5'))
+
+    # Per-request SQL metrics (app/sql_metrics.py): Server-Timing, sql_metrics log line, slow-query log
+    app.config['SQL_METRICS'] = os.getenv('SQL_METRICS', 'false').lower() == 'true'
+    app.config['SLOW_QUERY_MS'] = float(os.getenv('SLOW_QUERY_MS', '200'))
+    app.config['SQL_METRICS_TOP'] = int(os.getenv('SQL_METRICS_TOP', '3'))
+
+    # Aggregated statement stats across workers (app/query_stats.py), shown at /activity_logs/queries
+    app.config['QUERY_STATS'] = os.getenv('QUERY_STATS', 'false').lower() == 'true'
+    app.config['QUERY_STATS_PATH'] = os.getenv('QUERY_STATS_PATH', os.path.join(instance_dir, 'query_stats.db'))
+    app.config['QUERY_STATS_FLUSH_SECONDS'] = float(os.getenv('QUERY_STATS_FLUSH_SECONDS', '10'))
+    app.config['QUERY_STATS_KEEP_DAYS'] = int(os.getenv('QUERY_STATS_KEEP_DAYS', '7'))
+
+    # Prometheus /metrics (app/metrics.py); multi-worker aggregation via PROMETHEUS_MULTIPROC_DIR
+    app.config['METRICS'] = os.getenv('METRICS', 'false').lower() == 'true'
+
     # Init extensions
     init_db(app)
+    sql_metrics.init_sql_metrics(app)  # first hooks registered: counts every later hook's queries
+    query_stats.init_query_stats(app)
+    metrics.init_metrics(app)
     login_manager.init_app(app)
     Migrate(app, db)
 
@@ -65,6 +145,18 @@ def create_app():
             }), 401
         return redirect(url_for("auth.login"))
 
+    # Writes that stayed locked through every retry: 503 + Retry-After, not a 500 with the driver error
+    @app.errorhandler(transactions.DatabaseBusy)
+    def database_busy(e):
+        if request.path.startswith("/api/"):
+            body = {
+                "error": {"code": "SERVICE_UNAVAILABLE", "message": str(e), "details": []},
+                "trace_id": str(uuid.uuid4())
+            }
+        else:
+            body = {"success": False, "message": str(e)}
+        return jsonify(body), 503, {"Retry-After": "1"}
+
     # Delay importing routes to avoid early context errors
     with app.test_request_context('/'):
         from app.routes import register_routes  # type: ignore
@@ -156,6 +248,15 @@ def create_app():
     def _auto_seed_hook():
         _seed_if_empty_once()
 
+    @app.before_request
+    def _status_recompute_hook():
+        if app.config.get('STATUS_RECOMPUTE_DAILY'):
+            status.recompute_daily(app)
+
+    @app.before_request
+    def _sqlite_checkpoint_hook():
+        sqlite_profile.checkpoint_periodically(app, db)
+
     # ---------------- Auto-login demo user (never downgrade role) ----------------
     AUTO_LOGIN_PATHS = {"/", "/login", "/auth/login", "/dashboard"}
 
@@ -293,6 +394,7 @@ def create_app():
 
     # ---------------- HTTP maintenance endpoints (no blueprint wiring) ----------------
     @app.get("/_admin/seed_if_empty")
+    @primary_reads
     def http_seed_if_empty():
         token = request.args.get("token", "")
         if token != app.config.get("DEMO_RESET_TOKEN", "change-me"):
@@ -304,6 +406,7 @@ def create_app():
         return jsonify({"status": "seeded", "count": n})
 
     @app.get("/_admin/reset_demo")
+    @primary_reads
     def http_reset_demo():
         token = request.args.get("token", "")
         if token != app.config.get("DEMO_RESET_TOKEN", "change-me"):
@@ -313,6 +416,41 @@ def create_app():
         n = _run_seed()
         return jsonify({"status": "reset_ok", "deleted": int(deleted), "seeded": n})
 
+    @app.get("/_admin/tier_cold")
+    @primary_reads
+    def http_tier_cold():
+        token = request.args.get("token", "")
+        if token != app.config.get("DEMO_RESET_TOKEN", "change-me"):
+            abort(403, description="Forbidden: bad token")
+        from .tiering import run_tiering
+        return jsonify({"status": "ok", "moved": run_tiering()})
+
+    @app.get("/_admin/recompute_status")
+    @primary_reads
+    def http_recompute_status():
+        token = request.args.get("token", "")
+        if token != app.config.get("DEMO_RESET_TOKEN", "change-me"):
+            abort(403, description="Forbidden: bad token")
+        return jsonify({"status": "ok", **status.recompute_statuses()})
+
+    @app.get("/_admin/daily_jobs")
+    @primary_reads
+    def http_daily_jobs():
+        token = request.args.get("token", "")
+        if token != app.config.get("DEMO_RESET_TOKEN", "change-me"):
+            abort(403, description="Forbidden: bad token")
+        results = status.run_daily_jobs(force=request.args.get("force") == "1")
+        if results is None:
+            return jsonify({"status": "skipped", "reason": "already run today"})
+        return jsonify({"status": "ok", "steps": results})
+
+    @app.get("/_admin/snapshot_stats")
+    def http_snapshot_stats():
+        token = request.args.get("token", "")
+        if token != app.config.get("DEMO_RESET_TOKEN", "change-me"):
+            abort(403, description="Forbidden: bad token")
+        return jsonify(snapshot.snapshot_stats())
+
     # ---------------- CLI: demo seed/reset/clear ----------------
     @app.cli.command('demo-seed')
     def demo_seed():
@@ -332,4 +470,99 @@ def create_app():
         db.session.commit()
         print(f"✅ Demo cleared. Rows deleted: {cleared}")
 
+    @app.cli.command('tier-cold')
+    @click.option('--days', type=int, default=None, help='Age threshold (default: COLD_AFTER_DAYS).')
+    @click.option('--batch-size', type=int, default=None, help='Rows per batch (default: TIERING_BATCH_SIZE).')
+    @click.option('--vacuum', is_flag=True, help='VACUUM the hot SQLite file afterwards.')
+    def tier_cold_cmd(days, batch_size, vacuum):
+        """Move old delivered goods, archived orders and archived stock to the archive database."""
+        from .tiering import run_tiering, vacuum_hot_database
+        counts = run_tiering(days=days, batch_size=batch_size)
+        print(
+            f"Moved to cold tier: {counts['delivered']} delivered, {counts['archived_orders']} archived orders, "
+            f"{counts['warehouse']} archived warehouse items"
+        )
+        if vacuum and vacuum_hot_database():
+            print("Hot database vacuumed.")
+
+    @app.cli.command('recompute-status')
+    @click.option('--batch-size', type=int, default=None, help='Rows per batch (default: STATUS_BATCH_SIZE).')
+    def recompute_status_cmd(batch_size):
+        """Re-apply the transit timeline rules to every order; writes only changed rows."""
+        counts = status.recompute_statuses(batch_size=batch_size)
+        print(f"Transit status: {counts['updated']} of {counts['scanned']} orders updated")
+
+    @app.cli.command('daily-jobs')
+    @click.option('--force', is_flag=True, help='Run even if today was already claimed.')
+    def daily_jobs_cmd(force):
+        """Status recompute, KPI snapshot, rollup, ETA model and change-log prune; once per day across hosts."""
+        results = status.run_daily_jobs(force=force)
+        if results is None:
+            print("Daily jobs already ran today (use --force to run again).")
+            return
+        for label, result in results.items():
+            print(f"{label}: {result}")
+
+    @app.cli.command('kpi-snapshot')
+    @click.option('--full', is_flag=True, help='Rebuild every day from history (backfill).')
+    def kpi_snapshot_cmd(full):
+        """Refresh kpi_daily from the first day of last month (or fully with --full)."""
+        from .kpi import refresh_kpi, snapshot_kpi
+        rows = refresh_kpi() if full else snapshot_kpi()
+        print(f"KPI snapshot: {rows} day/user rows written")
+
+    @app.cli.command('rebuild-rollups')
+    def rebuild_rollups_cmd():
+        """Re-sync transit lead-time samples from the orders and re-aggregate transit_rollup."""
+        counts = rollups.rebuild_rollup()
+        print(f"Transit rollup rebuilt: {counts['synced']} samples updated, {counts['pruned']} orphans dropped")
+
+    @app.cli.command('sqlite-checkpoint')
+    @click.option('--mode', default='PASSIVE', type=click.Choice(sqlite_profile.CHECKPOINT_MODES, case_sensitive=False),
+                  help='PASSIVE never blocks; TRUNCATE also resets the WAL file to zero bytes.')
+    def sqlite_checkpoint_cmd(mode):
+        """Copy the SQLite write-ahead log back into the database files (wal_checkpoint)."""
+        for bind, result in sqlite_profile.checkpoint_all(db, mode).items():
+            name = bind or 'main'
+            if result is None:
+                print(f"{name}: not in WAL mode")
+            else:
+                print(f"{name}: {result['checkpointed']}/{result['log']} WAL pages checkpointed"
+                      f"{' (busy)' if result['busy'] else ''}")
+
+    @app.cli.command('train-eta-model')
+    def train_eta_model_cmd():
+        """Retrain the ETA predictor (eta_model) from the completed transit samples."""
+        counts = eta.train_eta_model()
+        print(f"ETA model trained: {counts['keys']} keys from {counts['samples']} completed shipments")
+
+    @app.cli.command('check-counters')
+    def check_counters_cmd():
+        """Compare stage_counters with real COUNT(*)s; exit 1 on drift."""
+        drift = counters.check_counters()
+        for d in drift:
+            print(f"user {d['user_id']} {d['stage']}: stored {d['stored']}, actual {d['actual']}")
+        if drift:
+            raise SystemExit(1)
+        print("Stage counters are consistent.")
+
+    @app.cli.command('rebuild-counters')
+    def rebuild_counters_cmd():
+        """Recompute stage_counters from the stage tables (and reinstall its triggers)."""
+        counters.install_triggers(db.session.connection())
+        print(f"Stage counters rebuilt: {counters.rebuild_counters()} rows")
+
+    @app.cli.command('snapshot-triggers')
+    @click.option('--drop', is_flag=True, help='Remove them (after turning ORDER_SNAPSHOT off).')
+    def snapshot_triggers_cmd(drop):
+        """Install or remove the order_change_log triggers behind ORDER_SNAPSHOT."""
+        with db.engine.begin() as connection:
+            if drop:
+                snapshot.drop_triggers(connection)
+                print("Order change-log triggers removed.")
+            elif snapshot.install_triggers(connection):
+                print("Order change-log triggers installed.")
+            else:
+                print(f"No change-log triggers for {connection.dialect.name}.")
+
     return app
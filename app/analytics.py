@@ -0,0 +1,141 @@
+# app/analytics.py
+"""
+Lead-time percentiles, ETA slippage and on-time rates for the analytics page.
+
+The source is the per-shipment ledger of app/rollups.py (TransitSample), not
+the stage tables: stocking or delivering an order deletes its Order row,
+WarehouseStock carries no ETD/ETA, and ArchivedOrder holds only the orders
+delivered straight from transit (which still have their sample). One query
+pulls the six needed columns; they become typed NumPy arrays and every
+statistic is computed per group without a Python loop over rows:
+
+  lead      days from ETD to ATA (or to ETA until arrival): n, mean, p50/p90/p95
+  slippage  ATA - ETA in days, arrived shipments with an ETA only: p50/p90/p95,
+            on-time rate (slippage <= ON_TIME_TOLERANCE_DAYS) and a histogram
+
+grouped by transport, buyer or ETD month. Results are cached per process and
+per data version: the sample count plus the newest synced_at (indexed), so
+any write, prune or rebuild of the ledger invalidates them.
+"""
+from itertools import pairwise
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import func, select
+
+from app.database import db
+from app.metrics import cache_lookup
+from app.models import TransitSample
+
+GROUPS = ('transport', 'buyer', 'month')
+PERCENTILES = (50, 90, 95)
+
+# Upper bounds (days late, inclusive) of the slippage histogram buckets; the last bucket is open-ended
+SLIP_EDGES = (-7, -3, 0, 3, 7, 14, 30)
+SLIP_LABELS = (f"<={SLIP_EDGES[0]}",) + tuple(
+    f"{lo + 1} to {hi}" for lo, hi in pairwise(SLIP_EDGES)
+) + (f">{SLIP_EDGES[-1]}",)
+
+_cache: Dict[tuple, Tuple[tuple, dict]] = {}
+
+
+def data_version() -> tuple:
+    """(sample count, newest synced_at): changes whenever the ledger does."""
+    n, newest = db.session.execute(
+        select(func.count(), func.max(TransitSample.synced_at)).select_from(TransitSample)
+    ).one()
+    return n, newest
+
+
+def _load() -> Dict[str, np.ndarray]:
+    rows = db.session.execute(select(
+        TransitSample.transport, TransitSample.buyer, TransitSample.month,
+        TransitSample.days, TransitSample.eta, TransitSample.ata,
+    )).all()
+    transport, buyer, month, days, eta, ata = zip(*rows) if rows else ((),) * 6
+    slip = np.array(ata, dtype='datetime64[D]') - np.array(eta, dtype='datetime64[D]')
+    return {
+        'transport': np.array(transport, dtype=str),
+        'buyer': np.array([b or '' for b in buyer], dtype=str),
+        'month': np.array(month, dtype=str),
+        'lead': np.array(days, dtype=np.float64),
+        # NaT (no ETA or not arrived) becomes NaN
+        'slip': np.where(np.isnat(slip), np.nan, slip.astype(np.int64)).astype(np.float64),
+    }
+
+
+def _grouped_percentiles(group: np.ndarray, values: np.ndarray, n_groups: int) -> np.ndarray:
+    """
+    PERCENTILES of `values` per group (linear interpolation, as np.percentile),
+    shape (n_groups, len(PERCENTILES)); NaN for empty groups. One lexsort
+    orders the values inside each group; the rank positions are then indexed
+    for all groups at once.
+    """
+    order = np.lexsort((values, group))
+    ordered = values[order]
+    counts = np.bincount(group, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    out = np.full((n_groups, len(PERCENTILES)), np.nan)
+    has = counts > 0
+    pos = starts[has, None] + (counts[has, None] - 1) * (np.array(PERCENTILES) / 100.0)
+    lo, hi = np.floor(pos).astype(np.int64), np.ceil(pos).astype(np.int64)
+    out[has] = ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+    return out
+
+
+def _round(value) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 2)
+
+
+def _compute(group_by: str, tolerance: int) -> dict:
+    cols = _load()
+    keys, group = np.unique(cols[group_by], return_inverse=True)
+    n_groups = keys.size
+    lead, slip = cols['lead'], cols['slip']
+
+    n = np.bincount(group, minlength=n_groups)
+    lead_mean = np.bincount(group, weights=lead, minlength=n_groups) / np.maximum(n, 1)
+    lead_pct = _grouped_percentiles(group, lead, n_groups)
+
+    arrived = ~np.isnan(slip)
+    a_group, a_slip = group[arrived], slip[arrived]
+    a_n = np.bincount(a_group, minlength=n_groups)
+    on_time = np.bincount(a_group, weights=(a_slip <= tolerance), minlength=n_groups)
+    slip_mean = np.bincount(a_group, weights=a_slip, minlength=n_groups) / np.maximum(a_n, 1)
+    slip_pct = _grouped_percentiles(a_group, a_slip, n_groups)
+    bucket = np.searchsorted(SLIP_EDGES, a_slip, side='left')
+    hist = np.bincount(a_group * len(SLIP_LABELS) + bucket,
+                       minlength=n_groups * len(SLIP_LABELS)).reshape(n_groups, len(SLIP_LABELS))
+
+    groups = []
+    for i, key in enumerate(keys.tolist()):
+        pct = dict(zip((f"p{p}" for p in PERCENTILES), lead_pct[i]))
+        slip_stats = dict(zip((f"p{p}" for p in PERCENTILES), slip_pct[i]))
+        groups.append({
+            'key': key or None,
+            'lead': {'n': int(n[i]), 'mean': _round(lead_mean[i]), **{k: _round(v) for k, v in pct.items()}},
+            'slippage': {
+                'n': int(a_n[i]),
+                'mean': _round(slip_mean[i]) if a_n[i] else None,
+                **{k: _round(v) for k, v in slip_stats.items()},
+                'on_time_rate': round(float(on_time[i] / a_n[i]), 4) if a_n[i] else None,
+                'histogram': [{'days': label, 'n': int(c)} for label, c in zip(SLIP_LABELS, hist[i])],
+            },
+        })
+    return {'group_by': group_by, 'tolerance_days': tolerance, 'groups': groups}
+
+
+def lead_time_stats(group_by: str = 'transport') -> dict:
+    """Lead-time and slippage statistics per `group_by` (one of GROUPS), cached per data version."""
+    if group_by not in GROUPS:
+        raise ValueError(f"group_by must be one of {', '.join(GROUPS)}")
+    tolerance = current_app.config.get('ON_TIME_TOLERANCE_DAYS', 0)
+    key, version = (group_by, tolerance), data_version()
+    hit = _cache.get(key)
+    cache_lookup('analytics', bool(hit and hit[0] == version))
+    if hit and hit[0] == version:
+        return hit[1]
+    result = _compute(group_by, tolerance)
+    _cache[key] = (version, result)
+    return result
@@ -2,4 +2,4 @@ from flask import Blueprint
 
 api_v1_bp = Blueprint("api_v1", __name__)
 
-from . import orders, auth  # noqa: E402,F401
+from . import orders, auth, export, imports, bulk, shipments, kpi, eta  # noqa: E402,F401
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+from flask import current_app, request
+from flask_login import current_user, login_required
+
+from app import lifecycle
+from app.database import db
+from app.transactions import DatabaseBusy, run_in_transaction
+from app.utils.logging import log_activity
+
+from . import api_v1_bp
+from .errors import fail, ok
+
+
+def _parse_ids(payload: Dict[str, Any], details: List[Dict[str, Any]]) -> Optional[List[int]]:
+    ids = payload.get("ids")
+    if not isinstance(ids, list) or not ids:
+        details.append({"field": "ids", "issue": "Must be a non-empty list of integers."})
+        return None
+    if len(ids) > lifecycle.MAX_BATCH:
+        details.append({"field": "ids", "issue": f"At most {lifecycle.MAX_BATCH} ids per request."})
+        return None
+    if not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        details.append({"field": "ids", "issue": "Must be a non-empty list of integers."})
+        return None
+    return ids
+
+
+def _parse_quantities(payload: Dict[str, Any], details: List[Dict[str, Any]]) -> Optional[Dict[int, Any]]:
+    items = payload.get("items")
+    if not isinstance(items, list) or not items:
+        details.append({"field": "items", "issue": "Must be a non-empty list of {id, quantity}."})
+        return None
+    if len(items) > lifecycle.MAX_BATCH:
+        details.append({"field": "items", "issue": f"At most {lifecycle.MAX_BATCH} items per request."})
+        return None
+    quantities: Dict[int, Any] = {}
+    for n, item in enumerate(items):
+        item_id = item.get("id") if isinstance(item, dict) else None
+        if not isinstance(item_id, int) or isinstance(item_id, bool) or "quantity" not in item:
+            details.append({"field": f"items[{n}]", "issue": "Must be an object with integer id and quantity."})
+            return None
+        if item_id in quantities:
+            details.append({"field": f"items[{n}]", "issue": f"Duplicate id {item_id}."})
+            return None
+        quantities[item_id] = item["quantity"]
+    return quantities
+
+
+def _run_bulk(action: str, transition, parse):
+    """
+    Shared handler: validate the payload, run the transition and one activity
+    log entry in a single transaction, and report the outcome per item.
+    """
+    if current_app.config.get("DEMO_MODE") and current_app.config.get("DEMO_READONLY"):
+        return fail("FORBIDDEN", "Demo is read-only. Changes are disabled.", status=403)
+
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return fail("VALIDATION_ERROR", "Expected a JSON object body.")
+    details: List[Dict[str, Any]] = []
+    arg = parse(payload, details)
+    if arg is None:
+        return fail("VALIDATION_ERROR", "Invalid request body.", details=details)
+
+    def work():
+        results = transition(arg, current_user)
+        done = [i for i, (status, _) in results.items() if status == lifecycle.OK]
+        if done:
+            log_activity(action, f"{len(done)} item(s): {', '.join(map(str, done))}", commit=False)
+        return results, done
+
+    try:
+        results, done = run_in_transaction(work)
+    except DatabaseBusy:
+        raise
+    except Exception as e:  # noqa: BLE001 - any failure still answers with the JSON error envelope
+        db.session.rollback()
+        current_app.logger.error(f"Bulk {action} failed: {e}")
+        return fail("INTERNAL_ERROR", "Bulk operation failed; nothing was changed.", status=500)
+
+    counts: Dict[str, int] = {}
+    for status, _ in results.values():
+        counts[status] = counts.get(status, 0) + 1
+    data = [{"id": i, "status": status, "message": message} for i, (status, message) in results.items()]
+    return ok(data, meta={"requested": len(results), "succeeded": len(done), "by_status": counts})
+
+
+@api_v1_bp.route("/orders/bulk/stock", methods=["POST"])
+@login_required
+def bulk_stock_orders():
+    """Move orders to the warehouse. Body: {"ids": [...]}."""
+    return _run_bulk("Bulk Stock Orders", lifecycle.stock_orders, _parse_ids)
+
+
+@api_v1_bp.route("/orders/bulk/deliver", methods=["POST"])
+@login_required
+def bulk_deliver_orders():
+    """Deliver orders directly from transit. Body: {"ids": [...]}."""
+    return _run_bulk("Bulk Deliver Orders", lifecycle.deliver_orders, _parse_ids)
+
+
+@api_v1_bp.route("/warehouse/bulk/deliver", methods=["POST"])
+@login_required
+def bulk_deliver_warehouse():
+    """Deliver (part of) warehouse items. Body: {"items": [{"id": 1, "quantity": 5}, ...]}."""
+    return _run_bulk("Bulk Deliver Warehouse", lifecycle.deliver_from_warehouse, _parse_quantities)
+
+
+@api_v1_bp.route("/warehouse/bulk/restore", methods=["POST"])
+@login_required
+def bulk_restore_warehouse():
+    """Move warehouse items back to the dashboard. Body: {"ids": [...]}."""
+    return _run_bulk("Bulk Restore Warehouse", lifecycle.restore_warehouse, _parse_ids)
+
+
+@api_v1_bp.route("/delivered/bulk/restore", methods=["POST"])
+@login_required
+def bulk_restore_delivered():
+    """Move delivered items back to the dashboard. Body: {"ids": [...]}."""
+    return _run_bulk("Bulk Restore Delivered", lifecycle.restore_delivered, _parse_ids)
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from flask import request
+from flask_login import login_required
+
+from app.eta import estimate_for
+from app.lifecycle import MAX_BATCH
+from app.models import Order
+from app.scoped_query import ScopedQuery
+
+from . import api_v1_bp
+from .errors import fail, ok
+
+
+@api_v1_bp.route("/orders/<int:order_id>/eta_estimate", methods=["GET"])
+@login_required
+def order_eta_estimate(order_id: int):
+    """ETD + transit days predicted from completed shipments like this one (app/eta.py)."""
+    order = ScopedQuery.for_viewer(Order).where(lambda s: s.where(Order.id == order_id)).first()
+    if order is None:
+        return fail("NOT_FOUND", "Order not found.", status=404)
+    return ok(estimate_for(order))
+
+
+@api_v1_bp.route("/orders/eta_estimates", methods=["GET"])
+@login_required
+def order_eta_estimates():
+    """Estimates for ?ids=1,2,3 (the dashboard's visible page); unknown or foreign ids are left out."""
+    raw = [part.strip() for part in (request.args.get("ids") or "").split(",") if part.strip()]
+    if not raw or not all(part.isdigit() for part in raw):
+        return fail("VALIDATION_ERROR", "Invalid query parameters.",
+                    details=[{"field": "ids", "issue": "Must be a comma-separated list of integers."}])
+    if len(raw) > MAX_BATCH:
+        return fail("VALIDATION_ERROR", "Invalid query parameters.",
+                    details=[{"field": "ids", "issue": f"At most {MAX_BATCH} ids per request."}])
+
+    ids = sorted({int(part) for part in raw})
+    orders = ScopedQuery.for_viewer(Order) \
+        .where(lambda s: s.where(Order.id.in_(ids))) \
+        .order_by(lambda s: s.order_by(Order.id)) \
+        .all()
+    return ok([estimate_for(o) for o in orders], meta={"total": len(orders)})
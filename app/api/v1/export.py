@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+import zlib
+from typing import Iterable, Iterator
+
+from flask import Response, request, stream_with_context
+from flask_login import login_required
+
+from app.database import db
+from app.models import Order
+from app.scoped_query import ScopedQuery
+
+from . import api_v1_bp
+from .errors import fail
+from .orders import (
+    apply_order_filters,
+    apply_sql_sort,
+    apply_year_filter,
+    validate_query_params,
+)
+from .schemas import ORDER_COLUMNS, ORDER_FIELDS, serialize_order_row
+
+_EXPORT_TOP_LEVEL_PARAMS = {"sort", "format", "gzip"}  # plus filter[...] keys
+_EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+_BOOL_VALUES = {"1": True, "true": True, "0": False, "false": False}
+
+# Rows fetched per round trip from the server-side cursor. Memory stays
+# bounded by this, not by the size of the result.
+_EXPORT_YIELD_PER = 1000
+
+
+def _ndjson_chunks(partitions: Iterable) -> Iterator[bytes]:
+    for rows in partitions:
+        yield "".join(json.dumps(serialize_order_row(r), default=str) + "\n" for r in rows).encode("utf-8")
+
+
+def _csv_chunks(partitions: Iterable) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(ORDER_FIELDS)
+    for rows in partitions:
+        for r in rows:
+            item = serialize_order_row(r)
+            writer.writerow([item[c] for c in ORDER_FIELDS])
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    tail = buf.getvalue()
+    if tail:
+        yield tail.encode("utf-8")
+
+
+def _gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    z = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        out = z.compress(chunk)
+        if out:
+            yield out
+    yield z.flush()
+
+
+@api_v1_bp.route("/orders/export", methods=["GET"])
+@login_required
+def export_orders():
+    """
+    Stream every matching order as NDJSON or CSV.
+
+    Takes the same filter[...] and sort params as GET /orders (no paging).
+    Rows come from a server-side cursor in chunks of _EXPORT_YIELD_PER and
+    are written straight to the response, so memory does not grow with the
+    number of rows. `gzip=1` compresses the stream on the fly.
+    """
+    _, _, sort_items, filters, err = validate_query_params(_EXPORT_TOP_LEVEL_PARAMS)
+    if err:
+        code, details = err
+        return fail(code, "Invalid query parameters.", details=details, status=400)
+
+    fmt = (request.args.get("format") or "ndjson").strip().lower()
+    gzip_raw = (request.args.get("gzip") or "0").strip().lower()
+    details = []
+    if fmt not in _EXPORT_FORMATS:
+        details.append({"field": "format", "issue": f"Unsupported format. Allowed: {sorted(_EXPORT_FORMATS)}"})
+    if gzip_raw not in _BOOL_VALUES:
+        details.append({"field": "gzip", "issue": "Must be one of 1, 0, true, false."})
+    if details:
+        return fail("VALIDATION_ERROR", "Invalid query parameters.", details=details, status=400)
+    use_gzip = _BOOL_VALUES[gzip_raw]
+
+    q = apply_order_filters(ScopedQuery.for_viewer(Order), filters)
+    apply_sql_sort(apply_year_filter(q, filters["year"]), sort_items)
+    stmt = q.select(*ORDER_COLUMNS)
+
+    def generate():
+        result = db.session.execute(stmt.execution_options(yield_per=_EXPORT_YIELD_PER))
+        try:
+            partitions = result.partitions()
+            chunks = _ndjson_chunks(partitions) if fmt == "ndjson" else _csv_chunks(partitions)
+            yield from (_gzip_chunks(chunks) if use_gzip else chunks)
+        finally:
+            result.close()
+
+    filename = f"orders.{fmt}"
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Cache-Control": "no-store",
+        "X-Accel-Buffering": "no",  # let nginx/Render proxies pass chunks through
+    }
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+
+    # No Content-Length -> chunked transfer encoding.
+    return Response(stream_with_context(generate()), mimetype=_EXPORT_FORMATS[fmt], headers=headers)
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import json
+import os
+import uuid
+
+from flask import current_app, request
+from flask_login import current_user, login_required
+from werkzeug.utils import secure_filename
+
+from app.database import db
+from app.models import ImportJob
+from app.read_routing import primary_reads
+from app.roles import can_edit, can_view_all
+from app.utils.import_jobs import is_stale, start_job
+from app.utils.order_import import count_source_rows
+
+from . import api_v1_bp
+from .errors import fail, ok
+
+_ALLOWED_IMPORT_EXTENSIONS = {".csv", ".xlsx"}
+
+
+def serialize_job(job: ImportJob) -> dict:
+    total = job.total_rows
+    progress = None
+    if total:
+        progress = round(min(job.processed_rows / total, 1.0) * 100, 1)
+    elif job.status == "done":
+        progress = 100.0
+    return {
+        "id": job.id,
+        "filename": job.filename,
+        "status": job.status,
+        "total_rows": total,
+        "processed_rows": job.processed_rows,
+        "progress_pct": progress,
+        "inserted": job.inserted,
+        "updated": job.updated,
+        "unchanged": job.unchanged,
+        "rejected": job.rejected,
+        "errors": json.loads(job.errors or "[]"),
+        "message": job.message or "",
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def _get_visible_job(job_id: int):
+    job = db.session.get(ImportJob, job_id)
+    if job is None or (not can_view_all(current_user.role) and job.user_id != current_user.id):
+        return None
+    return job
+
+
+@api_v1_bp.route("/imports", methods=["POST"])
+@login_required
+def create_import():
+    """
+    Upload a .csv/.xlsx of orders and import it in the background.
+
+    Rows are upserted into the caller's orders by order_number; rows whose
+    content hash is unchanged are skipped. Returns 202 with the job; poll
+    GET /imports/<id> for progress.
+    """
+    if current_app.config.get("DEMO_MODE") and current_app.config.get("DEMO_READONLY"):
+        return fail("FORBIDDEN", "Demo is read-only. Changes are disabled.", status=403)
+    if not can_edit(current_user.role):
+        return fail("FORBIDDEN", "Your role cannot import orders.", status=403)
+
+    upload = request.files.get("file")
+    if upload is None or not upload.filename:
+        return fail("VALIDATION_ERROR", "Missing upload.", details=[{"field": "file", "issue": "Required."}])
+    ext = os.path.splitext(upload.filename)[1].lower()
+    if ext not in _ALLOWED_IMPORT_EXTENSIONS:
+        return fail(
+            "VALIDATION_ERROR", "Unsupported file type.",
+            details=[{"field": "file", "issue": f"Allowed: {sorted(_ALLOWED_IMPORT_EXTENSIONS)}"}],
+        )
+
+    import_dir = current_app.config["IMPORT_UPLOAD_DIR"]
+    os.makedirs(import_dir, exist_ok=True)
+    stored_path = os.path.join(import_dir, f"{uuid.uuid4().hex}{ext}")
+    upload.save(stored_path)
+
+    job = ImportJob(
+        user_id=current_user.id,
+        filename=secure_filename(upload.filename) or f"upload{ext}",
+        stored_path=stored_path,
+        status="queued",
+        total_rows=count_source_rows(stored_path),
+    )
+    db.session.add(job)
+    db.session.commit()
+
+    start_job(current_app._get_current_object(), job.id)
+    db.session.refresh(job)
+
+    body, _ = ok(serialize_job(job))
+    return body, 202
+
+
+@api_v1_bp.route("/imports/<int:job_id>", methods=["GET"])
+@login_required
+@primary_reads
+def get_import(job_id: int):
+    """Job progress and errors. A job whose worker died is resumed from its last committed chunk."""
+    job = _get_visible_job(job_id)
+    if job is None:
+        return fail("NOT_FOUND", "Import job not found.", status=404)
+
+    if is_stale(job):
+        start_job(current_app._get_current_object(), job.id)
+        db.session.refresh(job)
+
+    return ok(serialize_job(job))
+
+
+@api_v1_bp.route("/imports/<int:job_id>/resume", methods=["POST"])
+@login_required
+def resume_import(job_id: int):
+    """Explicitly resume a failed or stalled job from its last committed chunk."""
+    job = _get_visible_job(job_id)
+    if job is None:
+        return fail("NOT_FOUND", "Import job not found.", status=404)
+    if job.status == "done":
+        return fail("CONFLICT", "Import job already finished.", status=409)
+    if not os.path.exists(job.stored_path):
+        return fail("GONE", "Uploaded file is no longer available.", status=410)
+
+    if job.status == "failed":
+        job.status = "queued"
+        job.message = None
+        job.finished_at = None
+        db.session.commit()
+
+    start_job(current_app._get_current_object(), job.id)
+    db.session.refresh(job)
+    body, _ = ok(serialize_job(job))
+    return body, 202
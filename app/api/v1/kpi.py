@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from datetime import date, timedelta
+
+from flask import request
+from flask_login import current_user, login_required
+
+from app.kpi import kpi_history
+from app.roles import can_view_all
+
+from . import api_v1_bp
+from .errors import fail, ok
+
+_BUCKETS = ("day", "week", "month")
+MAX_HISTORY_DAYS = 366 * 5
+
+
+def _iso_arg(name: str, default: date, details: list) -> date:
+    raw = (request.args.get(name) or "").strip()
+    if not raw:
+        return default
+    try:
+        return date.fromisoformat(raw)
+    except ValueError:
+        details.append({"field": name, "issue": "Must be a date (YYYY-MM-DD)."})
+        return default
+
+
+@api_v1_bp.route("/kpi/history", methods=["GET"])
+@login_required
+def kpi_history_view():
+    """KPI events per day/week/month from the daily snapshot table (O(days), not O(rows))."""
+    details: list = []
+    end = _iso_arg("to", date.today(), details)
+    start = _iso_arg("from", end - timedelta(days=365), details)
+    bucket = request.args.get("bucket") or "month"
+    if bucket not in _BUCKETS:
+        details.append({"field": "bucket", "issue": f"Must be one of {list(_BUCKETS)}."})
+    if not details and start > end:
+        details.append({"field": "from", "issue": "Must not be after 'to'."})
+    if not details and (end - start).days > MAX_HISTORY_DAYS:
+        details.append({"field": "from", "issue": f"Range is limited to {MAX_HISTORY_DAYS} days."})
+    if details:
+        return fail("VALIDATION_ERROR", "Invalid query parameters.", details=details)
+
+    scope = None if can_view_all(current_user.role) else current_user.id
+    data = kpi_history(start, end, bucket, scope)
+    return ok(data, meta={"from": start.isoformat(), "to": end.isoformat(), "bucket": bucket})
@@ -1,43 +1,23 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from datetime import date, datetime
-from typing import List, Optional, Tuple, Dict, Any
+from datetime import date
+from typing import List, Optional, Set, Tuple, Dict, Any
 
 from flask import request
 from flask_login import current_user, login_required
+from sqlalchemy import func, or_, select, true
 
+from app.database import db
 from app.models import Order
 from app.roles import can_view_all
+from app.scoped_query import ScopedQuery
+from app.snapshot import order_view
+from app.utils.dates import sql_iso_date, sql_year
 
 from . import api_v1_bp
 from .errors import ok, fail
-from .schemas import serialize_order
-
-
-# Accept mixed legacy formats, but emit consistent ISO for true date fields.
-_INPUT_DATE_FORMATS: Tuple[str, ...] = ("%Y-%m-%d", "%d.%m.%y", "%d.%m.%Y", "%d/%m/%Y")
-
-
-def parse_date(value: Optional[str]) -> Optional[date]:
-    """Parse known date string formats into date. Returns None if empty/unparseable."""
-    if not value:
-        return None
-    s = value.strip()
-    if not s:
-        return None
-    for fmt in _INPUT_DATE_FORMATS:
-        try:
-            return datetime.strptime(s, fmt).date()
-        except ValueError:
-            continue
-    return None
-
-
-def to_iso(value: Optional[str]) -> str:
-    """Normalize any supported date string to ISO (YYYY-MM-DD). Blank if missing/unparseable."""
-    d = parse_date(value)
-    return d.isoformat() if d else ""
+from .schemas import ORDER_COLUMNS, parse_date, serialize_order_row
 
 
 def get_sort_date(o: Order, field: str) -> date:
@@ -69,6 +49,9 @@ _ALLOWED_FILTER_KEYS = {
 
 _ALLOWED_TOP_LEVEL_PARAMS = {"page", "per_page", "sort"}  # plus filter[...] keys
 
+# filter[...] keys that are plain column equality (see apply_order_filters)
+_EQUALITY_FILTERS = ("transit_status", "transport", "buyer", "responsible")
+
 
 def _err(details: List[Dict[str, Any]], field: str, issue: str):
     details.append({"field": field, "issue": issue})
@@ -88,13 +71,18 @@ def parse_int_strict(raw: Optional[str], field: str, details: List[Dict[str, Any
         return None
 
 
-def validate_query_params() -> Tuple[Optional[int], Optional[int], List[SortItem], Dict[str, Any], Optional[Tuple[str, Any]]]:
+def validate_query_params(
+    allowed_top_level: Set[str] = _ALLOWED_TOP_LEVEL_PARAMS,
+) -> Tuple[Optional[int], Optional[int], List[SortItem], Dict[str, Any], Optional[Tuple[str, Any]]]:
     """
     Validates and parses:
     - page, per_page
     - sort
     - filter[...] keys
 
+    `allowed_top_level` lets other endpoints (e.g. export) reuse the same
+    filter/sort contract with their own top-level params.
+
     Returns:
     (page, per_page, sort_items, filters_dict, error_tuple)
     where error_tuple is ("VALIDATION_ERROR", details) if invalid.
@@ -103,7 +91,7 @@ def validate_query_params() -> Tuple[Optional[int], Optional[int], List[SortItem
 
     # ---- Reject unknown params early ----
     for key in request.args.keys():
-        if key in _ALLOWED_TOP_LEVEL_PARAMS:
+        if key in allowed_top_level:
             continue
         if key.startswith("filter[") and key.endswith("]"):
             filter_key = key[len("filter["):-1]
@@ -246,67 +234,116 @@ def apply_python_sort(rows: List[Order], sort_items: List[SortItem]) -> List[Ord
     return rows
 
 
-@api_v1_bp.route("/orders", methods=["GET"])
-@login_required
-def list_orders():
-    page, per_page, sort_items, filters, err = validate_query_params()
-    if err:
-        code, details = err
-        return fail(code, "Invalid query parameters.", details=details, status=400)
-
-    # -------------------------
-    # Base query + RBAC scope
-    # -------------------------
-    q = Order.query
-    if not can_view_all(current_user.role):
-        q = q.filter(Order.user_id == current_user.id)
-
-    if filters["transit_status"]:
-        q = q.filter(Order.transit_status == filters["transit_status"])
+def apply_order_filters(q: ScopedQuery, filters: Dict[str, Any]) -> ScopedQuery:
+    """Add the validated equality/search filters to an Order ScopedQuery."""
+    status, transport = filters["transit_status"], filters["transport"]
+    buyer, responsible = filters["buyer"], filters["responsible"]
+    if status:
+        q.where(lambda s: s.where(Order.transit_status == status))
 
-    if filters["transport"]:
-        q = q.filter(Order.transport == filters["transport"])
+    if transport:
+        q.where(lambda s: s.where(Order.transport == transport))
 
-    if filters["buyer"]:
-        q = q.filter(Order.buyer == filters["buyer"])
+    if buyer:
+        q.where(lambda s: s.where(Order.buyer == buyer))
 
-    if filters["responsible"]:
-        q = q.filter(Order.responsible == filters["responsible"])
+    if responsible:
+        q.where(lambda s: s.where(Order.responsible == responsible))
 
     if filters["q"]:
         like = f"%{filters['q'].strip()}%"
-        q = q.filter(
+        q.where(lambda s: s.where(
             Order.order_number.ilike(like) |
             Order.product_name.ilike(like) |
             Order.buyer.ilike(like) |
             Order.responsible.ilike(like)
-        )
-
-    # Pull rows (dates stored as strings -> Python sort & year check)
-    rows = q.all()
+        ))
+    return q
+
+
+def apply_year_filter(q: ScopedQuery, year: Optional[int]) -> ScopedQuery:
+    """SQL twin of order_matches_year(): ANY of the date fields falls in `year` (no-op without a year)."""
+    if year:
+        year_s = str(year)
+        q.where(lambda s: s.where(or_(
+            sql_year(Order.order_date) == year_s, sql_year(Order.etd) == year_s,
+            sql_year(Order.eta) == year_s, sql_year(Order.ata) == year_s,
+        )))
+    return q
+
+
+def apply_sql_sort(q: ScopedQuery, sort_items: List[SortItem]) -> ScopedQuery:
+    """Add sql_order_by(sort_items) to an Order ScopedQuery, one cached step per sort key."""
+    for clause in sql_order_by(sort_items):
+        q.order_by(_order_step(clause))
+    return q
+
+
+def _order_step(clause):
+    # A function scope per clause: a lambda in the loop would late-bind `clause`.
+    return lambda s: s.order_by(clause)
+
+
+def sql_order_by(sort_items: List[SortItem]):
+    """SQL twin of apply_python_sort(): dates compare as ISO text, strings case-insensitively."""
+    clauses = []
+    for item in sort_items:
+        col = getattr(Order, item.field)
+        if item.field == "id":
+            expr = col
+        elif item.field in {"eta", "etd", "ata", "order_date"}:
+            expr = sql_iso_date(col)
+        else:
+            expr = func.lower(func.coalesce(col, ""))
+        clauses.append(expr.desc() if item.direction == "desc" else expr.asc())
+    return clauses
 
-    # Year filter (ANY date matches: legacy semantics)
-    if filters["year"]:
-        rows = [o for o in rows if order_matches_year(o, filters["year"])]
 
-    # Stable multi-sort
-    rows = apply_python_sort(rows, sort_items)
+@api_v1_bp.route("/orders", methods=["GET"])
+@login_required
+def list_orders():
+    page, per_page, sort_items, filters, err = validate_query_params()
+    if err:
+        code, details = err
+        return fail(code, "Invalid query parameters.", details=details, status=400)
 
-    # Pagination slice
-    total = len(rows)
     start = (page - 1) * per_page
     end = start + per_page
-    page_items = rows[start:end]
+    scope = None if can_view_all(current_user.role) else current_user.id
+
+    # Columnar snapshot (ORDER_SNAPSHOT): filter/sort/count on arrays, load only the page.
+    # Free-text search (filter[q]) still goes through the query below.
+    view = order_view() if not filters["q"] else None
+    if view is not None:
+        positions = view.select(scope, filters["year"], {k: filters[k] for k in _EQUALITY_FILTERS})
+        ids = view.ordered_ids(positions, [(s.field, s.direction) for s in sort_items])
+        total = int(ids.size)
+        page_ids = ids[start:end].tolist()
+        rows = db.session.execute(select(*ORDER_COLUMNS).where(Order.id.in_(page_ids))).all() if page_ids else []
+        by_id = {r.id: r for r in rows}
+        page_items = [by_id[i] for i in page_ids if i in by_id]
+    else:
+        # -------------------------
+        # Base query + RBAC scope
+        # -------------------------
+        q = apply_order_filters(ScopedQuery(Order, scope), filters).project(*ORDER_COLUMNS)
 
-    # Normalize true date fields to ISO for React safety.
-    # NOTE: required_delivery is intentionally NOT normalized (often free text).
-    data = []
-    for o in page_items:
-        item = serialize_order(o)
-        for fld in ("order_date", "payment_date", "etd", "eta", "ata"):
-            if fld in item:
-                item[fld] = to_iso(item.get(fld))
-        data.append(item)
+        # Pull rows (dates stored as strings -> Python sort & year check)
+        rows = q.all()
+
+        # Year filter (ANY date matches: legacy semantics)
+        if filters["year"]:
+            rows = [o for o in rows if order_matches_year(o, filters["year"])]
+
+        # Stable multi-sort
+        rows = apply_python_sort(rows, sort_items)
+
+        # Pagination slice
+        total = len(rows)
+        page_items = rows[start:end]
+
+    # Rows, not entities; true date fields come out as ISO for React safety.
+    data = [serialize_order_row(r) for r in page_items]
 
     return ok(
         data=data,
@@ -325,3 +362,29 @@ def list_orders():
             },
         },
     )
+
+
+@api_v1_bp.route("/orders/delayed", methods=["GET"])
+@login_required
+def list_delayed_orders():
+    """Orders whose ETA has passed without an ATA, most overdue first (reads ix_order_delayed)."""
+    page, per_page, _, filters, err = validate_query_params(allowed_top_level={"page", "per_page"})
+    if err:
+        code, details = err
+        return fail(code, "Invalid query parameters.", details=details, status=400)
+
+    q = ScopedQuery.for_viewer(Order).where(lambda s: s.where(Order.is_delayed == true()))
+    apply_year_filter(apply_order_filters(q, filters), filters["year"])
+
+    total = q.count()
+    rows = q.order_by(lambda s: s.order_by(Order.delay_days.desc(), Order.id.desc())) \
+        .project(*ORDER_COLUMNS, Order.delay_days) \
+        .page((page - 1) * per_page, per_page)
+
+    data = []
+    for r in rows:
+        item = serialize_order_row(r)
+        item["delay_days"] = r.delay_days
+        data.append(item)
+
+    return ok(data=data, meta={"page": page, "per_page": per_page, "total": total})
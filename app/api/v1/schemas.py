@@ -1,18 +1,55 @@
-def serialize_order(o):
-    return {
-        "id": o.id,
-        "order_date": o.order_date or "",
-        "order_number": o.order_number,
-        "product_name": o.product_name,
-        "buyer": o.buyer,
-        "responsible": o.responsible,
-        "quantity": o.quantity,
-        "required_delivery": o.required_delivery or "",
-        "terms_of_delivery": o.terms_of_delivery or "",
-        "payment_date": o.payment_date or "",
-        "etd": o.etd or "",
-        "eta": o.eta or "",
-        "ata": o.ata or "",
-        "transit_status": o.transit_status,
-        "transport": o.transport,
-    }
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from app.models import Order
+
+# Accept mixed legacy formats, but emit consistent ISO for true date fields.
+_INPUT_DATE_FORMATS: Tuple[str, ...] = ("%Y-%m-%d", "%d.%m.%y", "%d.%m.%Y", "%d/%m/%Y")
+
+
+def parse_date(value: Optional[str]) -> Optional[date]:
+    """Parse known date string formats into date. Returns None if empty/unparseable."""
+    if not value:
+        return None
+    s = value.strip()
+    if not s:
+        return None
+    for fmt in _INPUT_DATE_FORMATS:
+        try:
+            return datetime.strptime(s, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+@lru_cache(maxsize=4096)
+def to_iso(value: Optional[str]) -> str:
+    """Normalize any supported date string to ISO (YYYY-MM-DD). Blank if missing/unparseable."""
+    d = parse_date(value)
+    return d.isoformat() if d else ""
+
+
+# Serialized order fields, in output order.
+ORDER_FIELDS = (
+    "id", "order_date", "order_number", "product_name", "buyer", "responsible",
+    "quantity", "required_delivery", "terms_of_delivery", "payment_date",
+    "etd", "eta", "ata", "transit_status", "transport",
+)
+# select(*ORDER_COLUMNS) rows feed serialize_order_row() without loading Order entities.
+ORDER_COLUMNS = tuple(getattr(Order, name) for name in ORDER_FIELDS)
+# True date fields (required_delivery is often free text and stays as stored).
+ISO_FIELDS = frozenset({"order_date", "payment_date", "etd", "eta", "ata"})
+_BLANK_IF_NONE = frozenset({"required_delivery", "terms_of_delivery"})
+
+
+def serialize_order_row(row) -> dict:
+    """API shape of a row starting with ORDER_COLUMNS: ISO dates, blank instead of None for free-text fields."""
+    item = {}
+    for name, value in zip(ORDER_FIELDS, row):
+        if name in ISO_FIELDS:
+            value = to_iso(value)
+        elif value is None and name in _BLANK_IF_NONE:
+            value = ""
+        item[name] = value
+    return item
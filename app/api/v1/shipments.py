@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from flask import request
+from flask_login import current_user, login_required
+
+from app.shipments import where_is
+
+from . import api_v1_bp
+from .errors import fail, ok
+
+
+@api_v1_bp.route("/shipments", methods=["GET"])
+@login_required
+def find_shipments():
+    """Where is order X: current stage of every shipment with this order number."""
+    order_number = (request.args.get("order_number") or "").strip()
+    if not order_number:
+        return fail(
+            "VALIDATION_ERROR", "Invalid query parameters.",
+            details=[{"field": "order_number", "issue": "Required."}],
+        )
+    data = where_is(order_number, current_user)
+    return ok(data, meta={"count": len(data)})
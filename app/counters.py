@@ -0,0 +1,200 @@
+# app/counters.py
+"""
+Per-user, per-stage row counts (StageCounter) for the dashboard totals.
+
+The counts are kept by database triggers on the shipment table rather
+than by ORM events: most stage moves are Core UPDATE / INSERT / DELETE
+statements (app/lifecycle.py, imports, tiering, demo reset) that never reach
+a flush, while a trigger sees every row whatever wrote it. A row counts when
+
+  transit    stage = 'transit' (Order)
+  warehouse  stage = 'warehouse' and is_archived = false (NULL does not count,
+             same as the dashboard's filter_by(is_archived=False))
+  delivered  stage = 'delivered' (DeliveredGoods)
+
+Each stage has its own triggers; an UPDATE of stage, user_id or is_archived
+takes the row out of one count and puts it into another.
+
+Triggers exist for SQLite and PostgreSQL. They are installed (and the table
+filled) when create_all creates stage_counters, or by the migration. On any
+other backend stage_totals() falls back to COUNT queries.
+
+`flask check-counters` compares the table with real counts;
+`flask rebuild-counters` recomputes it from scratch.
+"""
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, event, false, func, insert, literal, select, text
+
+from app.database import db
+from app.models import Shipment, StageCounter, WarehouseStock
+from app.shipments import STAGE_MODELS
+
+TRIGGER_DIALECTS = ('sqlite', 'postgresql')
+
+# Extra condition a row of the stage must meet to be counted: (sqlite, postgresql)
+_LIVE_SQL = {'warehouse': ('{row}.is_archived = 0', '{row}.is_archived = false')}
+# Columns whose UPDATE can move a row in or out of a count
+_WATCHED = ('user_id', 'stage', 'is_archived')
+
+
+def _counted(stage: str):
+    if stage == 'warehouse':
+        return (Shipment.stage == stage) & (WarehouseStock.is_archived == false())  # = 0, the partial index's predicate
+    return Shipment.stage == stage
+
+
+def _live(stage: str, postgresql: bool) -> str:
+    """Trigger condition for a counted row of `stage`, with {row} for NEW/OLD."""
+    extra = _LIVE_SQL.get(stage, (None, None))[int(postgresql)]
+    return f"{{row}}.stage = '{stage}'" + (f" AND {extra}" if extra else "")
+
+
+def _sqlite_ddl(stage: str) -> List[str]:
+    live = _live(stage, postgresql=False)
+    cols = ', '.join(_WATCHED)
+
+    def when(row):
+        return f" WHEN {live.format(row=row)}"
+
+    up = (f"INSERT INTO stage_counters (user_id, stage, count) VALUES (NEW.user_id, '{stage}', 1) "
+          f"ON CONFLICT (user_id, stage) DO UPDATE SET count = count + 1;")
+    down = f"UPDATE stage_counters SET count = count - 1 WHERE user_id = OLD.user_id AND stage = '{stage}';"
+    name = f"shipment_{stage}_count"
+    return [
+        f'CREATE TRIGGER IF NOT EXISTS {name}_ins AFTER INSERT ON shipment{when("NEW")} BEGIN {up} END',
+        f'CREATE TRIGGER IF NOT EXISTS {name}_del AFTER DELETE ON shipment{when("OLD")} BEGIN {down} END',
+        (f'CREATE TRIGGER IF NOT EXISTS {name}_upd_old AFTER UPDATE OF {cols} ON shipment{when("OLD")} '
+         f'BEGIN {down} END'),
+        (f'CREATE TRIGGER IF NOT EXISTS {name}_upd_new AFTER UPDATE OF {cols} ON shipment{when("NEW")} '
+         f'BEGIN {up} END'),
+    ]
+
+
+_PG_BUMP = """
+CREATE OR REPLACE FUNCTION stage_counter_bump(uid integer, stg text, delta integer) RETURNS void AS $$
+BEGIN
+    INSERT INTO stage_counters (user_id, stage, count) VALUES (uid, stg, delta)
+    ON CONFLICT (user_id, stage) DO UPDATE SET count = stage_counters.count + EXCLUDED.count;
+END $$ LANGUAGE plpgsql
+"""
+
+
+def _postgresql_ddl(stage: str) -> List[str]:
+    live = _live(stage, postgresql=True)
+    cols = ', '.join(_WATCHED)
+    old_ok = f" AND {live.format(row='OLD')}"
+    new_ok = f" AND {live.format(row='NEW')}"
+    name = f"shipment_{stage}_count"
+    return [
+        f"""
+CREATE OR REPLACE FUNCTION {name}() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE'){old_ok} THEN
+        PERFORM stage_counter_bump(OLD.user_id, '{stage}', -1);
+    END IF;
+    IF TG_OP IN ('UPDATE', 'INSERT'){new_ok} THEN
+        PERFORM stage_counter_bump(NEW.user_id, '{stage}', 1);
+    END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql
+""",
+        f'DROP TRIGGER IF EXISTS {name} ON shipment',
+        (f'CREATE TRIGGER {name} AFTER INSERT OR DELETE OR UPDATE OF {cols} ON shipment '
+         f'FOR EACH ROW EXECUTE FUNCTION {name}()'),
+    ]
+
+
+def install_triggers(connection) -> bool:
+    """Create the counting triggers on `connection`'s database. Returns False if the dialect has none."""
+    dialect = connection.dialect.name
+    if dialect not in TRIGGER_DIALECTS:
+        return False
+    statements = [_PG_BUMP] if dialect == 'postgresql' else []
+    for stage in STAGE_MODELS:
+        ddl = _postgresql_ddl if dialect == 'postgresql' else _sqlite_ddl
+        statements += ddl(stage)
+    for sql in statements:
+        connection.execute(text(sql))
+    return True
+
+
+def drop_triggers(connection) -> None:
+    """Remove the counting triggers (migration downgrade)."""
+    dialect = connection.dialect.name
+    for stage in STAGE_MODELS:
+        name = f"shipment_{stage}_count"
+        if dialect == 'sqlite':
+            for suffix in ('ins', 'del', 'upd_old', 'upd_new'):
+                connection.execute(text(f"DROP TRIGGER IF EXISTS {name}_{suffix}"))
+        elif dialect == 'postgresql':
+            connection.execute(text(f'DROP TRIGGER IF EXISTS {name} ON shipment'))
+            connection.execute(text(f"DROP FUNCTION IF EXISTS {name}()"))
+    if dialect == 'postgresql':
+        connection.execute(text("DROP FUNCTION IF EXISTS stage_counter_bump(integer, text, integer)"))
+
+
+def _actual_counts(executor) -> Dict[tuple, int]:
+    counts = {}
+    for stage in STAGE_MODELS:
+        rows = executor.execute(
+            select(Shipment.user_id, func.count()).where(_counted(stage)).group_by(Shipment.user_id)
+        )
+        counts.update({(uid, stage): n for uid, n in rows})
+    return counts
+
+
+def _rebuild(executor) -> None:
+    executor.execute(delete(StageCounter))
+    for stage in STAGE_MODELS:
+        executor.execute(insert(StageCounter).from_select(
+            ['user_id', 'stage', 'count'],
+            select(Shipment.user_id, literal(stage), func.count()).where(_counted(stage)).group_by(Shipment.user_id),
+        ))
+
+
+def rebuild_counters() -> int:
+    """Recompute stage_counters from the shipment table in one transaction. Returns the row count."""
+    _rebuild(db.session)
+    db.session.commit()
+    return db.session.query(StageCounter).count()
+
+
+def check_counters() -> List[dict]:
+    """Counters that disagree with a real COUNT(*) (empty list when consistent)."""
+    actual = _actual_counts(db.session)
+    stored = {(c.user_id, c.stage): c.count for c in db.session.execute(select(StageCounter)).scalars()}
+    return [
+        {'user_id': uid, 'stage': stage, 'stored': stored.get((uid, stage), 0), 'actual': actual.get((uid, stage), 0)}
+        for uid, stage in sorted(stored.keys() | actual.keys())
+        if stored.get((uid, stage), 0) != actual.get((uid, stage), 0)
+    ]
+
+
+def stage_totals(user_id: Optional[int] = None) -> Dict[str, int]:
+    """
+    Live rows per stage for one user (primary-key range read) or for everyone
+    (sum over the small counters table).
+    """
+    totals = dict.fromkeys(STAGE_MODELS, 0)
+    if db.session.get_bind().dialect.name not in TRIGGER_DIALECTS:
+        for stage in STAGE_MODELS:
+            q = select(func.count()).select_from(Shipment).where(_counted(stage))
+            if user_id is not None:
+                q = q.where(Shipment.user_id == user_id)
+            totals[stage] = db.session.execute(q).scalar()
+        return totals
+
+    if user_id is not None:
+        q = select(StageCounter.stage, StageCounter.count).where(StageCounter.user_id == user_id)
+    else:
+        q = select(StageCounter.stage, func.sum(StageCounter.count)).group_by(StageCounter.stage)
+    totals.update({stage: int(n or 0) for stage, n in db.session.execute(q)})
+    return totals
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _install_on_create(target, connection, tables=(), **kw):
+    """create_all just made stage_counters: add the triggers and fill it from existing rows."""
+    if StageCounter.__table__ in tables and install_triggers(connection):
+        _rebuild(connection)
@@ -2,13 +2,22 @@
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.exc import OperationalError
 
-db = SQLAlchemy()
+from app.pooling import install_fork_safety
+from app.read_routing import RoutingSession, init_read_routing, stamp_writes
+from app.sqlite_profile import install_profile
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 def init_db(app):
     db.init_app(app)
+    app.after_request(stamp_writes)
     with app.app_context():
+        for engine in db.engines.values():
+            install_profile(engine, app.config.get('SQLITE_PRAGMAS', {}))
+        init_read_routing(app, db)
         try:
             db.create_all()
         except OperationalError as e:
             if "already exists" not in str(e):
-                raise
\ No newline at end of file
+                raise
+    install_fork_safety(app, db)
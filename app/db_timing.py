@@ -0,0 +1,74 @@
+# app/db_timing.py
+"""
+One statement timer on the Engine class, shared by the SQL instrumentation.
+
+app/sql_metrics.py, app/query_stats.py and app/metrics.py all need the
+duration of every statement. Instead of each attaching its own pair of
+cursor-execute listeners, they subscribe a callback here:
+
+  subscribe(fn)    fn(cursor, statement, parameters, executemany, seconds)
+
+after every statement, in subscription order. The listeners are attached
+with the first subscriber and detached with the last, so with all three
+features off no listener runs at all.
+
+The start time is kept on the statement's execution context, not on the
+connection. A statement that raises therefore leaves nothing behind; its
+context is dropped with the error and the next statement gets a new one.
+"""
+import threading
+import time
+from typing import Callable, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+Callback = Callable[..., None]
+
+_lock = threading.Lock()
+_callbacks: Tuple[Callback, ...] = ()  # replaced, never mutated: listeners iterate without the lock
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._timing_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_timing_started', None)
+    if started is None:
+        return
+    seconds = time.perf_counter() - started
+    for fn in _callbacks:
+        fn(cursor, statement, parameters, executemany, seconds)
+
+
+def _attach(enabled: bool) -> None:
+    for name, fn in (('before_cursor_execute', _before_cursor_execute),
+                     ('after_cursor_execute', _after_cursor_execute)):
+        attached = event.contains(Engine, name, fn)
+        if enabled and not attached:
+            event.listen(Engine, name, fn)
+        elif not enabled and attached:
+            event.remove(Engine, name, fn)
+
+
+def subscribe(fn: Callback) -> None:
+    """Call `fn` after every statement (idempotent)."""
+    global _callbacks
+    with _lock:
+        if fn not in _callbacks:
+            _callbacks = _callbacks + (fn,)
+        _attach(True)
+
+
+def unsubscribe(fn: Callback) -> None:
+    """Stop calling `fn`; the listeners go with the last subscriber."""
+    global _callbacks
+    with _lock:
+        _callbacks = tuple(f for f in _callbacks if f is not fn)
+        _attach(bool(_callbacks))
+
+
+def subscribed(fn: Callback) -> bool:
+    return fn in _callbacks
@@ -0,0 +1,139 @@
+# app/eta.py
+"""
+ETA predictor trained from completed shipments.
+
+Training reads the arrived samples of the lead-time ledger (TransitSample,
+app/rollups.py): transport, buyer, product, ETD month and the actual ETD ->
+ATA days. For each fallback level it stores the median days of every key
+with at least MIN_SAMPLES shipments in `eta_model`:
+
+  transport+buyer+product   'sea|acme gmbh|steel coils'
+  transport+buyer           'sea|acme gmbh'
+  transport+month           'sea|03'   (calendar month of ETD: seasonality)
+  transport                 'sea'
+  all                       ''
+
+predict() walks the levels from most to least specific and answers from the
+first key it finds. The table is small (a few thousand rows at most) and is
+held in memory per process, so a prediction is a handful of dict lookups.
+Workers re-read it when its trained_at changes, checked at most every
+ETA_MODEL_TTL seconds.
+
+train_eta_model() runs daily with the status recompute, and from
+`flask train-eta-model`.
+"""
+import time
+from datetime import datetime, timedelta
+from statistics import median
+from typing import Dict, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import delete, func, insert, select
+
+from app.database import db
+from app.metrics import cache_lookup
+from app.models import EtaModel, TransitSample
+from app.utils.dates import parse_date, utcnow
+
+LEVELS = (
+    ('transport+buyer+product', ('transport', 'buyer', 'product')),
+    ('transport+buyer', ('transport', 'buyer')),
+    ('transport+month', ('transport', 'month')),
+    ('transport', ('transport',)),
+    ('all', ()),
+)
+MIN_SAMPLES = 3
+
+# (trained_at, {(level, key): (days, n)}, monotonic time of the last version check)
+_model: Tuple[Optional[datetime], Dict[tuple, tuple], float] = (None, {}, 0.0)
+
+
+def _key(fields: Dict[str, Optional[str]], names) -> Optional[str]:
+    parts = [(fields.get(name) or '').strip().lower() for name in names]
+    return None if '' in parts else '|'.join(parts)
+
+
+def train_eta_model() -> Dict[str, int]:
+    """Rebuild eta_model from the arrived ledger samples in one transaction; reload it here."""
+    groups: Dict[tuple, list] = {}
+    samples = 0
+    for transport, buyer, product, month, days in db.session.execute(
+        select(TransitSample.transport, TransitSample.buyer, TransitSample.product,
+               TransitSample.month, TransitSample.days).where(TransitSample.ata.is_not(None))
+    ):
+        samples += 1
+        fields = {'transport': transport, 'buyer': buyer, 'product': product, 'month': month[5:7]}
+        for level, names in LEVELS:
+            key = _key(fields, names)
+            if key is not None:
+                groups.setdefault((level, key), []).append(days)
+
+    now = utcnow()
+    rows = [
+        {'level': level, 'key': key[:255], 'days': round(median(days)), 'n': len(days), 'trained_at': now}
+        for (level, key), days in groups.items() if len(days) >= MIN_SAMPLES
+    ]
+    db.session.execute(delete(EtaModel))
+    if rows:
+        db.session.execute(insert(EtaModel), rows)
+    db.session.commit()
+    _load(now)
+    return {'samples': samples, 'keys': len(rows)}
+
+
+def _load(version: Optional[datetime]) -> None:
+    global _model
+    table = {(r.level, r.key): (r.days, r.n) for r in db.session.execute(
+        select(EtaModel.level, EtaModel.key, EtaModel.days, EtaModel.n)
+    )}
+    _model = (version, table, time.monotonic())
+
+
+def _table() -> Dict[tuple, tuple]:
+    global _model
+    version, table, checked = _model
+    if checked and time.monotonic() - checked < current_app.config.get('ETA_MODEL_TTL', 300):
+        cache_lookup('eta_model', True)
+        return table
+    latest = db.session.execute(select(func.max(EtaModel.trained_at))).scalar()
+    if latest != version or not checked:
+        cache_lookup('eta_model', False)
+        _load(latest)
+    else:
+        cache_lookup('eta_model', True)
+        _model = (version, table, time.monotonic())
+    return _model[1]
+
+
+def predict(transport, buyer=None, product=None, etd=None) -> Optional[dict]:
+    """
+    Transit days for an order's features: {'days', 'level', 'n'} from the
+    most specific trained key, or None if nothing matches.
+    """
+    start = parse_date(etd)
+    fields = {'transport': transport, 'buyer': buyer, 'product': product,
+              'month': f"{start.month:02d}" if start else None}
+    table = _table()
+    for level, names in LEVELS:
+        key = _key(fields, names)
+        hit = table.get((level, key[:255])) if key is not None else None
+        if hit:
+            return {'days': hit[0], 'level': level, 'n': hit[1]}
+    return None
+
+
+def estimate_for(order) -> dict:
+    """ETA estimate of an Order: ETD + predicted days (None without ETD or a matching key)."""
+    guess = predict(order.transport, order.buyer, order.product_name, order.etd)
+    start, eta = parse_date(order.etd), parse_date(order.eta)
+    estimated = start + timedelta(days=guess['days']) if guess and start else None
+    return {
+        'order_id': order.id,
+        'etd': start.isoformat() if start else None,
+        'eta': eta.isoformat() if eta else None,
+        'estimated_eta': estimated.isoformat() if estimated else None,
+        'transit_days': guess['days'] if guess else None,
+        'basis': guess['level'] if guess else None,
+        'samples': guess['n'] if guess else 0,
+    }
+
@@ -0,0 +1,167 @@
+# app/kpi.py
+"""
+Daily KPI snapshot (KpiDaily) for the dashboard deltas and long trends.
+
+One row per (day, user) with the events the KPI cards count, keyed by the
+row's own date column:
+
+  transit    Order           by order_date
+  warehouse  WarehouseStock  by ata (non-archived rows)
+  delivered  DeliveredGoods  by delivery_date
+  delayed    Order           by eta, still without ATA
+
+plus the summed quantities (plain numeric values only, see sql_number).
+Because every event comes from a stored date, history can be backfilled in
+one pass. Rows move between stages over time, so refresh_kpi() re-derives
+a window of days (delete + insert). The default window starts on the first
+day of last month, which is what api_kpi compares. It runs daily with the
+status recompute, from `flask kpi-snapshot`, and as a full backfill when the
+table is still empty.
+
+Readers (api_kpi, GET /api/v1/kpi/history) sum at most a few hundred rows
+instead of parsing every order. kpi_sums() only trusts the days before the
+latest refresh and counts the remaining ones (normally just today) live.
+"""
+from datetime import date, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import delete, false, func, insert, select
+
+from app.database import db
+from app.models import DeliveredGoods, KpiDaily, Order, WarehouseStock
+from app.utils.dates import sql_iso_date, utcnow
+from app.utils.numbers import sql_number
+
+METRICS = ('transit', 'warehouse', 'delivered', 'delayed')
+QTY_METRICS = ('transit_qty', 'warehouse_qty', 'delivered_qty')
+
+# metric -> (model, date column, quantity metric or None, extra criteria)
+_SOURCES = {
+    'transit': (Order, Order.order_date, 'transit_qty', ()),
+    'warehouse': (WarehouseStock, WarehouseStock.ata, 'warehouse_qty', (WarehouseStock.is_archived == false(),)),
+    'delivered': (DeliveredGoods, DeliveredGoods.delivery_date, 'delivered_qty', ()),
+    'delayed': (Order, Order.eta, None, (func.coalesce(func.trim(Order.ata), '') == '',)),
+}
+
+
+def last_month_start(today: Optional[date] = None) -> date:
+    today = today or date.today()
+    return (today.replace(day=1) - timedelta(days=1)).replace(day=1)
+
+
+def _events(model, day, criteria, start: Optional[date], end: Optional[date]):
+    q = select(day, model.user_id, func.count(), func.sum(sql_number(model.quantity))) \
+        .where(day != '', *criteria)
+    if start:
+        q = q.where(day >= start.isoformat())
+    if end:
+        q = q.where(day <= end.isoformat())
+    return q
+
+
+def refresh_kpi(start: Optional[date] = None, end: Optional[date] = None) -> int:
+    """
+    Rebuild KpiDaily for start..end (inclusive; None = unbounded) from the
+    stage tables in one transaction. Returns the number of rows written.
+    """
+    rows: Dict[tuple, dict] = {}
+    for metric, (model, column, qty_metric, criteria) in _SOURCES.items():
+        day = sql_iso_date(column)
+        q = _events(model, day, criteria, start, end)
+        for iso, user_id, n, qty in db.session.execute(q.group_by(day, model.user_id)):
+            row = rows.setdefault((iso, user_id), dict.fromkeys(METRICS + QTY_METRICS, 0))
+            row[metric] = n
+            if qty_metric:
+                row[qty_metric] = float(qty or 0)
+
+    purge = delete(KpiDaily)
+    if start:
+        purge = purge.where(KpiDaily.day >= start)
+    if end:
+        purge = purge.where(KpiDaily.day <= end)
+    db.session.execute(purge)
+    now = utcnow()
+    if rows:
+        db.session.execute(insert(KpiDaily), [
+            {'day': date.fromisoformat(iso), 'user_id': user_id, 'refreshed_at': now, **values}
+            for (iso, user_id), values in rows.items()
+        ])
+    db.session.commit()
+    return len(rows)
+
+
+def snapshot_kpi(today: Optional[date] = None) -> int:
+    """Daily job: backfill everything on first run, else refresh from last month's first day."""
+    if db.session.query(KpiDaily.day).first() is None:
+        return refresh_kpi()
+    return refresh_kpi(start=last_month_start(today))
+
+
+def _scoped(q, user_id: Optional[int]):
+    return q if user_id is None else q.where(KpiDaily.user_id == user_id)
+
+
+def _snapshot_through() -> Optional[date]:
+    """Last day the snapshot has complete: the day before its latest refresh."""
+    refreshed = db.session.execute(select(func.max(KpiDaily.refreshed_at))).scalar()
+    if refreshed is None:
+        return None
+    # refreshed_at is UTC; never treat today as closed whatever the offset
+    return min(refreshed.date(), date.today()) - timedelta(days=1)
+
+
+def _live_sums(start: date, end: date, user_id: Optional[int]) -> Dict[str, float]:
+    """The same metrics as KpiDaily, counted straight from the stage tables."""
+    sums = dict.fromkeys(METRICS + QTY_METRICS, 0)
+    for metric, (model, column, qty_metric, criteria) in _SOURCES.items():
+        q = _events(model, sql_iso_date(column), criteria, start, end).with_only_columns(
+            func.count(), func.sum(sql_number(model.quantity)))
+        if user_id is not None:
+            q = q.where(model.user_id == user_id)
+        n, qty = db.session.execute(q).one()
+        sums[metric] = n
+        if qty_metric:
+            sums[qty_metric] = float(qty or 0)
+    return sums
+
+
+def kpi_sums(start: date, end: date, user_id: Optional[int] = None) -> Dict[str, float]:
+    """
+    Summed metrics over start..end for one user (or everyone). Days the
+    snapshot has closed come from KpiDaily; the rest (today, or every day
+    when the daily job is off) are counted live.
+    """
+    through = _snapshot_through()
+    closed_end = min(end, through) if through else start - timedelta(days=1)
+    sums = dict.fromkeys(METRICS + QTY_METRICS, 0)
+    if closed_end >= start:
+        cols = [func.coalesce(func.sum(getattr(KpiDaily, m)), 0) for m in METRICS + QTY_METRICS]
+        q = _scoped(select(*cols).where(KpiDaily.day.between(start, closed_end)), user_id)
+        sums = dict(zip(METRICS + QTY_METRICS, db.session.execute(q).one()))
+    if closed_end < end:
+        live = _live_sums(max(start, closed_end + timedelta(days=1)), end, user_id)
+        sums = {k: sums[k] + live[k] for k in sums}
+    return sums
+
+
+def _bucket_start(day: date, bucket: str) -> date:
+    if bucket == 'week':
+        return day - timedelta(days=day.isoweekday() - 1)
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def kpi_history(start: date, end: date, bucket: str = 'month', user_id: Optional[int] = None) -> list:
+    """Metrics per day/week/month bucket over start..end (buckets without events are omitted)."""
+    cols = [func.sum(getattr(KpiDaily, m)) for m in METRICS + QTY_METRICS]
+    q = _scoped(select(KpiDaily.day, *cols).where(KpiDaily.day.between(start, end)), user_id)
+    buckets: Dict[date, dict] = {}
+    for day, *values in db.session.execute(q.group_by(KpiDaily.day).order_by(KpiDaily.day)):
+        acc = buckets.setdefault(_bucket_start(day, bucket), dict.fromkeys(METRICS + QTY_METRICS, 0))
+        for key, v in zip(METRICS + QTY_METRICS, values):
+            acc[key] += v or 0
+    return [
+        {'period': period.isoformat(), **{k: (round(v, 3) if k in QTY_METRICS else int(v)) for k, v in acc.items()}}
+        for period, acc in buckets.items()
+    ]
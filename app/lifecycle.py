@@ -0,0 +1,292 @@
+# app/lifecycle.py
+"""
+Set-based lifecycle transitions: Orders -> Warehouse -> Delivered (and back).
+
+Each function takes many ids, checks existence and permissions with one
+SELECT, then moves every permitted row with one UPDATE of its stage (and
+of the columns the target stage fills in). Nothing is committed here: the
+caller commits once, so a batch is a single transaction. Every function returns per-item results
+as {id: (status, message)} where status is "ok", "not_found", "forbidden"
+or "invalid".
+
+The column mappings match what the single-row routes (stock_order,
+deliver_direct, deliver_partial, restore_to_dashboard and
+restore_from_delivered) used to build by hand; those routes now call these
+functions with a single id. Each route passes its own permission rule as
+`allowed` (see below); the bulk API uses the default, scoped_editor.
+
+All stages share the shipment table (app/models.py), so a moved row keeps
+its id; only a partial warehouse delivery INSERTs a row, the delivered part,
+split off with parent_id pointing at the stock it came from.
+"""
+from datetime import date, datetime
+from typing import Callable, Dict, Iterable, Tuple
+
+from sqlalchemy import case, cast, func, insert, literal, select, update
+from sqlalchemy.orm.util import identity_key
+
+from app.database import db
+from app.models import (
+    ArchivedOrder,
+    DeliveredGoods,
+    Order,
+    Shipment,
+    StockReportEntry,
+    WarehouseStock,
+)
+from app.roles import can_edit, can_view_all
+from app.shipments import DELIVERED, TRANSIT, WAREHOUSE
+from app.utils.dates import utcnow
+from app.utils.numbers import sql_number
+
+OK = "ok"
+NOT_FOUND = "not_found"
+FORBIDDEN = "forbidden"
+INVALID = "invalid"
+
+MAX_BATCH = 1000
+
+Results = Dict[int, Tuple[str, str]]
+Permission = Callable[[object, int], bool]  # (user, row owner id) -> may move
+
+
+# ---------------- permission rules ----------------
+def scoped_editor(user, owner_id: int) -> bool:
+    """The role can edit and either sees everything or owns the row (bulk API, delivered restore)."""
+    return can_edit(user.role) and (can_view_all(user.role) or owner_id == user.id)
+
+
+def any_editor(user, owner_id: int) -> bool:
+    """The role can edit (stock_order, deliver_partial)."""
+    return can_edit(user.role)
+
+
+def editor_or_owner(user, owner_id: int) -> bool:
+    """The role can edit, or the user owns the row (deliver_direct)."""
+    return can_edit(user.role) or owner_id == user.id
+
+
+def owner_only(user, owner_id: int) -> bool:
+    """Only the row's owner (restore_routes)."""
+    return owner_id == user.id
+
+
+def _check(model, ids: Iterable[int], user, *extra_cols, allowed: Permission = scoped_editor):
+    """
+    One query for existence + ownership. Returns (results, permitted rows by id).
+    A row is permitted if allowed(user, row.user_id) holds.
+    Archived warehouse rows (fully delivered) are history and cannot be moved.
+    """
+    ids = list(dict.fromkeys(ids))
+    results: Results = {}
+    rows = {}
+    archived = (WarehouseStock.is_archived,) if model is WarehouseStock else ()
+    found = db.session.execute(
+        select(model.id, model.user_id, *archived, *extra_cols).where(model.id.in_(ids))
+    ).all()
+    by_id = {r[0]: r for r in found}
+    for i in ids:
+        r = by_id.get(i)
+        if r is None:
+            results[i] = (NOT_FOUND, "No such item.")
+        elif not allowed(user, r[1]):
+            results[i] = (FORBIDDEN, "You do not have permission to move this item.")
+        elif archived and r.is_archived:
+            results[i] = (INVALID, "Item was already delivered.")
+        else:
+            rows[i] = r
+    return results, rows
+
+
+def _move(model, ids, stage: str, **values) -> None:
+    """
+    One UPDATE moving the `model` rows `ids` to `stage`. Instances of those
+    rows already in the session are expunged: they are of the old class, and
+    the next get() loads the row as its new one.
+    """
+    db.session.execute(
+        update(model).where(model.id.in_(ids))
+        .values(stage=stage, updated_at=utcnow(), **values)
+        .execution_options(synchronize_session=False)
+    )
+    for i in ids:
+        obj = db.session.identity_map.get(identity_key(Shipment, i))
+        if obj is not None:
+            db.session.expunge(obj)
+
+
+def stock_orders(ids: Iterable[int], user, allowed: Permission = scoped_editor) -> Results:
+    """Orders -> WarehouseStock (as stock_order)."""
+    results, rows = _check(Order, ids, user, Order.order_number, allowed=allowed)
+    ok_ids = []
+    for i, r in rows.items():
+        if not r.order_number:
+            results[i] = (INVALID, "Order must have an order number to be stocked.")
+        else:
+            ok_ids.append(i)
+    if not ok_ids:
+        return results
+
+    _move(
+        Order, ok_ids, WAREHOUSE,
+        notes="Stocked from order", transit_status="In Stock", is_manual=False, is_archived=False,
+        is_delayed=False, delay_days=None,
+    )
+    results.update({i: (OK, "Moved to warehouse.") for i in ok_ids})
+    return results
+
+
+def deliver_orders(ids: Iterable[int], user, allowed: Permission = scoped_editor) -> Results:
+    """Orders -> DeliveredGoods + ArchivedOrder (as deliver_direct)."""
+    results, rows = _check(Order, ids, user, Order.order_number, allowed=allowed)
+    ok_ids = []
+    for i, r in rows.items():
+        if not r.order_number:
+            results[i] = (INVALID, "Order must have an order number to be delivered.")
+        else:
+            ok_ids.append(i)
+    if not ok_ids:
+        return results
+
+    db.session.execute(
+        insert(ArchivedOrder).from_select(
+            ["original_order_id", "user_id", "order_date", "order_number", "product_name",
+             "buyer", "responsible", "quantity", "required_delivery", "terms_of_delivery",
+             "payment_date", "etd", "eta", "ata", "transit_status", "transport", "source",
+             "archived_at"],
+            select(
+                Order.id, Order.user_id, Order.order_date, Order.order_number, Order.product_name,
+                Order.buyer, Order.responsible, sql_number(Order.quantity), Order.required_delivery,
+                Order.terms_of_delivery, Order.payment_date, Order.etd, Order.eta, Order.ata,
+                Order.transit_status, Order.transport, literal("dashboard"), literal(utcnow()),
+            ).where(Order.id.in_(ok_ids)),
+        )
+    )
+    _move(
+        Order, ok_ids, DELIVERED,
+        delivery_source="Direct from Transit", delivery_date=datetime.now().strftime('%Y-%m-%d'),
+        notes="Delivered directly from dashboard", is_delayed=False, delay_days=None,
+    )
+    results.update({i: (OK, "Delivered and archived.") for i in ok_ids})
+    return results
+
+
+def deliver_from_warehouse(quantities: Dict[int, float], user, allowed: Permission = scoped_editor) -> Results:
+    """
+    WarehouseStock -> DeliveredGoods for the given quantity per item (as deliver_partial).
+    Fully delivered items become delivered rows themselves; the rest keep the
+    remaining quantity and the delivered part becomes a new shipment split
+    off from the original (parent_id).
+    """
+    results, rows = _check(WarehouseStock, quantities.keys(), user, WarehouseStock.quantity, allowed=allowed)
+    deliver: Dict[int, float] = {}
+    remaining: Dict[int, float] = {}
+    for i, r in rows.items():
+        try:
+            current = float(r.quantity)
+            qty = float(quantities[i])
+        except (TypeError, ValueError):
+            results[i] = (INVALID, "Invalid quantity.")
+            continue
+        if qty <= 0 or qty > current:
+            results[i] = (INVALID, f"Invalid quantity. Must be between 1 and {current}.")
+            continue
+        deliver[i] = qty
+        remaining[i] = current - qty
+    if not deliver:
+        return results
+
+    ids = list(deliver)
+    emptied = [i for i in ids if remaining[i] <= 0]
+    partial = {i: remaining[i] for i in ids if remaining[i] > 0}
+    today = datetime.now().strftime('%d.%m.%y')
+
+    if partial:
+        db.session.execute(
+            insert(DeliveredGoods).from_select(
+                ["stage", "parent_id", "user_id", "order_number", "product_name", "quantity", "transport",
+                 "delivery_source", "notes", "warehouse_address", "client", "pos_no", "customer_ref",
+                 "delivery_date"],
+                select(
+                    literal(DELIVERED), WarehouseStock.id, WarehouseStock.user_id, WarehouseStock.order_number,
+                    WarehouseStock.product_name, case(deliver, value=WarehouseStock.id), WarehouseStock.transport,
+                    literal("From Warehouse"), WarehouseStock.notes, WarehouseStock.warehouse_address,
+                    WarehouseStock.client, WarehouseStock.pos_no, WarehouseStock.customer_ref, literal(today),
+                ).where(WarehouseStock.id.in_(list(partial))),
+            )
+        )
+        db.session.execute(
+            update(WarehouseStock)
+            .where(WarehouseStock.id.in_(list(partial)))
+            .values(quantity=case(partial, value=WarehouseStock.id))
+        )
+    if emptied:
+        _move(
+            WarehouseStock, emptied, DELIVERED,
+            quantity=case(deliver, value=WarehouseStock.id), delivery_source="From Warehouse",
+            delivery_date=today, is_manual=None, is_archived=None,
+        )
+    results.update({i: (OK, f"Delivered {deliver[i]}.") for i in ids})
+    return results
+
+
+def restore_warehouse(ids: Iterable[int], user, allowed: Permission = scoped_editor) -> Results:
+    """
+    WarehouseStock -> Orders (as restore_routes.restore_to_dashboard). Missing
+    dates become today (ISO). Stock report entries of the row lose their link,
+    as the ORM backref did when the route deleted the row with session.delete.
+    """
+    results, rows = _check(WarehouseStock, ids, user, allowed=allowed)
+    ok_ids = list(rows)
+    if not ok_ids:
+        return results
+
+    today = date.today().isoformat()
+    restored = "Restored"
+    ata_or_today = func.coalesce(WarehouseStock.ata, today)
+    db.session.execute(
+        update(StockReportEntry).where(StockReportEntry.related_order_id.in_(ok_ids)).values(related_order_id=None)
+    )
+    _move(
+        WarehouseStock, ok_ids, TRANSIT,
+        order_date=ata_or_today,
+        order_number=func.coalesce(
+            WarehouseStock.order_number, literal("Restored-") + cast(WarehouseStock.id, db.String)
+        ),
+        product_name=func.coalesce(WarehouseStock.product_name, restored),
+        buyer=func.coalesce(WarehouseStock.client, restored), responsible=restored,
+        quantity=func.coalesce(WarehouseStock.quantity, "0.01"), required_delivery=ata_or_today,
+        terms_of_delivery=restored, payment_date=ata_or_today, etd=ata_or_today, eta=ata_or_today,
+        ata=ata_or_today, transit_status="in process",
+        transport=func.coalesce(WarehouseStock.transport, "unknown"),
+        row_hash=None, is_delayed=False, delay_days=None, is_manual=None, is_archived=None,
+    )
+    results.update({i: (OK, "Restored to dashboard.") for i in ok_ids})
+    return results
+
+
+def restore_delivered(ids: Iterable[int], user, allowed: Permission = scoped_editor,
+                      arrived_today: bool = True) -> Results:
+    """
+    DeliveredGoods -> Orders. With arrived_today ETD/ETA/ATA are set to today
+    (as delivered_routes.restore_to_dashboard); without, they stay blank (as
+    restore_routes.restore_from_delivered).
+    """
+    results, rows = _check(DeliveredGoods, ids, user, allowed=allowed)
+    ok_ids = list(rows)
+    if not ok_ids:
+        return results
+
+    now = datetime.now()
+    shipped = now.strftime('%Y-%m-%d') if arrived_today else ""
+    transport = func.nullif(func.trim(func.coalesce(DeliveredGoods.transport, "")), "")
+    _move(
+        DeliveredGoods, ok_ids, TRANSIT,
+        order_date=now.strftime('%d.%m.%y'), buyer="Restored", responsible="Restored",
+        required_delivery="", terms_of_delivery="Restored", payment_date="",
+        etd=shipped, eta=shipped, ata=shipped, transit_status="in process",
+        transport=func.coalesce(transport, "Not specified"),
+        delivery_source=None, delivery_date=None, row_hash=None, is_delayed=False, delay_days=None,
+    )
+    results.update({i: (OK, "Restored to dashboard.") for i in ok_ids})
+    return results
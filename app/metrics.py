@@ -0,0 +1,198 @@
+# app/metrics.py
+"""
+Prometheus metrics at GET /metrics (METRICS=true, needs prometheus_client).
+
+  http_requests_total{method,endpoint,status}             counter
+  http_request_duration_seconds{method,endpoint}          histogram
+  http_requests_in_progress                               gauge (summed over workers)
+  db_query_duration_seconds{operation}                    histogram (select|insert|update|delete|other)
+  app_cache_lookups_total{cache,result}                   counter (snapshot, analytics, eta_model; hit|miss)
+  app_import_jobs{status}                                 gauge, queued/running jobs (read at scrape)
+  sqlite_wal_bytes{database}                              gauge, -wal file size per SQLite bind (read at scrape)
+
+`endpoint` is the Flask endpoint name, so cardinality is bounded by the
+routes. Cache hit ratio is
+rate(app_cache_lookups_total{result="hit"}[5m]) / rate(app_cache_lookups_total[5m]).
+
+Gunicorn workers each count in their own process. With
+PROMETHEUS_MULTIPROC_DIR set, before the app starts, to a directory
+writable by every worker, prometheus_client keeps the values in per-process
+mmap files there. /metrics then aggregates all workers, whichever worker
+serves the scrape. gunicorn.conf.py empties the directory when the master
+starts and marks exited workers dead. Without the variable each worker
+reports only itself.
+
+/metrics takes the _admin token: ?token=… or `Authorization: Bearer …`
+(DEMO_RESET_TOKEN). It answers 503 when METRICS is off or prometheus_client
+is not installed. The request hooks then return at once, and the DB
+histogram does not subscribe to the statement timer (app/db_timing.py).
+"""
+import hmac
+import os
+import time
+from types import SimpleNamespace
+from typing import Optional
+
+from flask import abort, current_app, jsonify, request
+from sqlalchemy import text
+
+from app import db_timing
+
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+_OPERATIONS = ('select', 'insert', 'update', 'delete')
+
+_m: Optional[SimpleNamespace] = None  # the metric objects, built once per process
+
+
+def _build() -> Optional[SimpleNamespace]:
+    global _m
+    if _m is None:
+        try:
+            from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+        except ImportError:
+            return None
+        registry = CollectorRegistry()
+        _m = SimpleNamespace(
+            registry=registry,
+            requests=Counter('http_requests_total', 'HTTP requests', ['method', 'endpoint', 'status'],
+                             registry=registry),
+            latency=Histogram('http_request_duration_seconds', 'HTTP request latency', ['method', 'endpoint'],
+                              registry=registry),
+            in_progress=Gauge('http_requests_in_progress', 'HTTP requests being served',
+                              multiprocess_mode='livesum', registry=registry),
+            db=Histogram('db_query_duration_seconds', 'SQL statement latency', ['operation'],
+                         buckets=DB_BUCKETS, registry=registry),
+            cache=Counter('app_cache_lookups_total', 'In-process cache lookups', ['cache', 'result'],
+                          registry=registry),
+        )
+        registry.register(_ScrapeTimeCollector())
+    return _m
+
+
+def _active() -> bool:
+    return _m is not None and bool(current_app.config.get('METRICS'))
+
+
+def cache_lookup(cache: str, hit: bool) -> None:
+    """Count one lookup of an in-process cache (no-op when metrics are off)."""
+    if _m is not None and current_app.config.get('METRICS'):
+        _m.cache.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+# ---------------- request hooks ----------------
+def start_request() -> None:
+    if _active():
+        request._metrics_started = time.perf_counter()
+        _m.in_progress.inc()
+
+
+def finish_request(response):
+    started = getattr(request, '_metrics_started', None)
+    if started is not None:
+        endpoint = request.endpoint or '<unmatched>'
+        _m.requests.labels(request.method, endpoint, str(response.status_code)).inc()
+        _m.latency.labels(request.method, endpoint).observe(time.perf_counter() - started)
+    return response
+
+
+def end_request(exc=None) -> None:
+    """teardown_request hook: runs even when a handler raised, so in-progress always goes back down."""
+    if getattr(request, '_metrics_started', None) is not None:
+        _m.in_progress.dec()
+
+
+# ---------------- DB statement timing ----------------
+def _timed(cursor, statement, parameters, executemany, seconds):
+    operation = statement.lstrip()[:6].lower()
+    _m.db.labels(operation if operation in _OPERATIONS else 'other').observe(seconds)
+
+
+def install_listeners(enabled: bool) -> None:
+    """Subscribe to (or leave) the shared statement timer."""
+    if enabled:
+        db_timing.subscribe(_timed)
+    else:
+        db_timing.unsubscribe(_timed)
+
+
+# ---------------- scrape ----------------
+class _ScrapeTimeCollector:
+    """Database-wide values, read when /metrics is scraped (the same whichever worker answers)."""
+
+    @staticmethod
+    def _families():
+        from prometheus_client.core import GaugeMetricFamily
+        return (GaugeMetricFamily('app_import_jobs', 'Import jobs waiting or running', labels=['status']),
+                GaugeMetricFamily('sqlite_wal_bytes', 'Size of the SQLite -wal file', labels=['database']))
+
+    def describe(self):
+        return self._families()  # names only: registering must not query the database
+
+    def collect(self):
+        from app.database import db
+
+        jobs, wal = self._families()
+        counts = dict(db.session.execute(text(
+            "SELECT status, COUNT(*) FROM import_job WHERE status IN ('queued', 'running') GROUP BY status"
+        )).all())
+        for status in ('queued', 'running'):
+            jobs.add_metric([status], counts.get(status, 0))
+        yield jobs
+
+        for bind, engine in db.engines.items():
+            if engine.dialect.name == 'sqlite' and engine.url.database not in (None, '', ':memory:'):
+                path = f"{engine.url.database}-wal"
+                wal.add_metric([bind or 'main'], os.path.getsize(path) if os.path.exists(path) else 0)
+        yield wal
+
+
+def _authorized() -> bool:
+    expected = current_app.config.get('DEMO_RESET_TOKEN', 'change-me')
+    given = request.args.get('token', '')
+    auth = request.headers.get('Authorization', '')
+    if auth.startswith('Bearer '):
+        given = auth[len('Bearer '):]
+    return hmac.compare_digest(given.encode(), expected.encode())
+
+
+def metrics_view():
+    if not _authorized():
+        abort(403, description="Forbidden: bad token")
+    if not _active():
+        return jsonify({"status": "disabled", "reason": "METRICS is off or prometheus_client is missing"}), 503
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST,
+        CollectorRegistry,
+        generate_latest,
+        multiprocess,
+    )
+
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)  # every worker's mmap files
+        registry.register(_ScrapeTimeCollector())
+    else:
+        registry = _m.registry
+    return generate_latest(registry), 200, {'Content-Type': CONTENT_TYPE_LATEST}
+
+
+def enable(app, enabled: bool) -> bool:
+    """Turn collection on or off (builds the metrics on first use). Returns whether it is on."""
+    if enabled and _build() is None:
+        app.logger.warning("METRICS=true but prometheus_client is not installed; /metrics is disabled")
+        enabled = False
+    app.config['METRICS'] = enabled
+    install_listeners(enabled)
+    return enabled
+
+
+def init_metrics(app) -> None:
+    """Register the request hooks and /metrics; collect when METRICS is on."""
+    app.before_request(start_request)
+    app.after_request(finish_request)
+    app.teardown_request(end_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+    multiproc_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if multiproc_dir:
+        os.makedirs(multiproc_dir, exist_ok=True)
+    enable(app, app.config.get('METRICS', False))
@@ -22,61 +22,192 @@ class User(db.Model):
     def is_anonymous(self): return False
 
 
-class Order(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    order_date = db.Column(db.String(10), nullable=False)
-    order_number = db.Column(db.String(50), nullable=True)
-    product_name = db.Column(db.String(100), nullable=False)
-    buyer = db.Column(db.String(100), nullable=False)
-    responsible = db.Column(db.String(100), nullable=False)
-    quantity = db.Column(db.String(50), nullable=False)
-    required_delivery = db.Column(db.String(10), nullable=True)
-    terms_of_delivery = db.Column(db.String(100), nullable=True)
-    payment_date = db.Column(db.String(10))
-    etd = db.Column(db.String(10), nullable=True)
-    eta = db.Column(db.String(10), nullable=True)
-    ata = db.Column(db.String(10))
-    transit_status = db.Column(db.String(20), nullable=False)
-    transport = db.Column(db.String(20), nullable=False)
-    pod_filename = db.Column(db.String(120))
-
+class Shipment(db.Model):
+    """
+    One row per physical shipment for its whole life, in one table for all
+    stages. `stage` says where it is and selects the mapped class (transit ->
+    Order, warehouse -> WarehouseStock, delivered -> DeliveredGoods,
+    archived -> ArchivedShipment); a transition is one UPDATE of the row
+    (see app/lifecycle.py), so the id never changes.
 
-class WarehouseStock(db.Model):
-    __tablename__ = 'warehouse_stock'  # ✅ Ensure FK consistency
+    Columns every stage uses live here; the per-stage ones are declared on the
+    subclasses and stay NULL on the other stages' rows.
+    """
+    __tablename__ = 'shipment'
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    order_number = db.Column(db.String(50), nullable=False)
-    product_name = db.Column(db.String(100), nullable=False)
-    quantity = db.Column(db.String(50), nullable=False)
-    ata = db.Column(db.String(10), nullable=True)
-    transit_status = db.Column(db.String(20), default='In Stock', nullable=False)
-    notes = db.Column(db.String(120))
+    stage = db.Column(db.String(20), nullable=False)  # transit|warehouse|delivered|archived
+    order_number = db.Column(db.String(50), index=True)
+    product_name = db.Column(db.String(100))
+    quantity = db.Column(db.String(50))
+    ata = db.Column(db.String(10))
+    transit_status = db.Column(db.String(20))
     transport = db.Column(db.String(20))
-    is_manual = db.Column(db.Boolean, default=False)
+    notes = db.Column(db.String(120))
     pod_filename = db.Column(db.String(120))
     warehouse_address = db.Column(db.String(255))
     client = db.Column(db.String(255))
     pos_no = db.Column(db.String(50))
     customer_ref = db.Column(db.String(50))
-    is_archived = db.Column(db.Boolean, default=False)
+    parent_id = db.Column(db.Integer)  # shipment this one was split from by a partial delivery
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_shipment_user_order_number', 'user_id', 'order_number'),
+    )
+    __mapper_args__ = {'polymorphic_on': stage}
+
+
+class StageCounter(db.Model):
+    """
+    Live row count per user and stage (transit / warehouse / delivered), kept
+    exact by database triggers on the stage tables (see app/counters.py).
+    No FK on user_id: rows are only ever written by those triggers.
+    """
+    __tablename__ = 'stage_counters'
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    stage = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
 
-class DeliveredGoods(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    order_number = db.Column(db.String(50), nullable=False)
-    product_name = db.Column(db.String(100), nullable=False)
-    quantity = db.Column(db.String(50), nullable=False)
-    delivery_source = db.Column(db.String(50), nullable=False)
-    delivery_date = db.Column(db.String(10), nullable=False)
-    transport = db.Column(db.String(20))
-    notes = db.Column(db.String(120))
-    pod_filename = db.Column(db.String(120))
-    warehouse_address = db.Column(db.String(255))
-    client = db.Column(db.String(255))
-    pos_no = db.Column(db.String(50))
-    customer_ref = db.Column(db.String(50))
+
+class KpiDaily(db.Model):
+    """
+    Dashboard KPI events per day and user, derived from the rows' own dates:
+    orders placed (order_date), stock arrived (ata, non-archived), goods
+    delivered (delivery_date) and orders due without ATA (eta), with the
+    matching quantities. Refreshed by app/kpi.py; month/week trends sum it.
+    """
+    __tablename__ = 'kpi_daily'
+    day = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    transit = db.Column(db.Integer, nullable=False, default=0)
+    warehouse = db.Column(db.Integer, nullable=False, default=0)
+    delivered = db.Column(db.Integer, nullable=False, default=0)
+    delayed = db.Column(db.Integer, nullable=False, default=0)
+    transit_qty = db.Column(db.Float, nullable=False, default=0)
+    warehouse_qty = db.Column(db.Float, nullable=False, default=0)
+    delivered_qty = db.Column(db.Float, nullable=False, default=0)
+    refreshed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class TransitSample(db.Model):
+    """
+    Lead time of one shipment: days from ETD to ATA (or ETA until it arrives),
+    bucketed for the histogram. Keyed by shipment so the sample survives the
+    move to warehouse/delivered (see app/rollups.py).
+    """
+    __tablename__ = 'transit_sample'
+    shipment_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    transport = db.Column(db.String(20), nullable=False)
+    month = db.Column(db.String(7), nullable=False)  # YYYY-MM of ETD
+    days = db.Column(db.Integer, nullable=False)
+    bucket = db.Column(db.Integer, nullable=False)
+    # typed copies of the order's fields for the percentile analytics (app/analytics.py)
+    buyer = db.Column(db.String(100))
+    product = db.Column(db.String(100))
+    eta = db.Column(db.Date)
+    ata = db.Column(db.Date)
+    synced_at = db.Column(db.DateTime, index=True)  # last write; max() is the analytics data version
+
+
+class OrderChange(db.Model):
+    """Append-only log of written Order ids, filled by triggers (app/snapshot.py)."""
+    __tablename__ = 'order_change_log'
+    __table_args__ = ({'sqlite_autoincrement': True},)  # never reuse a seq after pruning
+    seq = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    order_id = db.Column(db.Integer, nullable=False)
+
+
+class JobRun(db.Model):
+    """
+    Day a scheduled job was last claimed. app/status.py claims a day with a
+    conditional UPDATE, so one process per day runs the job.
+    """
+    __tablename__ = 'job_run'
+    name = db.Column(db.String(50), primary_key=True)
+    run_on = db.Column(db.Date)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+
+class EtaModel(db.Model):
+    """
+    Trained ETA lookup (app/eta.py): median transit days of completed
+    shipments per fallback level and key, e.g. ('transport+buyer', 'sea|acme').
+    """
+    __tablename__ = 'eta_model'
+    level = db.Column(db.String(40), primary_key=True)
+    key = db.Column(db.String(255), primary_key=True)
+    days = db.Column(db.Integer, nullable=False)
+    n = db.Column(db.Integer, nullable=False)
+    trained_at = db.Column(db.DateTime, nullable=False)
+
+
+class TransitRollup(db.Model):
+    """Sum of TransitSample per transport, ETD month and histogram bucket."""
+    __tablename__ = 'transit_rollup'
+    transport = db.Column(db.String(20), primary_key=True)
+    month = db.Column(db.String(7), primary_key=True)
+    bucket = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    n = db.Column(db.Integer, nullable=False, default=0)
+    sum_days = db.Column(db.Integer, nullable=False, default=0)
+    sum_sq_days = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class Order(Shipment):
+    __mapper_args__ = {'polymorphic_identity': 'transit'}
+    order_date = db.Column(db.String(10))
+    buyer = db.Column(db.String(100))
+    responsible = db.Column(db.String(100))
+    required_delivery = db.Column(db.String(10), nullable=True)
+    terms_of_delivery = db.Column(db.String(100), nullable=True)
+    payment_date = db.Column(db.String(10))
+    etd = db.Column(db.String(10), nullable=True)
+    eta = db.Column(db.String(10), nullable=True)
+    row_hash = db.Column(db.String(40))  # content hash of the last bulk import (see utils/order_import)
+    # ETA passed without ATA; kept on write and by the daily sweep (app/status.py)
+    is_delayed = db.Column(db.Boolean, default=False, server_default=db.false(), nullable=False)
+    delay_days = db.Column(db.Integer)
+
+
+class WarehouseStock(Shipment):
+    __mapper_args__ = {'polymorphic_identity': 'warehouse'}
+    is_manual = db.Column(db.Boolean)
+    is_archived = db.Column(db.Boolean)
+    archived_at = db.Column(db.DateTime)  # set when fully delivered before the stage fold; app/tiering moves these out
+
+    def __init__(self, **kwargs):
+        # Defaults are set here, not on the columns: the table is shared with the other stages
+        kwargs.setdefault('transit_status', 'In Stock')
+        kwargs.setdefault('is_manual', False)
+        kwargs.setdefault('is_archived', False)
+        super().__init__(**kwargs)
+
+
+class DeliveredGoods(Shipment):
+    __mapper_args__ = {'polymorphic_identity': 'delivered'}
+    delivery_source = db.Column(db.String(50))
+    delivery_date = db.Column(db.String(10))
+
+
+class ArchivedShipment(Shipment):
+    """Delivered shipment whose details went to the cold tier (app/tiering.py)."""
+    __mapper_args__ = {'polymorphic_identity': 'archived'}
+
+
+# Partial index over the (small) delayed set, ordered by delay
+db.Index(
+    'ix_order_delayed', Order.delay_days,
+    sqlite_where=db.text('is_delayed = 1'),
+    postgresql_where=db.text('is_delayed = true'),
+)
+# Partial index over the active working set only (every warehouse page filters is_archived = false)
+db.Index(
+    'ix_warehouse_stock_active', Shipment.user_id, Shipment.ata,
+    sqlite_where=db.text('is_archived = 0'),
+    postgresql_where=db.text('is_archived = false'),
+)
 
 class AuditLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -133,9 +264,30 @@ class StockReportEntry(db.Model):
     pos_no = db.Column(db.String(50))
     customer_ref = db.Column(db.String(50))
 
-    related_order_id = db.Column(db.Integer, db.ForeignKey('warehouse_stock.id', name='fk_stockreport_warehouse'))
+    related_order_id = db.Column(db.Integer, db.ForeignKey('shipment.id', name='fk_stockreport_shipment'))
+
+    related_order = db.relationship('Shipment', backref='stock_reports')
+
+class ImportJob(db.Model):
+    __tablename__ = 'import_job'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)      # original upload name
+    stored_path = db.Column(db.String(500), nullable=False)
+    status = db.Column(db.String(20), default='queued', nullable=False)  # queued|running|done|failed
+    total_rows = db.Column(db.Integer)
+    last_row = db.Column(db.Integer, default=0, nullable=False)  # last source row committed (resume point)
+    processed_rows = db.Column(db.Integer, default=0, nullable=False)
+    inserted = db.Column(db.Integer, default=0, nullable=False)
+    updated = db.Column(db.Integer, default=0, nullable=False)
+    unchanged = db.Column(db.Integer, default=0, nullable=False)
+    rejected = db.Column(db.Integer, default=0, nullable=False)
+    errors = db.Column(db.Text)  # JSON list of {"row": n, "reason": "..."} (capped)
+    message = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
 
-    related_order = db.relationship('WarehouseStock', backref='stock_reports')
 
 class ActivityLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -144,3 +296,105 @@ class ActivityLog(db.Model):
     details = db.Column(db.Text)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     user = db.relationship('User')
+
+
+# === Cold tier (separate "archive" database, see app/tiering.py) ===
+# Same columns as the hot tables, same primary keys (copied, not generated),
+# no foreign keys: the rows live in another database file.
+
+class ColdDeliveredGoods(db.Model):
+    __bind_key__ = 'archive'
+    __tablename__ = 'cold_delivered_goods'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    order_number = db.Column(db.String(50), nullable=False, index=True)
+    product_name = db.Column(db.String(100), nullable=False)
+    quantity = db.Column(db.String(50), nullable=False)
+    delivery_source = db.Column(db.String(50), nullable=False)
+    delivery_date = db.Column(db.String(10), nullable=False)
+    transport = db.Column(db.String(20))
+    notes = db.Column(db.String(120))
+    pod_filename = db.Column(db.String(120))
+    warehouse_address = db.Column(db.String(255))
+    client = db.Column(db.String(255))
+    pos_no = db.Column(db.String(50))
+    customer_ref = db.Column(db.String(50))
+    shipment_id = db.Column(db.Integer)
+    tiered_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class ColdArchivedOrder(db.Model):
+    __bind_key__ = 'archive'
+    __tablename__ = 'cold_archived_order'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    original_order_id = db.Column(db.Integer)
+    user_id = db.Column(db.Integer, index=True)
+    order_date = db.Column(db.String(20))
+    order_number = db.Column(db.String(100), index=True)
+    product_name = db.Column(db.String(255))
+    buyer = db.Column(db.String(100))
+    responsible = db.Column(db.String(100))
+    quantity = db.Column(db.Float)
+    required_delivery = db.Column(db.String(100))
+    terms_of_delivery = db.Column(db.String(100))
+    payment_date = db.Column(db.String(20))
+    etd = db.Column(db.String(20))
+    eta = db.Column(db.String(20))
+    ata = db.Column(db.String(20))
+    transit_status = db.Column(db.String(100))
+    transport = db.Column(db.String(100))
+    source = db.Column(db.String(100))
+    notes = db.Column(db.Text)
+    archived_at = db.Column(db.DateTime)
+    tiered_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class ColdWarehouseStock(db.Model):
+    __bind_key__ = 'archive'
+    __tablename__ = 'cold_warehouse_stock'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    order_number = db.Column(db.String(50), nullable=False, index=True)
+    product_name = db.Column(db.String(100), nullable=False)
+    quantity = db.Column(db.String(50), nullable=False)
+    ata = db.Column(db.String(10))
+    transit_status = db.Column(db.String(20))
+    notes = db.Column(db.String(120))
+    transport = db.Column(db.String(20))
+    is_manual = db.Column(db.Boolean)
+    pod_filename = db.Column(db.String(120))
+    warehouse_address = db.Column(db.String(255))
+    client = db.Column(db.String(255))
+    pos_no = db.Column(db.String(50))
+    customer_ref = db.Column(db.String(50))
+    is_archived = db.Column(db.Boolean)
+    archived_at = db.Column(db.DateTime)
+    shipment_id = db.Column(db.Integer)
+    tiered_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class ColdStockReportEntry(db.Model):
+    __bind_key__ = 'archive'
+    __tablename__ = 'cold_stock_report_entry'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    stage = db.Column(db.String(20))
+    entrance_date = db.Column(db.Date)
+    article_batch = db.Column(db.String(50))
+    colli = db.Column(db.Integer)
+    packing = db.Column(db.String(50))
+    pcs = db.Column(db.Integer)
+    colli_per_pal = db.Column(db.Integer)
+    pcs_total = db.Column(db.Integer)
+    pal = db.Column(db.Integer)
+    product = db.Column(db.String(100))
+    gross_kg = db.Column(db.Float)
+    net_kg = db.Column(db.Float)
+    sender = db.Column(db.String(100))
+    customs_status = db.Column(db.String(10))
+    stockref = db.Column(db.String(50))
+    warehouse_address = db.Column(db.String(255))
+    client = db.Column(db.String(255))
+    pos_no = db.Column(db.String(50))
+    customer_ref = db.Column(db.String(50))
+    related_order_id = db.Column(db.Integer, index=True)  # ColdWarehouseStock.id
+    tiered_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,70 @@
+# app/pooling.py
+"""
+Connection pool options from the environment, and fork-safe engines.
+
+Each gunicorn worker is its own process with its own pool per engine, so the
+database sees workers x (pool size + overflow) connections per engine. The
+defaults size the pool to the worker model: GUNICORN_THREADS request threads
+plus two for the background threads (daily refresh, WAL checkpoint, import
+jobs). Env variables:
+
+  DB_POOL_SIZE      connections kept open (default GUNICORN_THREADS + 2)
+  DB_MAX_OVERFLOW   extra connections under burst (default 5)
+  DB_POOL_TIMEOUT   seconds to wait for a free connection (default 30)
+  DB_POOL_RECYCLE   reconnect after this many seconds, -1 = never
+                    (default 1800; server databases only)
+  DB_POOL_PRE_PING  test a connection on checkout (default: on for server
+                    databases, off for SQLite files)
+
+In-memory SQLite keeps Flask-SQLAlchemy's single static connection, which
+is never disposed.
+
+`gunicorn --preload` imports the app once in the master, and the workers
+share that code copy-on-write. Pooled connections must not cross the fork,
+because two processes would then talk over one socket or SQLite handle.
+install_fork_safety() disposes the pools once setup is done (create_all,
+pragmas). It also registers an after-fork hook that drops, without
+closing, any connection a child inherits.
+"""
+import os
+from typing import Any, Dict
+
+from sqlalchemy.engine import make_url
+
+
+def engine_options(url, config) -> Dict[str, Any]:
+    """create_engine() pool arguments for `url` from the DB_POOL_* settings in `config`."""
+    url = make_url(url)
+    sqlite = url.get_backend_name() == 'sqlite'
+    if sqlite and url.database in (None, '', ':memory:'):
+        return {}
+    options: Dict[str, Any] = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+    }
+    pre_ping = config.get('DB_POOL_PRE_PING')
+    if pre_ping if pre_ping is not None else not sqlite:
+        options['pool_pre_ping'] = True
+    if not sqlite and config['DB_POOL_RECYCLE'] > 0:
+        options['pool_recycle'] = config['DB_POOL_RECYCLE']
+    return options
+
+
+def dispose_engines(app, db, close: bool = True) -> None:
+    """Dispose the pools of every engine (binds and the read engine); close=False just forgets them."""
+    with app.app_context():
+        engines = list(db.engines.values())
+    if app.extensions.get('read_engine') is not None:
+        engines.append(app.extensions['read_engine'])
+    for engine in engines:
+        if engine.dialect.name == 'sqlite' and engine.url.database in (None, '', ':memory:'):
+            continue  # its one static connection is the database
+        engine.dispose(close=close)
+
+
+def install_fork_safety(app, db) -> None:
+    """Drop the setup connections now and any inherited ones in forked children."""
+    dispose_engines(app, db)
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=lambda: dispose_engines(app, db, close=False))
@@ -0,0 +1,210 @@
+# app/query_stats.py
+"""
+Aggregated SQL statement statistics, merged across gunicorn workers.
+
+With QUERY_STATS=true, the shared statement timer (app/db_timing.py)
+reports every statement the process runs: requests, CLI and background
+threads alike. Each statement is aggregated under its normalized text, with
+literals, bound values and IN lists folded:
+
+  SELECT ... WHERE "order".id IN (?, ?, ?) LIMIT ? OFFSET ?
+  -> SELECT ... WHERE "order".id IN (?, ...) LIMIT ? OFFSET ?
+
+For every statement it keeps calls, total and max time, and rows. Rows is
+the driver's rowcount: rows written for INSERT/UPDATE/DELETE, and rows
+returned where the driver knows it (psycopg2 does; SQLite reports nothing
+for SELECT).
+
+Each worker keeps its own counters in memory. after_request adds them to a
+shared SQLite file (QUERY_STATS_PATH, default instance/query_stats.db) at
+most every QUERY_STATS_FLUSH_SECONDS, keyed by UTC day and statement, using
+`INSERT ... ON CONFLICT DO UPDATE`. All workers therefore sum into the same
+rows. Days older than QUERY_STATS_KEEP_DAYS are pruned at flush time. The
+admin page /activity_logs/queries shows one day sorted by total time, with
+reset and CSV download. Per-request numbers are in app/sql_metrics.py.
+
+Stats are best-effort. A flush that fails is logged and its counts are
+dropped. A process holds at most MAX_STATEMENTS distinct statements; the
+rest are counted under '<other>'.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import UTC, datetime, timedelta
+from typing import Dict, List, Optional
+
+from flask import current_app
+
+from app import db_timing
+from app.sqlite_profile import apply_pragmas
+
+MAX_STATEMENTS = 2000
+OTHER = '<other>'
+SORT_COLUMNS = ('total_ms', 'calls', 'mean_ms', 'max_ms', 'rows')
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_PARAM = re.compile(r"%\(\w+\)s|%s|(?<!:):\w+|\$\d+")  # non-qmark paramstyles
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS query_stats (
+    day       TEXT    NOT NULL,
+    statement TEXT    NOT NULL,
+    calls     INTEGER NOT NULL,
+    total_ms  REAL    NOT NULL,
+    max_ms    REAL    NOT NULL,
+    rows      INTEGER NOT NULL,
+    PRIMARY KEY (day, statement)
+)
+"""
+_UPSERT = """
+INSERT INTO query_stats (day, statement, calls, total_ms, max_ms, rows) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (day, statement) DO UPDATE SET
+    calls = calls + excluded.calls,
+    total_ms = total_ms + excluded.total_ms,
+    max_ms = MAX(max_ms, excluded.max_ms),
+    rows = rows + excluded.rows
+"""
+
+_lock = threading.Lock()
+_pending: Dict[str, List[float]] = {}  # statement -> [calls, total_s, max_s, rows]
+_last_flush = time.monotonic()
+
+
+def normalize(statement: str) -> str:
+    """Statement text with literals and bound values as '?', IN lists folded, whitespace collapsed."""
+    s = _STRING.sub('?', statement)
+    s = _PARAM.sub('?', s)
+    s = _NUMBER.sub('?', s)
+    s = _SPACE.sub(' ', s).strip()
+    return _IN_LIST.sub('(?, ...)', s)
+
+
+def record(statement: str, seconds: float, rows: int) -> None:
+    """Add one execution of `statement` to this process's pending counters."""
+    key = normalize(statement)
+    with _lock:
+        entry = _pending.get(key)
+        if entry is None:
+            if len(_pending) >= MAX_STATEMENTS:
+                key = OTHER
+                entry = _pending.setdefault(OTHER, [0, 0.0, 0.0, 0])
+            else:
+                entry = _pending[key] = [0, 0.0, 0.0, 0]
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+        entry[3] += max(rows, 0)
+
+
+def _timed(cursor, statement, parameters, executemany, seconds):
+    record(statement, seconds, getattr(cursor, 'rowcount', -1) or 0)
+
+
+def install_listeners(enabled: bool) -> None:
+    """Subscribe to (or leave) the shared statement timer."""
+    if enabled:
+        db_timing.subscribe(_timed)
+    else:
+        db_timing.unsubscribe(_timed)
+
+
+def _today() -> str:
+    return datetime.now(UTC).date().isoformat()
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=5.0)
+    apply_pragmas(conn, {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': '5000'})
+    conn.execute(_SCHEMA)
+    return conn
+
+
+def flush(app) -> int:
+    """Add this process's pending counters to the shared file. Returns the number of statements written."""
+    global _last_flush
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+        _last_flush = time.monotonic()
+    if not pending:
+        return 0
+    day = _today()
+    oldest = (datetime.now(UTC).date() - timedelta(days=app.config['QUERY_STATS_KEEP_DAYS'])).isoformat()
+    try:
+        conn = _connect(app.config['QUERY_STATS_PATH'])
+        try:
+            with conn:
+                conn.executemany(_UPSERT, [
+                    (day, key, calls, total * 1000, peak * 1000, rows)
+                    for key, (calls, total, peak, rows) in pending.items()
+                ])
+                conn.execute("DELETE FROM query_stats WHERE day < ?", (oldest,))
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        app.logger.warning(f"Query stats flush dropped {len(pending)} statements: {e}")
+        return 0
+    return len(pending)
+
+
+def flush_periodically(response):
+    """after_request hook: flush at most every QUERY_STATS_FLUSH_SECONDS."""
+    app = current_app._get_current_object()
+    if app.config.get('QUERY_STATS') and time.monotonic() - _last_flush >= app.config['QUERY_STATS_FLUSH_SECONDS']:
+        flush(app)
+    return response
+
+
+def days(app) -> List[str]:
+    """Days with stats in the shared file, newest first."""
+    if not os.path.exists(app.config['QUERY_STATS_PATH']):
+        return []
+    conn = _connect(app.config['QUERY_STATS_PATH'])
+    try:
+        return [r[0] for r in conn.execute("SELECT DISTINCT day FROM query_stats ORDER BY day DESC")]
+    finally:
+        conn.close()
+
+
+def load(app, day: Optional[str] = None, sort: str = 'total_ms', limit: Optional[int] = None) -> List[dict]:
+    """One day's statements (default today) from the shared file, most expensive first."""
+    if sort not in SORT_COLUMNS:
+        sort = 'total_ms'
+    if not os.path.exists(app.config['QUERY_STATS_PATH']):
+        return []
+    conn = _connect(app.config['QUERY_STATS_PATH'])
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute(
+            f"SELECT statement, calls, total_ms, total_ms / calls AS mean_ms, max_ms, rows "
+            f"FROM query_stats WHERE day = ? ORDER BY {sort} DESC LIMIT ?",
+            (day or _today(), -1 if limit is None else limit),
+        ).fetchall()
+    finally:
+        conn.close()
+    return [dict(r) for r in rows]
+
+
+def reset(app) -> None:
+    """Forget everything: this process's pending counters and the shared file's rows."""
+    with _lock:
+        _pending.clear()
+    conn = _connect(app.config['QUERY_STATS_PATH'])
+    try:
+        with conn:
+            conn.execute("DELETE FROM query_stats")
+    finally:
+        conn.close()
+
+
+def init_query_stats(app) -> None:
+    """Register the flush hook and attach the listeners when QUERY_STATS is on."""
+    app.after_request(flush_periodically)
+    install_listeners(app.config.get('QUERY_STATS', False))
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_pending.clear)  # the master's counters stay with the master
@@ -0,0 +1,110 @@
+# app/read_routing.py
+"""
+Read/write engine split: GET requests read through a separate engine.
+
+With DB_READ_ROUTING=true, the session routes statements on the main
+database by request:
+
+  GET/HEAD reads             -> read engine
+  flushes, INSERT/UPDATE/DELETE, every other method, CLI and threads -> primary
+
+The read engine is READ_DATABASE_URL when set (a PostgreSQL replica). For a
+SQLite file it defaults to the same file opened as a `mode=ro` URI with
+`PRAGMA query_only`. Those connections can never take the write lock, and
+in WAL mode they never wait for a writer. Other backends without
+READ_DATABASE_URL keep a single engine. The archive bind is not routed.
+
+Overrides:
+  use_primary()          send the rest of this request's reads to the primary
+  @primary_reads         the same for a whole view (GET views that write)
+
+Read-your-writes: a request that wrote stamps the user's session cookie. For
+READ_YOUR_WRITES_SECONDS after that, the user's GETs read from the primary,
+so a replica that lags behind never hides a change the user just posted.
+"""
+import time
+from functools import wraps
+from typing import Optional
+
+import sqlalchemy as sa
+from flask import current_app, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql.dml import UpdateBase
+
+from app.pooling import engine_options
+from app.sqlite_profile import install_profile
+
+_READ_METHODS = ('GET', 'HEAD')
+_WROTE_KEY = '_db_wrote_at'
+
+
+def read_url_for(app) -> Optional[str]:
+    """URL of the read engine: READ_DATABASE_URL, a read-only URI of a SQLite file, or None."""
+    explicit = app.config.get('READ_DATABASE_URL')
+    if explicit:
+        return explicit
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        return None
+    return f"sqlite:///file:{url.database}?mode=ro&uri=true"
+
+
+def init_read_routing(app, db) -> None:
+    """(Re)create the read engine, app.extensions['read_engine'] (None when routing is off)."""
+    app.extensions['read_engine'] = None
+    url = read_url_for(app) if app.config.get('DB_READ_ROUTING') else None
+    if url is None:
+        return
+    engine = sa.create_engine(url, **engine_options(url, app.config))
+    if engine.dialect.name == 'sqlite':
+        pragmas = {k: v for k, v in app.config.get('SQLITE_PRAGMAS', {}).items() if k != 'journal_mode'}
+        install_profile(engine, {**pragmas, 'query_only': 'ON'})
+    app.extensions['read_engine'] = engine
+
+
+def stamp_writes(response):
+    """after_request hook: remember in the session cookie that this user just wrote."""
+    if getattr(request, '_db_wrote', False) and current_app.extensions.get('read_engine') is not None:
+        session[_WROTE_KEY] = time.time()
+    return response
+
+
+def use_primary() -> None:
+    """Read from the primary for the rest of the current request."""
+    request._db_primary = True
+
+
+def primary_reads(view):
+    """View decorator: the view reads from the primary (for GET views that also write)."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        use_primary()
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def _reads_from_replica() -> bool:
+    if not has_request_context() or request.method not in _READ_METHODS:
+        return False
+    if getattr(request, '_db_primary', False) or getattr(request, '_db_wrote', False):
+        return False
+    wrote_at = session.get(_WROTE_KEY)
+    return not (wrote_at and time.time() - wrote_at < current_app.config.get('READ_YOUR_WRITES_SECONDS', 5))
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that sends request reads of the main database to the read engine."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is not None or engine is not self._db.engines.get(None):
+            return engine
+        if self._flushing or isinstance(clause, UpdateBase):
+            if has_request_context():
+                request._db_wrote = True  # later reads of this request see its own writes
+            return engine
+        read_engine = current_app.extensions.get('read_engine')
+        if read_engine is not None and _reads_from_replica():
+            return read_engine
+        return engine
@@ -0,0 +1,218 @@
+# app/rollups.py
+"""
+Transit lead-time rollup for the analytics page.
+
+Each shipment contributes one sample (TransitSample): the number of days from
+ETD to ATA, or to ETA while it has not arrived, filed under its transport,
+its ETD month and a histogram bucket. TransitRollup holds n / sum / sum of
+squares per (transport, month, bucket). Averages, variances and monthly
+trends are read from those few hundred rows.
+
+Samples are keyed by shipment id, which is the Order row's id: stocking or
+delivering an order only changes the row's stage, so the completed lead
+time stays in the rollup. A sample also keeps the buyer,
+product and parsed ETA/ATA, which app/analytics.py (percentiles, ETA
+slippage) and app/eta.py (ETA predictor) read; changes to those alone
+rewrite the sample without touching the rollup.
+
+sync_samples() compares the current Order rows with their stored samples.
+It writes only the differences and applies the matching +/- deltas to the
+rollup as atomic increments. It runs:
+  - after every ORM flush that adds an order or changes ETD/ETA/ATA/transport/buyer/product,
+  - after the Core inserts/updates of the bulk import,
+  - from rebuild_rollup() (`flask rebuild-rollups` and the daily job). That
+    also drops samples whose shipment is gone and re-aggregates the rollup
+    from the samples.
+"""
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, event, exists, func, insert, inspect, select, update
+from sqlalchemy.orm import Session
+
+from app.database import db
+from app.models import Order, Shipment, TransitRollup, TransitSample
+from app.utils.dates import parse_date, utcnow
+
+# Upper bounds (days, inclusive) of the histogram buckets; the last bucket is open-ended
+HISTOGRAM_EDGES = (7, 14, 21, 30, 45, 60, 90)
+HISTOGRAM_LABELS = tuple(
+    f"{lo}-{hi}" for lo, hi in zip((0,) + tuple(e + 1 for e in HISTOGRAM_EDGES), HISTOGRAM_EDGES)
+) + (f"{HISTOGRAM_EDGES[-1] + 1}+",)
+
+_WATCHED = ('etd', 'eta', 'ata', 'transport', 'buyer', 'product_name')
+_FIELDS = ('transport', 'month', 'days', 'bucket', 'buyer', 'eta', 'ata', 'product')
+
+
+def lead_time_sample(transport, etd, eta, ata) -> Optional[Tuple[str, str, int, int]]:
+    """(transport, month, days, bucket) for an order's dates, or None if they do not give a lead time."""
+    start = parse_date(etd)
+    end = parse_date(ata) or parse_date(eta)
+    transport = (transport or '').strip()
+    if not transport or start is None or end is None or end < start:
+        return None
+    days = (end - start).days
+    return transport, start.strftime('%Y-%m'), days, bisect_left(HISTOGRAM_EDGES, days)
+
+
+def _sample_row(r) -> Optional[tuple]:
+    """The TransitSample fields (_FIELDS order) for an order row, or None."""
+    sample = lead_time_sample(r.transport, r.etd, r.eta, r.ata)
+    if sample is None:
+        return None
+    return sample + ((r.buyer or '').strip() or None, parse_date(r.eta), parse_date(r.ata),
+                     (r.product_name or '').strip() or None)
+
+
+def _bump(executor, deltas: Dict[tuple, List[int]]) -> None:
+    """Add (n, sum, sum of squares) deltas to the rollup rows, creating rows as needed."""
+    for (transport, month, bucket), (dn, dsum, dsq) in deltas.items():
+        if not (dn or dsum or dsq):
+            continue
+        key = (TransitRollup.transport == transport, TransitRollup.month == month, TransitRollup.bucket == bucket)
+        res = executor.execute(
+            update(TransitRollup).where(*key).values(
+                n=TransitRollup.n + dn,
+                sum_days=TransitRollup.sum_days + dsum,
+                sum_sq_days=TransitRollup.sum_sq_days + dsq,
+            ).execution_options(synchronize_session=False)
+        )
+        if res.rowcount == 0:
+            executor.execute(insert(TransitRollup).values(
+                transport=transport, month=month, bucket=bucket, n=dn, sum_days=dsum, sum_sq_days=dsq,
+            ))
+
+
+def sync_samples(*criteria, executor=None) -> int:
+    """
+    Bring the samples of the Order rows matching `criteria` up to date and
+    apply the difference to the rollup. Caller commits. Returns rows changed.
+    """
+    executor = executor if executor is not None else db.session
+    rows = executor.execute(
+        select(Order.id.label('shipment_id'), Order.transport, Order.etd, Order.eta, Order.ata, Order.buyer,
+               Order.product_name)
+        .where(*criteria)
+    ).all()
+    if not rows:
+        return 0
+    current = {
+        sid: tuple(sample)
+        for sid, *sample in executor.execute(
+            select(TransitSample.shipment_id, *(getattr(TransitSample, f) for f in _FIELDS))
+            .where(TransitSample.shipment_id.in_({r.shipment_id for r in rows}))
+        )
+    }
+
+    deltas: Dict[tuple, List[int]] = {}
+
+    def add(sample, sign):
+        transport, month, days, bucket = sample[:4]
+        acc = deltas.setdefault((transport, month, bucket), [0, 0, 0])
+        acc[0] += sign
+        acc[1] += sign * days
+        acc[2] += sign * days * days
+
+    changed, now = 0, utcnow()
+    for r in rows:
+        old, new = current.get(r.shipment_id), _sample_row(r)
+        if old == new:
+            continue
+        changed += 1
+        if (old and old[:4]) != (new and new[:4]):
+            if old:
+                add(old, -1)
+            if new:
+                add(new, +1)
+        if old and new:
+            executor.execute(
+                update(TransitSample).where(TransitSample.shipment_id == r.shipment_id)
+                .values(synced_at=now, **dict(zip(_FIELDS, new)))
+                .execution_options(synchronize_session=False)
+            )
+        elif new:
+            executor.execute(insert(TransitSample).values(
+                shipment_id=r.shipment_id, synced_at=now, **dict(zip(_FIELDS, new)),
+            ))
+        else:
+            executor.execute(
+                delete(TransitSample).where(TransitSample.shipment_id == r.shipment_id)
+                .execution_options(synchronize_session=False)
+            )
+        current[r.shipment_id] = new
+    _bump(executor, deltas)
+    return changed
+
+
+def rebuild_rollup(batch_size: int = 1000) -> Dict[str, int]:
+    """Drop orphan samples, re-sync every order (in id batches), re-aggregate the rollup. Commits."""
+    pruned = db.session.execute(
+        delete(TransitSample)
+        .where(~exists().where(Shipment.id == TransitSample.shipment_id))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    synced, last_id = 0, 0
+    while True:
+        ids = db.session.execute(
+            select(Order.id).where(Order.id > last_id).order_by(Order.id).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            break
+        synced += sync_samples(Order.id.in_(ids))
+        last_id = ids[-1]
+    db.session.execute(delete(TransitRollup))
+    db.session.execute(insert(TransitRollup).from_select(
+        ['transport', 'month', 'bucket', 'n', 'sum_days', 'sum_sq_days'],
+        select(
+            TransitSample.transport, TransitSample.month, TransitSample.bucket, func.count(),
+            func.sum(TransitSample.days), func.sum(TransitSample.days * TransitSample.days),
+        ).group_by(TransitSample.transport, TransitSample.month, TransitSample.bucket),
+    ))
+    db.session.commit()
+    return {'pruned': pruned, 'synced': synced}
+
+
+def _stats(n: int, total: int, total_sq: int) -> dict:
+    mean = total / n
+    variance = max(total_sq / n - mean * mean, 0.0)
+    return {'n': n, 'mean': round(mean, 2), 'variance': round(variance, 2), 'stddev': round(variance ** 0.5, 2)}
+
+
+def transit_efficiency() -> dict:
+    """Per-transport mean/variance/histogram and per-month means, from the rollup rows."""
+    by_transport: Dict[str, List[int]] = {}
+    histogram: Dict[str, List[int]] = {}
+    by_month: Dict[tuple, List[int]] = {}
+    for r in db.session.execute(select(TransitRollup).where(TransitRollup.n > 0)).scalars():
+        for acc in (by_transport.setdefault(r.transport, [0, 0, 0]),
+                    by_month.setdefault((r.month, r.transport), [0, 0, 0])):
+            acc[0] += r.n
+            acc[1] += r.sum_days
+            acc[2] += r.sum_sq_days
+        histogram.setdefault(r.transport, [0] * len(HISTOGRAM_LABELS))[r.bucket] += r.n
+
+    transports = {
+        t: {**_stats(*acc), 'histogram': [{'days': label, 'n': n} for label, n in zip(HISTOGRAM_LABELS, histogram[t])]}
+        for t, acc in sorted(by_transport.items())
+    }
+    return {
+        'averages': {t: s['mean'] for t, s in transports.items()},
+        'transports': transports,
+        'trend': [
+            {'month': month, 'transport': t, **_stats(*acc)}
+            for (month, t), acc in sorted(by_month.items())
+        ],
+    }
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_samples(session, flush_context):
+    """Re-sample orders added or re-dated by this flush (their ids exist now)."""
+    ids = [
+        obj.id for obj in list(session.new) + list(session.dirty)
+        if isinstance(obj, Order) and obj.id is not None and (
+            obj in session.new or any(getattr(inspect(obj).attrs, a).history.has_changes() for a in _WATCHED)
+        )
+    ]
+    if ids:
+        sync_samples(Order.id.in_(ids), executor=session.connection())
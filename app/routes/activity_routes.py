@@ -1,5 +1,9 @@
-from flask import Blueprint, render_template
+import csv
+import io
+import re
+from flask import Blueprint, Response, current_app, render_template
 from flask_login import login_required
+from app import query_stats
 from app.models import ActivityLog, db
 from app.roles import role_required
 from flask import request, redirect, url_for, flash
@@ -38,4 +42,56 @@ def clear_logs():
     ActivityLog.query.delete()
     db.session.commit()
     flash("All activity logs have been cleared.", "success")
-    return redirect(url_for('activity.activity_logs'))
\ No newline at end of file
+    return redirect(url_for('activity.activity_logs'))
+
+
+# ---------------- Query statistics (app/query_stats.py) ----------------
+QUERY_STATS_PAGE_ROWS = 200
+_DAY_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+def _query_stats_args():
+    """(day, sort, days): ?day= (default: the newest day with stats), ?sort=, all days with stats."""
+    query_stats.flush(current_app)  # include this worker's latest counts
+    days = query_stats.days(current_app)
+    day = request.args.get('day', '')
+    sort = request.args.get('sort', 'total_ms')
+    day = day if _DAY_RE.match(day) else (days[0] if days else None)
+    return day, (sort if sort in query_stats.SORT_COLUMNS else 'total_ms'), days
+
+
+@activity_bp.route('/activity_logs/queries')
+@login_required
+@role_required('admin')
+def query_stats_page():
+    day, sort, days = _query_stats_args()
+    stats = query_stats.load(current_app, day, sort, limit=QUERY_STATS_PAGE_ROWS) if day else []
+    return render_template(
+        "query_stats.html", stats=stats, days=days, day=day, sort=sort,
+        enabled=current_app.config.get('QUERY_STATS'), limit=QUERY_STATS_PAGE_ROWS,
+    )
+
+
+@activity_bp.route('/activity_logs/queries.csv')
+@login_required
+@role_required('admin')
+def query_stats_csv():
+    day, sort, _ = _query_stats_args()
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(["day", "statement", "calls", "total_ms", "mean_ms", "max_ms", "rows"])
+    for r in query_stats.load(current_app, day, sort) if day else []:
+        writer.writerow([day, r["statement"], r["calls"], round(r["total_ms"], 3), round(r["mean_ms"], 3),
+                         round(r["max_ms"], 3), r["rows"]])
+    return Response(buf.getvalue(), mimetype="text/csv", headers={
+        "Content-Disposition": f'attachment; filename="query_stats_{day or "empty"}.csv"',
+    })
+
+
+@activity_bp.route('/activity_logs/queries/reset', methods=['POST'])
+@login_required
+@role_required('admin')
+def query_stats_reset():
+    query_stats.reset(current_app)
+    flash("Query statistics have been reset.", "success")
+    return redirect(url_for('activity.query_stats_page'))
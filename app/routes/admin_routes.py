@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, abort, current_app
 from flask_login import login_required, current_user
 from app.models import User, Order, db
+from app.read_routing import primary_reads
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -138,6 +139,7 @@ def _run_seed():
             return 0
 
 @admin_bp.route("/_admin/seed_if_empty", methods=["GET"])
+@primary_reads
 def admin_seed_if_empty():
     """
     Seed only if there are no orders.
@@ -151,6 +153,7 @@ def admin_seed_if_empty():
     return jsonify({"status": "seeded", "count": n})
 
 @admin_bp.route("/_admin/reset_demo", methods=["GET"])
+@primary_reads
 def admin_reset_demo():
     """
     Wipe orders and reseed.
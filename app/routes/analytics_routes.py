@@ -1,7 +1,7 @@
-from flask import Blueprint, render_template, jsonify
+from flask import Blueprint, render_template, jsonify, request
 from flask_login import login_required, current_user
-from sqlalchemy import text
-from app.database import db
+from app.analytics import GROUPS, lead_time_stats
+from app.rollups import transit_efficiency
 from app.utils.role_check import is_admin_or_superuser
 
 # ✅ Define blueprint BEFORE using it
@@ -18,27 +18,37 @@ def view_analytics():
 @analytics_bp.route('/api/transit_efficiency')
 @login_required
 def transit_efficiency_data():
+    """Lead-time averages, variances, histograms and monthly trend from transit_rollup."""
     if not is_admin_or_superuser(current_user):
         return jsonify({'error': 'Forbidden'}), 403
 
-    query = text("""
-        SELECT 
-            transport,
-            julianday(COALESCE(ata, eta)) - julianday(etd) AS delivery_days
-        FROM "order"
-        WHERE etd IS NOT NULL
-    """)
+    return jsonify(transit_efficiency())
 
-    result = db.session.execute(query)
-    data = {}
 
-    for row in result:
-        transport = row[0]
-        days = row[1]
-        if transport and days is not None:
-            data.setdefault(transport, []).append(days)
+def _lead_time_stats(section):
+    if not is_admin_or_superuser(current_user):
+        return jsonify({'error': 'Forbidden'}), 403
+    group_by = request.args.get('group_by', 'transport')
+    if group_by not in GROUPS:
+        return jsonify({'error': f"group_by must be one of: {', '.join(GROUPS)}"}), 400
 
-    # Calculate averages
-    averages = {k: round(sum(v) / len(v), 2) for k, v in data.items()}
+    stats = lead_time_stats(group_by)
+    return jsonify({
+        'group_by': group_by,
+        'tolerance_days': stats['tolerance_days'],
+        'groups': [{'key': g['key'], **g[section]} for g in stats['groups']],
+    })
 
-    return jsonify(averages)
+
+@analytics_bp.route('/api/lead_times')
+@login_required
+def lead_times_data():
+    """Lead-time n/mean/p50/p90/p95 per ?group_by=transport|buyer|month."""
+    return _lead_time_stats('lead')
+
+
+@analytics_bp.route('/api/eta_slippage')
+@login_required
+def eta_slippage_data():
+    """ATA - ETA percentiles, on-time rate and histogram per ?group_by=transport|buyer|month."""
+    return _lead_time_stats('slippage')
@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from flask_login import login_user, logout_user, login_required, current_user
 from app.models import User, db
+from app.read_routing import primary_reads
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -52,6 +53,7 @@ def login():
 
 
 @auth_bp.route('/demo')
+@primary_reads
 def demo_enter():
     """Direct demo entry — always resets session and auto-logs in as demo user."""
     from flask import current_app
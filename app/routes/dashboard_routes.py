@@ -1,11 +1,18 @@
 from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify
 from flask_login import login_required, current_user
-from app.models import Order, WarehouseStock, DeliveredGoods
+from sqlalchemy import select, true
+from app.models import Order
 from app.decorators import role_required
 from app.database import db
 from datetime import datetime, date
 from app.roles import can_view_all
 from app.utils.logging import log_activity
+from app.counters import stage_totals
+from app.kpi import kpi_sums, last_month_start
+from app.shipments import DELIVERED, TRANSIT, WAREHOUSE
+from app.scoped_query import ScopedQuery
+from app.snapshot import order_view
+from app.transactions import run_in_transaction
 
 
 dashboard_bp = Blueprint('dashboard', __name__)
@@ -43,23 +50,13 @@ def index():
 @dashboard_bp.route('/dashboard')
 @login_required
 def dashboard():
-    from app.roles import can_view_all
-    from app.models import Order, WarehouseStock, DeliveredGoods
-
-    if can_view_all(current_user.role):
-        in_transit_count = Order.query.count()
-        warehouse_count = WarehouseStock.query.filter_by(is_archived=False).count()
-        delivered_count = DeliveredGoods.query.count()
-    else:
-        in_transit_count = Order.query.filter_by(user_id=current_user.id).count()
-        warehouse_count = WarehouseStock.query.filter_by(user_id=current_user.id, is_archived=False).count()
-        delivered_count = DeliveredGoods.query.filter_by(user_id=current_user.id).count()
+    totals = stage_totals(None if can_view_all(current_user.role) else current_user.id)
 
     return render_template(
         'dashboard.html',
-        in_transit_count=in_transit_count,
-        warehouse_count=warehouse_count,
-        delivered_count=delivered_count,
+        in_transit_count=totals[TRANSIT],
+        warehouse_count=totals[WAREHOUSE],
+        delivered_count=totals[DELIVERED],
         now=datetime.now()
     )
 
@@ -73,9 +70,13 @@ def delete_order(order_id):
         flash("Unauthorized delete attempt.", "error")
         return redirect(url_for('dashboard.dashboard'))
 
-    db.session.delete(order)
-    db.session.commit()
-    log_activity("Delete Order (Admin)", f"#{order.order_number}")
+    order_number = order.order_number
+
+    def work():
+        db.session.delete(order)
+        log_activity("Delete Order (Admin)", f"#{order_number}", commit=False)
+
+    run_in_transaction(work)
     flash('Order deleted successfully.', 'success')
     return redirect(url_for('dashboard.dashboard'))
 
@@ -87,30 +88,33 @@ def add_order():
     from app.utils.products import add_product_if_new
 
     form = request.form
-    new_order = Order(
-        order_date=form.get("order_date"),
-        order_number=form.get("order_number"),
-        product_name=form.get("product_name"),
-        buyer=form.get("buyer"),
-        responsible=form.get("responsible"),
-        quantity=form.get("quantity"),
-        required_delivery=form.get("required_delivery"),
-        terms_of_delivery=form.get("terms_of_delivery"),
-        payment_date=form.get("payment_date"),
-        etd=form.get("etd"),
-        eta=form.get("eta"),
-        ata=form.get("ata"),
-        transit_status=form.get("transit_status"),
-        transport=form.get("transport"),
-        user_id=current_user.id
-    )
+
+    fields = {
+        "order_date": form.get("order_date"),
+        "order_number": form.get("order_number"),
+        "product_name": form.get("product_name"),
+        "buyer": form.get("buyer"),
+        "responsible": form.get("responsible"),
+        "quantity": form.get("quantity"),
+        "required_delivery": form.get("required_delivery"),
+        "terms_of_delivery": form.get("terms_of_delivery"),
+        "payment_date": form.get("payment_date"),
+        "etd": form.get("etd"),
+        "eta": form.get("eta"),
+        "ata": form.get("ata"),
+        "transit_status": form.get("transit_status"),
+        "transport": form.get("transport"),
+        "user_id": current_user.id,
+    }
 
     # ✅ Add the new product to the list if not already present
-    add_product_if_new(new_order.product_name)
+    add_product_if_new(fields['product_name'])
+
+    def work():
+        db.session.add(Order(**fields))
+        log_activity("Add Order", f"#{fields['order_number']}", commit=False)
 
-    db.session.add(new_order)
-    db.session.commit()
-    log_activity("Add Order", f"#{new_order.order_number}")
+    run_in_transaction(work)
 
     return jsonify({"success": True})
 
@@ -123,74 +127,31 @@ def add_order():
 @login_required
 def api_kpi():
     """Return KPI counts + month-over-month dynamics for the 4 dashboard cards."""
-    from datetime import date, timedelta
+    from datetime import timedelta
 
     today = date.today()
     first_this = today.replace(day=1)
-    first_last = (first_this - timedelta(days=1)).replace(day=1)
-    last_last   = first_this - timedelta(days=1)
-
-    def pd(s):
-        """Parse a stored date string to date or None."""
-        if not s:
-            return None
-        for fmt in ("%d.%m.%y", "%d.%m.%Y", "%Y-%m-%d"):
-            try:
-                return datetime.strptime(s, fmt).date()
-            except ValueError:
-                pass
-        return None
+    last_last = first_this - timedelta(days=1)
 
     def pct(curr, prev):
         if prev == 0:
             return None
         return round((curr - prev) / prev * 100)
 
-    def in_range(d, lo, hi):
-        return d is not None and lo <= d <= hi
-
-    q  = Order.query
-    ws = WarehouseStock.query
-    dg = DeliveredGoods.query
-    if not can_view_all(current_user.role):
-        q  = q.filter_by(user_id=current_user.id)
-        ws = ws.filter_by(user_id=current_user.id)
-        dg = dg.filter_by(user_id=current_user.id)
-
-    orders    = q.all()
-    warehouse = ws.filter_by(is_archived=False).all()
-    delivered = dg.all()
-
-    # ── In Transit ──────────────────────────────────────────────────────────
-    transit_total = len(orders)
-    transit_this  = sum(1 for o in orders if in_range(pd(o.order_date), first_this, today))
-    transit_last  = sum(1 for o in orders if in_range(pd(o.order_date), first_last, last_last))
-
-    # ── Warehouse ────────────────────────────────────────────────────────────
-    wh_total = len(warehouse)
-    wh_this  = sum(1 for w in warehouse if in_range(pd(w.ata), first_this, today))
-    wh_last  = sum(1 for w in warehouse if in_range(pd(w.ata), first_last, last_last))
-
-    # ── Delivered ────────────────────────────────────────────────────────────
-    dg_total = len(delivered)
-    dg_this  = sum(1 for d in delivered if in_range(pd(d.delivery_date), first_this, today))
-    dg_last  = sum(1 for d in delivered if in_range(pd(d.delivery_date), first_last, last_last))
-
-    # ── Delayed (ETA passed, no ATA yet) ─────────────────────────────────────
-    def is_delayed(o):
-        eta = pd(o.eta)
-        return eta is not None and eta < today and not o.ata
-
-    delayed_total = sum(1 for o in orders if is_delayed(o))
+    scope = None if can_view_all(current_user.role) else current_user.id
+    totals = stage_totals(scope)
+    this_month = kpi_sums(first_this, today, scope)
+    last_month = kpi_sums(last_month_start(today), last_last, scope)
+
+    transit_total, wh_total, dg_total = totals[TRANSIT], totals[WAREHOUSE], totals[DELIVERED]
+    transit_this, transit_last = this_month["transit"], last_month["transit"]
+    wh_this, wh_last = this_month["warehouse"], last_month["warehouse"]
+    dg_this, dg_last = this_month["delivered"], last_month["delivered"]
+
+    # ── Delayed (ETA passed, no ATA yet; maintained flag, see app/status.py) ─
+    delayed_total = ScopedQuery(Order, scope).where(lambda s: s.where(Order.is_delayed == true())).count()
     # "became overdue this month" = eta within this month range and still no ata
-    delayed_this  = sum(1 for o in orders
-                        if pd(o.eta) is not None
-                        and in_range(pd(o.eta), first_this, today)
-                        and not o.ata)
-    delayed_last  = sum(1 for o in orders
-                        if pd(o.eta) is not None
-                        and in_range(pd(o.eta), first_last, last_last)
-                        and not o.ata)
+    delayed_this, delayed_last = this_month["delayed"], last_month["delayed"]
 
     return jsonify({
         "in_transit": {
@@ -224,12 +185,13 @@ def api_kpi():
 @login_required
 def api_years():
     """Return list of years that contain orders for the current viewer."""
-    q = Order.query
-    if not can_view_all(current_user.role):
-        q = q.filter_by(user_id=current_user.id)
+    scope = None if can_view_all(current_user.role) else current_user.id
+    view = order_view()
+    if view is not None:
+        return jsonify({"years": view.years(view.select(scope))})
 
     years = set()
-    for o in q:
+    for o in ScopedQuery(Order, scope).project(Order.order_date, Order.etd, Order.eta, Order.ata).all():
         for fld in ("order_date", "etd", "eta", "ata"):
             d = parse_date(getattr(o, fld))
             if d:
@@ -238,46 +200,60 @@ def api_years():
     return jsonify({"years": sorted(years, reverse=True)})
 
 
+# The columns _order_row() reads; the feed is built from Rows, not Order entities.
+_ORDER_ROW_COLUMNS = (
+    Order.id, Order.order_date, Order.order_number, Order.product_name, Order.buyer, Order.responsible,
+    Order.quantity, Order.required_delivery, Order.terms_of_delivery, Order.payment_date,
+    Order.etd, Order.eta, Order.ata, Order.transit_status, Order.transport,
+)
+
+
+def _order_row(o):
+    """One order in the shape dashboard.js expects."""
+    return {
+        "id": o.id,
+        "order_date": fmt(parse_date(o.order_date)),
+        "order_number": o.order_number,
+        "product_name": o.product_name,
+        "buyer": o.buyer,
+        "responsible": o.responsible,
+        "quantity": o.quantity,
+        "required_delivery": o.required_delivery or "",
+        "terms_of_delivery": o.terms_of_delivery or "",
+        "payment_date": fmt(parse_date(o.payment_date)),
+        "etd": fmt(parse_date(o.etd)),
+        "eta": fmt(parse_date(o.eta)),
+        "ata": fmt(parse_date(o.ata)),
+        "transit_status": o.transit_status or "",
+        "transport": o.transport or "",
+    }
+
+
 @dashboard_bp.get('/api/orders')
 @login_required
 def api_orders():
     """Return orders (optionally filtered by year) in a shape expected by dashboard.js."""
     year = request.args.get("year", type=int)
-
-    q = Order.query
-    if not can_view_all(current_user.role):
-        q = q.filter_by(user_id=current_user.id)
+    scope = None if can_view_all(current_user.role) else current_user.id
+
+    view = order_view()
+    if view is not None:
+        # Year membership and the newest-first order come from the snapshot arrays
+        ids = view.newest_first(view.select(scope, year)).tolist()
+        by_id = {}
+        for i in range(0, len(ids), 500):
+            chunk = select(*_ORDER_ROW_COLUMNS).where(Order.id.in_(ids[i:i + 500]))
+            by_id.update((r.id, r) for r in db.session.execute(chunk))
+        return jsonify({"orders": [_order_row(by_id[i]) for i in ids if i in by_id]})
 
     rows = []
-    for o in q:
-        od  = parse_date(getattr(o, "order_date"))
-        etd = parse_date(getattr(o, "etd"))
-        eta = parse_date(getattr(o, "eta"))
-        ata = parse_date(getattr(o, "ata"))
-
+    for o in ScopedQuery(Order, scope).project(*_ORDER_ROW_COLUMNS).all():
         # If a year is requested, include if ANY relevant date matches.
         if year is not None:
-            in_year = any(d and d.year == year for d in (od, etd, eta, ata))
-            if not in_year:
+            dates = (parse_date(getattr(o, fld)) for fld in ("order_date", "etd", "eta", "ata"))
+            if not any(d and d.year == year for d in dates):
                 continue
-
-        rows.append({
-            "id": o.id,
-            "order_date": fmt(od),
-            "order_number": o.order_number,
-            "product_name": o.product_name,
-            "buyer": o.buyer,
-            "responsible": o.responsible,
-            "quantity": o.quantity,
-            "required_delivery": o.required_delivery or "",
-            "terms_of_delivery": o.terms_of_delivery or "",
-            "payment_date": fmt(parse_date(getattr(o, "payment_date"))),
-            "etd": fmt(etd),
-            "eta": fmt(eta),
-            "ata": fmt(ata),
-            "transit_status": o.transit_status or "",
-            "transport": o.transport or "",
-        })
+        rows.append(_order_row(o))
 
     # Sort newest first by order_date (fallback to ETD), robust to blanks.
     def sort_key(r):
@@ -1,60 +1,86 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
+from flask import (
+    Blueprint, render_template, request, redirect, url_for, flash, current_app,
+    Response, stream_with_context,
+)
 from flask_login import login_required, current_user
-from app.models import db, DeliveredGoods, WarehouseStock, Order, StockReportEntry
+from app import lifecycle
+from app.scoped_query import ScopedQuery
+from app.tiering import search_cold_delivered
+from app.transactions import DatabaseBusy, run_in_transaction
+from app.models import db, DeliveredGoods, WarehouseStock, StockReportEntry
 from datetime import datetime
 from app.roles import can_edit, can_view_all
+from app.utils.dates import parse_date
 from app.utils.logging import log_activity
+from app.utils.xlsx_stream import XLSX_MIMETYPE, stream_xlsx, to_number
 from sqlalchemy import or_, func, extract
 
 delivered_bp = Blueprint('delivered', __name__)
 
-@delivered_bp.route('/delivered')
-@login_required
-def delivered():
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
+# Rows per fetch when streaming exports from a server-side cursor.
+EXPORT_YIELD_PER = 1000
 
-    # Filters
-    transport = request.args.get('transport')
-    month = request.args.get('month')
-    year = request.args.get('year')
-    search = request.args.get('search', '')
-    sort_key = request.args.get('sort', 'delivery_date')
-    sort_dir = request.args.get('direction', 'desc')
-
-    # Base query
-    if can_view_all(current_user.role):
-        query = DeliveredGoods.query
-    else:
-        query = DeliveredGoods.query.filter_by(user_id=current_user.id)
+
+def _delivered_query(args):
+    """Delivered goods for the current viewer, with the page's filters and sort applied."""
+    transport = args.get('transport')
+    month = args.get('month')
+    year = args.get('year')
+    search = args.get('search', '')
+    sort_key = args.get('sort', 'delivery_date')
+    sort_dir = args.get('direction', 'desc')
+
+    query = ScopedQuery.for_viewer(DeliveredGoods)
 
     # Apply filters
     if transport:
-        query = query.filter_by(transport=transport)
+        query.where(lambda s: s.where(DeliveredGoods.transport == transport))
     if month:
-        query = query.filter(extract('month', DeliveredGoods.delivery_date) == int(month))
+        month_n = int(month)
+        query.where(lambda s: s.where(extract('month', DeliveredGoods.delivery_date) == month_n))
     if year:
-        query = query.filter(extract('year', DeliveredGoods.delivery_date) == int(year))
+        year_n = int(year)
+        query.where(lambda s: s.where(extract('year', DeliveredGoods.delivery_date) == year_n))
     if search:
         like_term = f"%{search.lower()}%"
-        query = query.filter(or_(
+        query.where(lambda s: s.where(or_(
             func.lower(DeliveredGoods.order_number).like(like_term),
             func.lower(DeliveredGoods.product_name).like(like_term),
             func.lower(DeliveredGoods.notes).like(like_term)
-        ))
+        )))
 
     # Sorting logic
     sort_column = getattr(DeliveredGoods, sort_key, DeliveredGoods.delivery_date)
     if sort_dir == 'asc':
-        sort_order = sort_column.asc().nullslast()
+        query.order_by(lambda s: s.order_by(sort_column.asc().nullslast()))
     else:
-        sort_order = sort_column.desc().nullsfirst()
-    query = query.order_by(sort_order)
+        query.order_by(lambda s: s.order_by(sort_column.desc().nullsfirst()))
+
+    return query, sort_key, sort_dir
+
+
+# The columns delivered.html reads; the page renders Rows, not DeliveredGoods entities.
+_PAGE_COLUMNS = (
+    DeliveredGoods.id, DeliveredGoods.order_number, DeliveredGoods.product_name, DeliveredGoods.quantity,
+    DeliveredGoods.delivery_date, DeliveredGoods.delivery_source, DeliveredGoods.notes,
+    DeliveredGoods.pod_filename, DeliveredGoods.transport,
+)
 
 
-    pagination = query.paginate(page=page, per_page=per_page)
+@delivered_bp.route('/delivered')
+@login_required
+def delivered():
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 10, type=int)
+
+    query, sort_key, sort_dir = _delivered_query(request.args)
+
+    pagination = query.project(*_PAGE_COLUMNS).paginate(page=page, per_page=per_page)
     total_count = pagination.total
 
+    # Searches also look in the cold tier (rows older than COLD_AFTER_DAYS)
+    archived_items = search_cold_delivered(request.args.get('search', ''), current_user)
+
     # Reported Orders
     reported_order_numbers = set()
     for entry in StockReportEntry.query.all():
@@ -69,11 +95,46 @@ def delivered():
         per_page=per_page,
         total_count=total_count,
         reported_order_numbers=reported_order_numbers,
+        archived_items=archived_items,
         sort_key=sort_key,
         sort_dir=sort_dir
     )
 
 
+_EXPORT_COLUMNS = (
+    ('Order #',           DeliveredGoods.order_number),
+    ('Product',           DeliveredGoods.product_name),
+    ('Quantity',          DeliveredGoods.quantity),
+    ('Delivery Date',     DeliveredGoods.delivery_date),
+    ('Source',            DeliveredGoods.delivery_source),
+    ('Transport',         DeliveredGoods.transport),
+    ('Notes',             DeliveredGoods.notes),
+    ('Client',            DeliveredGoods.client),
+    ('Warehouse Address', DeliveredGoods.warehouse_address),
+    ('Pos No',            DeliveredGoods.pos_no),
+    ('Customer Ref',      DeliveredGoods.customer_ref),
+)
+
+
+@delivered_bp.route('/delivered/export.xlsx')
+@login_required
+def export_delivered_xlsx():
+    """Stream the filtered/sorted delivered table as an .xlsx download."""
+    query, _, _ = _delivered_query(request.args)
+    stmt = query.select(*(col for _, col in _EXPORT_COLUMNS)).execution_options(yield_per=EXPORT_YIELD_PER)
+
+    def rows():
+        for r in db.session.execute(stmt):
+            yield (r[0], r[1], to_number(r[2]), parse_date(r[3]) or r[3], *r[4:])
+
+    filename = f"delivered_{datetime.now():%Y%m%d}.xlsx"
+    return Response(
+        stream_with_context(stream_xlsx([h for h, _ in _EXPORT_COLUMNS], rows(), sheet_name='Delivered')),
+        mimetype=XLSX_MIMETYPE,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"', 'X-Accel-Buffering': 'no'},
+    )
+
+
 @delivered_bp.route('/restore_from_delivered', methods=['POST'])
 @login_required
 def restore_to_dashboard():
@@ -88,37 +149,23 @@ def restore_to_dashboard():
         if not item.user_id or item.user_id != current_user.id:
             return 'Unauthorized', 403
 
-    # Normalize transport
-    transport_value = (item.transport or "").strip()
-    if not transport_value:
-        transport_value = "Not specified"
+    order_number = item.order_number
+
+    def work():
+        status, _ = lifecycle.restore_delivered([item_id], current_user)[item_id]
+        if status != lifecycle.OK:
+            db.session.rollback()
+        else:
+            log_activity("Restore from Delivered", f"Order #{order_number}", commit=False)
+        return status
 
     try:
-        new_order = Order(
-            user_id=item.user_id or current_user.id,
-            order_date=datetime.now().strftime('%d.%m.%y'),
-            order_number=item.order_number,
-            product_name=item.product_name,
-            buyer="Restored",
-            responsible="Restored",
-            quantity=item.quantity,
-            required_delivery="",
-            terms_of_delivery="Restored",
-            payment_date="",
-            etd=datetime.now().strftime('%Y-%m-%d'),
-            eta=datetime.now().strftime('%Y-%m-%d'),
-            ata=datetime.now().strftime('%Y-%m-%d'),
-            transit_status="in process",
-            transport=transport_value
-        )
-
-        db.session.add(new_order)
-        db.session.delete(item)
-        db.session.commit()
-
-        log_activity("Restore from Delivered", f"Order #{item.order_number}")
+        if run_in_transaction(work) != lifecycle.OK:
+            return 'Unauthorized', 403
         return '', 200
 
+    except DatabaseBusy:
+        raise
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Restore error: {str(e)}")
@@ -136,14 +183,16 @@ def edit_delivered(item_id):
         return redirect(url_for('delivered.delivered'))
 
     if request.method == 'POST':
-        item.order_number = request.form.get('order_number')
-        item.product_name = request.form.get('product_name')
-        item.quantity = request.form.get('quantity')
-        item.delivery_date = request.form.get('delivery_date')
-        item.transport = request.form.get('transport')
-        item.notes = request.form.get('notes')
-        db.session.commit()
-        log_activity("Edit Delivered Item", f"#{item.order_number}")
+        def work():
+            item.order_number = request.form.get('order_number')
+            item.product_name = request.form.get('product_name')
+            item.quantity = request.form.get('quantity')
+            item.delivery_date = request.form.get('delivery_date')
+            item.transport = request.form.get('transport')
+            item.notes = request.form.get('notes')
+            log_activity("Edit Delivered Item", f"#{item.order_number}", commit=False)
+
+        run_in_transaction(work)
         flash("Delivered item updated successfully.", "success")
         return redirect(url_for('delivered.delivered'))
 
@@ -1,10 +1,14 @@
 from flask import Blueprint, request, jsonify, render_template, flash, redirect, url_for
 from flask_login import login_required, current_user
-from app.models import db, Order, DeliveredGoods, ArchivedOrder
+from app import lifecycle
+from app.models import db, Order
 from datetime import datetime
-from app.roles import can_view_all, can_edit
+from app.roles import can_edit
 from app.utils.products import add_product_if_new
 from app.utils.logging import log_activity
+from app.transactions import DatabaseBusy, run_in_transaction
+from app.read_routing import primary_reads
+from app.scoped_query import ScopedQuery
 from sqlalchemy.exc import SQLAlchemyError
 import os
 import re
@@ -115,32 +119,34 @@ def add_order():
         product_name = _clean_str(data.get('product_name'))
         add_product_if_new(product_name)
 
-        new_order = Order(
-            user_id=current_user.id,
-            order_date=order_date_s,
-            order_number=order_number,
-            product_name=product_name,
-            buyer=_clean_str(data.get('buyer')),
-            responsible=_clean_str(data.get('responsible')),
-            quantity=quantity,
-            required_delivery=required_delivery_s,
-            terms_of_delivery=_clean_str(data.get('terms_of_delivery')),
-            payment_date=payment_date_s,
-            etd=etd_s,
-            eta=eta_s,
-            ata=ata_s,
-            transit_status=_clean_str(data.get('transit_status')),
-            transport=_clean_str(data.get('transport'))
-        )
-
-        db.session.add(new_order)
-        db.session.commit()
-        log_activity("Add Order", f"#{new_order.order_number} – {product_name}")
+        def work():
+            db.session.add(Order(
+                user_id=current_user.id,
+                order_date=order_date_s,
+                order_number=order_number,
+                product_name=product_name,
+                buyer=_clean_str(data.get('buyer')),
+                responsible=_clean_str(data.get('responsible')),
+                quantity=quantity,
+                required_delivery=required_delivery_s,
+                terms_of_delivery=_clean_str(data.get('terms_of_delivery')),
+                payment_date=payment_date_s,
+                etd=etd_s,
+                eta=eta_s,
+                ata=ata_s,
+                transit_status=_clean_str(data.get('transit_status')),
+                transport=_clean_str(data.get('transport'))
+            ))
+            log_activity("Add Order", f"#{order_number} – {product_name}", commit=False)
+
+        run_in_transaction(work)
         return jsonify({'success': True, 'message': 'Order added successfully!'}), 200
 
     except ValueError:
         db.session.rollback()
         return jsonify({'success': False, 'message': 'Invalid input format. Check all fields.'}), 400
+    except DatabaseBusy:
+        raise
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': f'Error adding order: {str(e)}'}), 500
@@ -194,24 +200,25 @@ def edit_order(order_id):
         # Update fields
         product_name = _clean_str(data.get('product_name'))
         add_product_if_new(product_name)
-        order.product_name = product_name
-
-        order.order_date       = order_date_s
-        order.order_number     = _clean_str(data.get('order_number'))
-        order.buyer            = _clean_str(data.get('buyer'))
-        order.responsible      = _clean_str(data.get('responsible'))
-        order.quantity         = quantity
-        order.required_delivery= required_delivery_s
-        order.terms_of_delivery= _clean_str(data.get('terms_of_delivery'))
-        order.payment_date     = payment_date_s
-        order.etd              = etd_s
-        order.eta              = eta_s
-        order.ata              = ata_s
-        order.transit_status   = _clean_str(data.get('transit_status'))
-        order.transport        = _clean_str(data.get('transport'))
-
-        db.session.commit()
-        log_activity("Edit Order", f"#{order.order_number} – updated fields")
+
+        def work():
+            order.product_name      = product_name
+            order.order_date        = order_date_s
+            order.order_number      = _clean_str(data.get('order_number'))
+            order.buyer             = _clean_str(data.get('buyer'))
+            order.responsible       = _clean_str(data.get('responsible'))
+            order.quantity          = quantity
+            order.required_delivery = required_delivery_s
+            order.terms_of_delivery = _clean_str(data.get('terms_of_delivery'))
+            order.payment_date      = payment_date_s
+            order.etd               = etd_s
+            order.eta               = eta_s
+            order.ata               = ata_s
+            order.transit_status    = _clean_str(data.get('transit_status'))
+            order.transport         = _clean_str(data.get('transport'))
+            log_activity("Edit Order", f"#{order.order_number} – updated fields", commit=False)
+
+        run_in_transaction(work)
 
         # If the edit page submits via normal form post, redirect; if via AJAX, the redirect is ignored by fetch.
         if request.headers.get("X-Requested-With") == "XMLHttpRequest":
@@ -222,6 +229,8 @@ def edit_order(order_id):
     except ValueError:
         db.session.rollback()
         return jsonify({'success': False, 'message': 'Invalid input format. Check your fields.'}), 400
+    except DatabaseBusy:
+        raise
     except SQLAlchemyError as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': f'Database error: {str(e)}'}), 500
@@ -234,16 +243,23 @@ def edit_order(order_id):
 # ----------------------------
 @order_bp.route('/delete_order/<int:order_id>')
 @login_required
+@primary_reads
 def delete_order(order_id):
     try:
         order = Order.query.get_or_404(order_id)
         if order.user_id != current_user.id and not can_edit(current_user.role):
             return jsonify({'success': False, 'message': 'Permission denied.'}), 403
 
-        db.session.delete(order)
-        db.session.commit()
-        log_activity("Delete Order", f"#{order.order_number}")
+        order_number = order.order_number
+
+        def work():
+            db.session.delete(order)
+            log_activity("Delete Order", f"#{order_number}", commit=False)
+
+        run_in_transaction(work)
         return jsonify({'success': True, 'message': 'Order deleted successfully!'})
+    except DatabaseBusy:
+        raise
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': str(e)}), 400
@@ -254,10 +270,7 @@ def delete_order(order_id):
 @order_bp.route('/api/orders')
 @login_required
 def get_orders():
-    if can_view_all(current_user.role):
-        orders = Order.query.order_by(Order.order_date.asc()).all()
-    else:
-        orders = Order.query.filter_by(user_id=current_user.id).order_by(Order.order_date.asc()).all()
+    orders = ScopedQuery.for_viewer(Order).order_by(lambda s: s.order_by(Order.order_date.asc())).all()
 
     def get_delivery_year(order):
         try:
@@ -309,48 +322,26 @@ def deliver_direct(order_id):
         flash("You don't have permission to deliver this order.", "danger")
         return redirect(url_for('dashboard.dashboard'))
 
-    if not order.order_number:
-        flash("Order must have an order number to be delivered.", "warning")
-        return redirect(url_for('dashboard.dashboard'))
+    order_number = order.order_number
 
-    delivered_item = DeliveredGoods(
-        user_id=order.user_id,
-        order_number=order.order_number,
-        product_name=order.product_name,
-        quantity=order.quantity,
-        delivery_source="Direct from Transit",
-        delivery_date=datetime.now().strftime('%Y-%m-%d'),
-        notes="Delivered directly from dashboard",
-        transport=order.transport
-    )
-
-    archived_order = ArchivedOrder(
-        original_order_id=order.id,
-        user_id=order.user_id,
-        order_date=order.order_date,
-        order_number=order.order_number,
-        product_name=order.product_name,
-        buyer=order.buyer,
-        responsible=order.responsible,
-        quantity=order.quantity,
-        required_delivery=order.required_delivery,
-        terms_of_delivery=order.terms_of_delivery,
-        payment_date=order.payment_date,
-        etd=order.etd,
-        eta=order.eta,
-        ata=order.ata,
-        transit_status=order.transit_status,
-        transport=order.transport,
-        source='dashboard'
-    )
+    def work():
+        status, message = lifecycle.deliver_orders(
+            [order_id], current_user, allowed=lifecycle.editor_or_owner
+        )[order_id]
+        if status != lifecycle.OK:
+            db.session.rollback()
+            return message
+        log_activity("Deliver Order (Direct)", f"#{order_number} → Delivered from Dashboard", commit=False)
+        return None
 
     try:
-        db.session.add(archived_order)
-        db.session.add(delivered_item)
-        db.session.delete(order)
-        db.session.commit()
+        message = run_in_transaction(work)
+        if message:
+            flash(message, "warning")
+            return redirect(url_for('dashboard.dashboard'))
         flash("Order delivered and archived successfully!", "success")
-        log_activity("Deliver Order (Direct)", f"#{order.order_number} → Delivered from Dashboard")
+    except DatabaseBusy:
+        raise
     except Exception as e:
         db.session.rollback()
         flash(f"Error delivering order: {e}", "danger")
@@ -1,45 +1,49 @@
 from datetime import datetime, timedelta
 import os
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, make_response
+from flask import (
+    Blueprint, render_template, request, redirect, url_for, flash, jsonify, make_response, abort,
+    Response, stream_with_context,
+)
 from flask_login import login_required, current_user
-from sqlalchemy import or_, func
+from sqlalchemy import false, or_, func
 
-from app import db
-from app.models import Order, WarehouseStock, DeliveredGoods, StockReportEntry
+from app import db, lifecycle
+from app.models import Order, WarehouseStock, StockReportEntry, ColdWarehouseStock
 from app.roles import can_edit, can_view_all
+from app.scoped_query import ScopedQuery
+from app.tiering import find_delivered, find_stock
+from app.transactions import DatabaseBusy, run_in_transaction
+from app.utils.dates import parse_date
 from app.utils.logging import log_activity
+from app.utils.xlsx_stream import XLSX_MIMETYPE, stream_xlsx, to_number
 
-warehouse_bp = Blueprint('warehouse', __name__)
+# Rows per fetch when streaming exports from a server-side cursor.
+EXPORT_YIELD_PER = 1000
 
+warehouse_bp = Blueprint('warehouse', __name__)
 
-@warehouse_bp.route('/warehouse')
-@login_required
-def warehouse():
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-    search = request.args.get('search', '')
 
-    # NEW: sort parameters
-    sort_key = request.args.get('sort', 'ata')  # Default to ATA
-    sort_dir = request.args.get('direction', 'desc')
+def _warehouse_query(args):
+    """Active stock for the current viewer, with the page's search and sort applied."""
+    search = args.get('search', '')
+    sort_key = args.get('sort', 'ata')  # Default to ATA
+    sort_dir = args.get('direction', 'desc')
 
-    if can_view_all(current_user.role):
-        query = WarehouseStock.query.filter_by(is_archived=False)
-    else:
-        query = WarehouseStock.query.filter_by(is_archived=False, user_id=current_user.id)
+    query = ScopedQuery.for_viewer(WarehouseStock)
+    # == false() renders is_archived = 0, which ix_warehouse_stock_active matches; IS 0 does not
+    query.where(lambda s: s.where(WarehouseStock.is_archived == false()))
 
     if search:
         like_term = f"%{search.lower()}%"
-        query = query.filter(
+        query.where(lambda s: s.where(
             or_(
                 func.lower(WarehouseStock.order_number).like(like_term),
                 func.lower(WarehouseStock.product_name).like(like_term),
                 func.lower(WarehouseStock.notes).like(like_term),
             )
-        )
+        ))
 
-    # NEW: apply sorting
     sort_column_map = {
         'order_number': WarehouseStock.order_number,
         'product_name': WarehouseStock.product_name,
@@ -48,13 +52,31 @@ def warehouse():
         'transport':    WarehouseStock.transport,
     }
 
-    if sort_key in sort_column_map:
-        sort_column = sort_column_map[sort_key]
-        query = query.order_by(sort_column.asc() if sort_dir == 'asc' else sort_column.desc())
+    sort_column = sort_column_map.get(sort_key, WarehouseStock.ata)
+    if sort_key in sort_column_map and sort_dir == 'asc':
+        query.order_by(lambda s: s.order_by(sort_column.asc()))
     else:
-        query = query.order_by(WarehouseStock.ata.desc())
+        query.order_by(lambda s: s.order_by(sort_column.desc()))
+
+    return query, sort_key, sort_dir
+
+
+# The columns warehouse.html reads; the page renders Rows, not WarehouseStock entities.
+_PAGE_COLUMNS = (
+    WarehouseStock.id, WarehouseStock.order_number, WarehouseStock.product_name, WarehouseStock.quantity,
+    WarehouseStock.ata, WarehouseStock.notes, WarehouseStock.transport,
+)
+
 
-    pagination = query.paginate(page=page, per_page=per_page)
+@warehouse_bp.route('/warehouse')
+@login_required
+def warehouse():
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 10, type=int)
+
+    query, sort_key, sort_dir = _warehouse_query(request.args)
+
+    pagination = query.project(*_PAGE_COLUMNS).paginate(page=page, per_page=per_page)
     total_count = pagination.total
     warehouse_items = pagination.items
 
@@ -72,6 +94,39 @@ def warehouse():
     )
 
 
+_EXPORT_COLUMNS = (
+    ('Order #',           WarehouseStock.order_number),
+    ('Product',           WarehouseStock.product_name),
+    ('Quantity',          WarehouseStock.quantity),
+    ('ATA',               WarehouseStock.ata),
+    ('Transport',         WarehouseStock.transport),
+    ('Notes',             WarehouseStock.notes),
+    ('Client',            WarehouseStock.client),
+    ('Warehouse Address', WarehouseStock.warehouse_address),
+    ('Pos No',            WarehouseStock.pos_no),
+    ('Customer Ref',      WarehouseStock.customer_ref),
+)
+
+
+@warehouse_bp.route('/warehouse/export.xlsx')
+@login_required
+def export_warehouse_xlsx():
+    """Stream the filtered/sorted warehouse table as an .xlsx download."""
+    query, _, _ = _warehouse_query(request.args)
+    stmt = query.select(*(col for _, col in _EXPORT_COLUMNS)).execution_options(yield_per=EXPORT_YIELD_PER)
+
+    def rows():
+        for r in db.session.execute(stmt):
+            yield (r[0], r[1], to_number(r[2]), parse_date(r[3]) or r[3], *r[4:])
+
+    filename = f"warehouse_{datetime.now():%Y%m%d}.xlsx"
+    return Response(
+        stream_with_context(stream_xlsx([h for h, _ in _EXPORT_COLUMNS], rows(), sheet_name='Warehouse')),
+        mimetype=XLSX_MIMETYPE,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"', 'X-Accel-Buffering': 'no'},
+    )
+
+
 @warehouse_bp.route('/add_warehouse_manual', methods=['POST'])
 @login_required
 def add_warehouse_manual():
@@ -91,20 +146,23 @@ def add_warehouse_manual():
             flash("Quantity must be greater than 0", "danger")
             return redirect(url_for('warehouse.warehouse'))
 
-        new_item = WarehouseStock(
-            user_id=current_user.id,
-            order_number=order_number,
-            product_name=product_name,
-            quantity=quantity,
-            ata=ata,
-            transport=transport,
-            notes=notes,
-            is_manual=True,
-        )
-        db.session.add(new_item)
-        db.session.commit()
-        log_activity("Manual Warehouse Entry", f"#{order_number} – {product_name}")
+        def work():
+            db.session.add(WarehouseStock(
+                user_id=current_user.id,
+                order_number=order_number,
+                product_name=product_name,
+                quantity=quantity,
+                ata=ata,
+                transport=transport,
+                notes=notes,
+                is_manual=True,
+            ))
+            log_activity("Manual Warehouse Entry", f"#{order_number} – {product_name}", commit=False)
+
+        run_in_transaction(work)
         flash("Manual order successfully added to warehouse.", "success")
+    except DatabaseBusy:
+        raise
     except Exception as e:
         db.session.rollback()
         flash(f"Error adding manual order: {e}", "danger")
@@ -120,19 +178,20 @@ def stock_order(order_id):
         return redirect(url_for('dashboard.dashboard'))
 
     order = Order.query.get_or_404(order_id)
-    new_stock = WarehouseStock(
-        user_id=order.user_id,
-        order_number=order.order_number,
-        product_name=order.product_name,
-        quantity=order.quantity,
-        ata=order.ata,
-        transport=order.transport,
-        notes="Stocked from order",
-    )
-    db.session.add(new_stock)
-    db.session.delete(order)
-    db.session.commit()
-    log_activity("Move to Warehouse", f"#{order.order_number} – stocked from Dashboard")
+    order_number = order.order_number
+
+    def work():
+        status, message = lifecycle.stock_orders([order_id], current_user, allowed=lifecycle.any_editor)[order_id]
+        if status != lifecycle.OK:
+            db.session.rollback()
+        else:
+            log_activity("Move to Warehouse", f"#{order_number} – stocked from Dashboard", commit=False)
+        return status, message
+
+    status, message = run_in_transaction(work)
+    if status != lifecycle.OK:
+        flash(message, "danger")
+        return redirect(url_for('dashboard.dashboard'))
     flash("Order moved to warehouse.", "success")
     return redirect(url_for('dashboard.dashboard'))
 
@@ -145,42 +204,28 @@ def deliver_partial(item_id):
         return redirect(url_for('warehouse.warehouse'))
 
     item = WarehouseStock.query.get_or_404(item_id)
+    order_number = item.order_number
 
     try:
         qty_to_deliver = float(request.form['quantity'])
-        current_qty = float(item.quantity)
     except ValueError:
         flash('Invalid quantity entered.', 'danger')
         return redirect(url_for('warehouse.warehouse'))
 
-    if qty_to_deliver <= 0 or qty_to_deliver > current_qty:
-        flash(f"Invalid quantity. Must be between 1 and {current_qty}.", 'danger')
-        return redirect(url_for('warehouse.warehouse'))
-
-    new_qty = current_qty - qty_to_deliver
-    if new_qty <= 0:
-        item.is_archived = True  # ✅ Archive instead of delete
-    else:
-        item.quantity = new_qty
-
-    delivery = DeliveredGoods(
-        user_id=item.user_id,
-        order_number=item.order_number,
-        product_name=item.product_name,
-        quantity=qty_to_deliver,
-        transport=item.transport,
-        delivery_source="From Warehouse",
-        notes=item.notes,
-        warehouse_address=item.warehouse_address,
-        client=item.client,
-        pos_no=item.pos_no,
-        customer_ref=item.customer_ref,
-        delivery_date=datetime.now().strftime('%d.%m.%y'),
-    )
+    def work():
+        status, message = lifecycle.deliver_from_warehouse(
+            {item_id: qty_to_deliver}, current_user, allowed=lifecycle.any_editor
+        )[item_id]
+        if status != lifecycle.OK:
+            db.session.rollback()
+        else:
+            log_activity("Partial Delivery", f"#{order_number} – {qty_to_deliver} units delivered", commit=False)
+        return status, message
 
-    db.session.add(delivery)
-    db.session.commit()
-    log_activity("Partial Delivery", f"#{item.order_number} – {qty_to_deliver} units delivered")
+    status, message = run_in_transaction(work)
+    if status != lifecycle.OK:
+        flash(message, 'danger')
+        return redirect(url_for('warehouse.warehouse'))
     flash(f'Delivered {qty_to_deliver} from warehouse.', 'success')
     return redirect(url_for('warehouse.warehouse'))
 
@@ -195,11 +240,15 @@ def edit_warehouse(item_id):
     item = WarehouseStock.query.get_or_404(item_id)
 
     if request.method == 'POST':
-        item.quantity = float(request.form['quantity'])
-        item.ata = request.form['ata']
-        item.notes = request.form.get("notes")
-        db.session.commit()
-        log_activity("Edit Warehouse Item", f"#{item.order_number}")
+        quantity = float(request.form['quantity'])
+
+        def work():
+            item.quantity = quantity
+            item.ata = request.form['ata']
+            item.notes = request.form.get("notes")
+            log_activity("Edit Warehouse Item", f"#{item.order_number}", commit=False)
+
+        run_in_transaction(work)
         flash('Warehouse item updated successfully!', 'success')
         return redirect(url_for('warehouse.warehouse'))
 
@@ -214,9 +263,13 @@ def delete_warehouse(item_id):
         return redirect(url_for('warehouse.warehouse'))
 
     item = WarehouseStock.query.get_or_404(item_id)
-    db.session.delete(item)
-    db.session.commit()
-    log_activity("Delete Warehouse Item", f"#{item.order_number}")
+    order_number = item.order_number
+
+    def work():
+        db.session.delete(item)
+        log_activity("Delete Warehouse Item", f"#{order_number}", commit=False)
+
+    run_in_transaction(work)
     flash('Warehouse item deleted successfully.', 'success')
     return redirect(url_for('warehouse.warehouse'))
 
@@ -414,21 +467,23 @@ def delete_stockreport(entry_id):
 @warehouse_bp.route('/stockreport/view_by_order/<string:order_number>')
 @login_required
 def view_stockreport_by_order(order_number):
-    # Try WarehouseStock first
-    item = WarehouseStock.query.filter_by(order_number=order_number).first()
+    # Try WarehouseStock first (hot, then tiered stock with its report entries)
+    item, entry_model = find_stock(order_number)
 
-    # Fallback to DeliveredGoods
+    # Fallback to DeliveredGoods (hot, then the cold tier)
     if not item:
-        item = DeliveredGoods.query.filter_by(order_number=order_number).first_or_404()
+        item = find_delivered(order_number)
+        if item is None:
+            abort(404)
 
-    # Permission check (only if from WarehouseStock)
-    if isinstance(item, WarehouseStock):
+    # Permission check (only if from WarehouseStock, hot or tiered)
+    if isinstance(item, (WarehouseStock, ColdWarehouseStock)):
         if not can_view_all(current_user.role) and current_user.id != item.user_id:
             flash("Access denied.", "danger")
             return redirect(url_for('warehouse.warehouse'))
 
     # Load stock entries
-    entries = StockReportEntry.query.filter_by(related_order_id=item.id).all()
+    entries = entry_model.query.filter_by(related_order_id=item.id).all()
 
     # Inherit report header fields from StockReportEntry (first entry)
     first_entry = entries[0] if entries else None
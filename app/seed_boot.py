@@ -4,14 +4,10 @@ import os
 from datetime import date, timedelta
 from typing import Optional, Tuple
 
+from app.utils.dates import repair_timeline, transit_status_for
 
-# ── Date utilities ─────────────────────────────────────────────────────────────
-
-def _start_end_of_iso_week(dt: date) -> Tuple[date, date]:
-    start = dt - timedelta(days=(dt.isoweekday() - 1))
-    end = start + timedelta(days=6)
-    return start, end
 
+# ── Date utilities ─────────────────────────────────────────────────────────────
 
 def _parse_date(s: Optional[str]) -> Optional[date]:
     if not s or not isinstance(s, str):
@@ -58,43 +54,10 @@ def _enforce_timeline_rules(etd_s, eta_s, ata_s) -> Tuple[str, str, Optional[str
     Returns (etd, eta, ata, transit_status) with rules applied:
       - ETD < ETA <= ATA (if ATA exists; if not, may stay None)
       - status by current ISO week
+    The same rules keep stored statuses current (app/status.py).
     """
-    today = date.today()
-    wk_start, wk_end = _start_end_of_iso_week(today)
-
-    etd = _parse_date(etd_s)
-    eta = _parse_date(eta_s)
-    ata = _parse_date(ata_s)
-
-    if etd and not eta and ata:
-        eta = min(ata, etd + timedelta(days=21))
-    if not etd and eta:
-        etd = eta - timedelta(days=7)
-
-    if etd and eta and eta <= etd:
-        eta = etd + timedelta(days=7)
-
-    if ata and eta and ata < eta:
-        ata = eta
-
-    if ata and ata < wk_start:
-        status = "arrived"
-    elif not ata and eta and eta < today:
-        status = "en route"
-    elif etd and (etd > wk_end) and eta and (eta > wk_end):
-        status = "in process"
-    elif etd and (etd < wk_start) and eta and (eta > wk_end):
-        status = "en route"
-    else:
-        if ata and wk_start <= ata <= wk_end:
-            status = "arrived"
-        elif eta and eta > wk_end:
-            status = "in process"
-        elif etd and etd < wk_start:
-            status = "en route"
-        else:
-            status = "in process"
-
+    etd, eta, ata = repair_timeline(_parse_date(etd_s), _parse_date(eta_s), _parse_date(ata_s))
+    status = transit_status_for(etd, eta, ata, date.today())
     return _fmt_date(etd), _fmt_date(eta), _fmt_date(ata), status
 
 
@@ -0,0 +1,76 @@
+# app/shipments.py
+"""
+Shipment identity across the Order -> WarehouseStock -> DeliveredGoods stages.
+
+All stages live in the one shipment table, mapped with single-table
+inheritance: `stage` selects the class (app/models.py), so Order.query,
+WarehouseStock.query and DeliveredGoods.query keep working for every
+blueprint and only see their own stage. A transition (app/lifecycle.py) is
+one UPDATE of the row's stage, so a shipment keeps its id for its whole
+life and "where is order X" is one indexed lookup on shipment.order_number.
+
+- A partial warehouse delivery splits off a new row with parent_id set.
+- Delivered rows moved to the cold tier (app/tiering.py) keep their
+  identity row with stage "archived"; the details live in the cold table
+  under the same id (cold.shipment_id for rows tiered before the fold).
+"""
+from typing import Iterable, List
+
+from sqlalchemy import select, update
+
+from app.database import db
+from app.models import ColdDeliveredGoods, DeliveredGoods, Order, Shipment, WarehouseStock
+from app.roles import can_view_all
+from app.utils.dates import utcnow
+
+TRANSIT = 'transit'
+WAREHOUSE = 'warehouse'
+DELIVERED = 'delivered'
+ARCHIVED = 'archived'  # delivered row moved to the cold tier (app/tiering.py)
+
+STAGE_MODELS = {TRANSIT: Order, WAREHOUSE: WarehouseStock, DELIVERED: DeliveredGoods}
+
+# What an archived row keeps: its identity, not the details copied to the cold tier
+_IDENTITY = ('id', 'user_id', 'stage', 'order_number', 'parent_id', 'created_at', 'updated_at')
+
+
+def archive_shipments(ids: Iterable[int]) -> None:
+    """Turn delivered rows `ids` (already copied to the cold tier) into bare archived shipments."""
+    detail = {
+        c.key: None for c in Shipment.__table__.columns
+        if c.key not in _IDENTITY and c.nullable
+    }
+    db.session.execute(
+        update(DeliveredGoods).where(DeliveredGoods.id.in_(list(ids)))
+        .values(stage=ARCHIVED, updated_at=utcnow(), **detail)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def where_is(order_number: str, user) -> List[dict]:
+    """Current stage of every shipment with this order number the user may see."""
+    live = Shipment.__table__.c.is_archived.isnot(True)  # archived warehouse rows are history
+    q = select(Shipment).where(Shipment.order_number == order_number, live)
+    if not can_view_all(user.role):
+        q = q.where(Shipment.user_id == user.id)
+    shipments = db.session.execute(q.order_by(Shipment.id)).scalars().all()
+
+    # the stage row is the shipment; only rows tiered before the stage fold have another cold id
+    detail = {s.id: s.id for s in shipments}
+    archived = [s.id for s in shipments if s.stage == ARCHIVED]
+    if archived:
+        detail.update(db.session.execute(
+            select(ColdDeliveredGoods.shipment_id, ColdDeliveredGoods.id)
+            .where(ColdDeliveredGoods.shipment_id.in_(archived))
+        ).all())
+    return [
+        {
+            'id': s.id,
+            'order_number': s.order_number,
+            'stage': s.stage,
+            'detail_id': detail[s.id],
+            'parent_id': s.parent_id,
+            'updated_at': s.updated_at.isoformat() if s.updated_at else None,
+        }
+        for s in shipments
+    ]
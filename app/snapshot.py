@@ -0,0 +1,313 @@
+# app/snapshot.py
+"""
+Per-process columnar snapshot of the order table (ORDER_SNAPSHOT=true).
+
+The dashboard list endpoints used to load every visible Order as an ORM
+object and re-parse its date strings on each request, only to filter by
+owner/year, sort and slice a page. The snapshot keeps what those steps need
+as NumPy arrays, one element per order, sorted by id:
+
+  id, user_id                      int64 / int32
+  d_<date>, y_<date>               ordinal day / year of order_date, etd,
+                                   eta, ata (0 = missing or unparseable)
+  transit_status, transport,       int32 codes into per-column value lists
+  buyer, responsible, order_number (dictionary encoding)
+
+so scoping, year membership, equality filters, multi-key sorting and counts
+become array operations. Only the rows of the requested page are then read
+from the database.
+
+Freshness: triggers on the shipment table append the id of every inserted,
+updated or deleted transit row (including rows moving in or out of transit)
+to order_change_log (SQLite and PostgreSQL, like the stage
+counters, because most writes are Core statements that skip ORM events).
+Before each use the snapshot compares its last applied seq with
+max(seq), a primary-key lookup. When the two differ it re-reads only the
+logged ids, or reloads everything when the log was pruned past it or the
+change set is large. The last _REPLAY seqs are re-read every time. On
+PostgreSQL a seq can become visible after a higher one has committed, and
+the replay window covers that. The daily job prunes the log down to
+ORDER_CHANGE_LOG_KEEP entries.
+
+The triggers cost every order write an extra insert, so they only exist
+while the feature is used: a process with ORDER_SNAPSHOT=true installs them
+before its first load, and `flask snapshot-triggers --drop` removes them
+after the flag is turned off.
+
+stats() reports rows, memory footprint, hit rate and load counts; see
+GET /_admin/snapshot_stats?token=…
+"""
+import sys
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import delete, func, select, text
+
+from app.database import db
+from app.metrics import cache_lookup
+from app.models import Order, OrderChange
+from app.utils.dates import parse_date
+
+TRIGGER_DIALECTS = ('sqlite', 'postgresql')
+DATE_FIELDS = ('order_date', 'etd', 'eta', 'ata')
+TEXT_FIELDS = ('transit_status', 'transport', 'buyer', 'responsible', 'order_number')
+
+_REPLAY = 256  # seqs re-read on every incremental refresh
+_FETCH_CHUNK = 500
+
+_SQLITE_DDL = [
+    f'CREATE TRIGGER IF NOT EXISTS order_change_log_{op.lower()} AFTER {op} ON shipment WHEN {when} '
+    f'BEGIN INSERT INTO order_change_log (order_id) VALUES ({row}.id); END'
+    for op, row, when in (
+        ('INSERT', 'NEW', "NEW.stage = 'transit'"),
+        ('UPDATE', 'NEW', "OLD.stage = 'transit' OR NEW.stage = 'transit'"),
+        ('DELETE', 'OLD', "OLD.stage = 'transit'"),
+    )
+]
+_POSTGRESQL_DDL = [
+    """
+CREATE OR REPLACE FUNCTION order_change_log() RETURNS trigger AS $$
+BEGIN
+    IF (TG_OP IN ('UPDATE', 'DELETE') AND OLD.stage = 'transit')
+            OR (TG_OP IN ('UPDATE', 'INSERT') AND NEW.stage = 'transit') THEN
+        INSERT INTO order_change_log (order_id)
+        VALUES (CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END);
+    END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql
+""",
+    'DROP TRIGGER IF EXISTS order_change_log ON shipment',
+    ('CREATE TRIGGER order_change_log AFTER INSERT OR UPDATE OR DELETE ON shipment '
+     'FOR EACH ROW EXECUTE FUNCTION order_change_log()'),
+]
+
+
+def install_triggers(connection) -> bool:
+    """Create the change-log triggers on `connection`'s database. Returns False if the dialect has none."""
+    dialect = connection.dialect.name
+    if dialect not in TRIGGER_DIALECTS:
+        return False
+    for sql in _POSTGRESQL_DDL if dialect == 'postgresql' else _SQLITE_DDL:
+        connection.execute(text(sql))
+    return True
+
+
+def drop_triggers(connection) -> None:
+    """Remove the change-log triggers (ORDER_SNAPSHOT turned off)."""
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        for op in ('insert', 'update', 'delete'):
+            connection.execute(text(f"DROP TRIGGER IF EXISTS order_change_log_{op}"))
+    elif dialect == 'postgresql':
+        connection.execute(text('DROP TRIGGER IF EXISTS order_change_log ON shipment'))
+        connection.execute(text("DROP FUNCTION IF EXISTS order_change_log()"))
+
+
+def prune_change_log(keep: Optional[int] = None) -> int:
+    """Delete all but the newest `keep` log entries (the newest is always kept). Commits."""
+    keep = max(keep if keep is not None else current_app.config.get('ORDER_CHANGE_LOG_KEEP', 100000), 1)
+    latest = db.session.execute(select(func.max(OrderChange.seq))).scalar()
+    if latest is None:
+        return 0
+    pruned = db.session.execute(delete(OrderChange).where(OrderChange.seq <= latest - keep)).rowcount
+    db.session.commit()
+    return pruned
+
+
+class SnapshotView:
+    """An immutable set of columns plus the vocabularies their codes point into."""
+
+    def __init__(self, cols: Dict[str, np.ndarray], values: Dict[str, List[str]],
+                 codes: Dict[str, Dict[str, int]]):
+        self.cols = cols
+        self._values = values
+        self._codes = codes
+        self._rank_cache: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return int(self.cols['id'].size)
+
+    def select(self, user_id: Optional[int] = None, year: Optional[int] = None,
+               equals: Optional[Dict[str, Optional[str]]] = None) -> np.ndarray:
+        """Positions of the rows owned by `user_id` (None = all), with ANY date in `year`, matching `equals`."""
+        mask = np.ones(len(self), dtype=bool)
+        if user_id is not None:
+            mask &= self.cols['user_id'] == user_id
+        if year is not None:
+            mask &= np.logical_or.reduce([self.cols[f"y_{f}"] == year for f in DATE_FIELDS])
+        for name, value in (equals or {}).items():
+            if value is None:
+                continue
+            code = self._codes[name].get(value)
+            if code is None:
+                return np.empty(0, dtype=np.int64)
+            mask &= self.cols[name] == code
+        return np.flatnonzero(mask)
+
+    def years(self, positions: np.ndarray) -> List[int]:
+        """Distinct years of any date field among `positions`, newest first."""
+        found = np.unique(np.concatenate([self.cols[f"y_{f}"][positions] for f in DATE_FIELDS]))
+        return [int(y) for y in found[::-1] if y]
+
+    def _ranks(self, name: str) -> np.ndarray:
+        """Case-insensitive sort rank per code (equal strings share a rank), cached per view."""
+        if name not in self._rank_cache:
+            lowered = np.array([v.lower() for v in list(self._values[name])], dtype=str)
+            self._rank_cache[name] = np.unique(lowered, return_inverse=True)[1].astype(np.int64)
+        return self._rank_cache[name]
+
+    def sort_key(self, field: str) -> np.ndarray:
+        """Integer key per row for `field`: id, date ordinal (missing first) or string rank."""
+        if field == 'id':
+            return self.cols['id']
+        if field in DATE_FIELDS:
+            return self.cols[f"d_{field}"].astype(np.int64)
+        return self._ranks(field)[self.cols[field]]
+
+    def ordered_ids(self, positions: np.ndarray, sort_items) -> np.ndarray:
+        """Ids at `positions` sorted by [(field, 'asc'|'desc'), ...], first item most significant."""
+        keys = []
+        for field, direction in reversed(sort_items):
+            key = self.sort_key(field)[positions]
+            keys.append(-key if direction == 'desc' else key)
+        order = np.lexsort(keys) if keys else np.arange(positions.size)
+        return self.cols['id'][positions][order]
+
+    def newest_first(self, positions: np.ndarray) -> np.ndarray:
+        """Ids at `positions` by order_date (else ETD) descending, ties in id order (dashboard list)."""
+        placed, etd = self.cols['d_order_date'][positions], self.cols['d_etd'][positions]
+        key = np.where(placed > 0, placed, etd).astype(np.int64)
+        return self.cols['id'][positions][np.argsort(-key, kind='stable')]
+
+
+class OrderSnapshot:
+    """The arrays of one database, refreshed from order_change_log."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.seq: Optional[int] = None
+        self.view: Optional[SnapshotView] = None
+        self.values: Dict[str, List[str]] = {name: [] for name in TEXT_FIELDS}
+        self.codes: Dict[str, Dict[str, int]] = {name: {} for name in TEXT_FIELDS}
+        self.hits = self.misses = self.full_loads = self.incremental_loads = 0
+        self.logging = False  # triggers checked by this process
+
+    def _code(self, name: str, value) -> int:
+        value = value or ''
+        code = self.codes[name].get(value)
+        if code is None:
+            code = self.codes[name][value] = len(self.values[name])
+            self.values[name].append(value)
+        return code
+
+    def _encode(self, rows) -> Dict[str, np.ndarray]:
+        n = len(rows)
+        cols = {
+            'id': np.fromiter((r.id for r in rows), np.int64, n),
+            'user_id': np.fromiter((r.user_id for r in rows), np.int32, n),
+        }
+        for field in DATE_FIELDS:
+            parsed = [parse_date(getattr(r, field)) for r in rows]
+            cols[f"d_{field}"] = np.fromiter((d.toordinal() if d else 0 for d in parsed), np.int32, n)
+            cols[f"y_{field}"] = np.fromiter((d.year if d else 0 for d in parsed), np.int16, n)
+        for name in TEXT_FIELDS:
+            cols[name] = np.fromiter((self._code(name, getattr(r, name)) for r in rows), np.int32, n)
+        return cols
+
+    @staticmethod
+    def _query():
+        return select(Order.id, Order.user_id, *(getattr(Order, f) for f in DATE_FIELDS + TEXT_FIELDS))
+
+    def _full_load(self, latest: int) -> None:
+        self.values = {name: [] for name in TEXT_FIELDS}
+        self.codes = {name: {} for name in TEXT_FIELDS}
+        cols = self._encode(db.session.execute(self._query().order_by(Order.id)).all())
+        self._publish(cols, latest)
+        self.full_loads += 1
+
+    def _apply_changes(self, latest: int) -> bool:
+        ids = db.session.execute(
+            select(OrderChange.order_id).where(OrderChange.seq > self.seq - _REPLAY).distinct()
+        ).scalars().all()
+        if len(ids) > max(1000, len(self.view) // 4):
+            return False  # a full load is cheaper
+        rows = []
+        for i in range(0, len(ids), _FETCH_CHUNK):
+            rows += db.session.execute(self._query().where(Order.id.in_(ids[i:i + _FETCH_CHUNK]))).all()
+        fresh = self._encode(rows)
+        keep = ~np.isin(self.view.cols['id'], np.array(ids, dtype=np.int64))
+        cols = {name: np.concatenate([col[keep], fresh[name]]) for name, col in self.view.cols.items()}
+        order = np.argsort(cols['id'], kind='stable')
+        self._publish({name: col[order] for name, col in cols.items()}, latest)
+        self.incremental_loads += 1
+        return True
+
+    def _publish(self, cols: Dict[str, np.ndarray], latest: int) -> None:
+        self.view = SnapshotView(cols, self.values, self.codes)
+        self.seq = latest
+
+    def refresh(self) -> SnapshotView:
+        """The current view, after applying whatever the change log holds beyond it."""
+        latest = db.session.execute(select(func.max(OrderChange.seq))).scalar() or 0
+        with self.lock:
+            if self.view is not None and latest == self.seq:
+                self.hits += 1
+                cache_lookup('snapshot', True)
+                return self.view
+            self.misses += 1
+            cache_lookup('snapshot', False)
+            if self.view is None:
+                self._full_load(latest)
+                return self.view
+            oldest = db.session.execute(select(func.min(OrderChange.seq))).scalar()
+            if (oldest is not None and oldest > self.seq + 1) or not self._apply_changes(latest):
+                self._full_load(latest)
+            return self.view
+
+    def stats(self) -> dict:
+        view = self.view
+        array_bytes = sum(col.nbytes for col in view.cols.values()) if view else 0
+        vocab_bytes = sum(sys.getsizeof(v) for values in self.values.values() for v in values)
+        lookups = self.hits + self.misses
+        return {
+            'rows': len(view) if view else 0,
+            'seq': self.seq,
+            'array_bytes': array_bytes,
+            'vocab_bytes': vocab_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+            'full_loads': self.full_loads,
+            'incremental_loads': self.incremental_loads,
+        }
+
+
+_snapshots: Dict[str, OrderSnapshot] = {}
+
+
+def _snapshot() -> OrderSnapshot:
+    url = str(db.engine.url)
+    if url not in _snapshots:
+        _snapshots[url] = OrderSnapshot()
+    return _snapshots[url]
+
+
+def order_view() -> Optional[SnapshotView]:
+    """The refreshed snapshot, or None when ORDER_SNAPSHOT is off or the backend has no triggers."""
+    if not current_app.config.get('ORDER_SNAPSHOT'):
+        return None
+    if db.engine.dialect.name not in TRIGGER_DIALECTS:
+        return None
+    snap = _snapshot()
+    if not snap.logging:
+        # before the first load, so every write after it is logged
+        with db.engine.begin() as connection:
+            install_triggers(connection)
+        snap.logging = True
+    return snap.refresh()
+
+
+def snapshot_stats() -> dict:
+    return {'enabled': bool(current_app.config.get('ORDER_SNAPSHOT')), **_snapshot().stats()}
@@ -0,0 +1,149 @@
+# app/sql_metrics.py
+"""
+Per-request SQL instrumentation: query count, DB time, slowest statements.
+
+With SQL_METRICS=true, the shared statement timer (app/db_timing.py) on
+every engine (primary, archive bind, read engine) times each statement run
+during a request, and each response carries
+
+  Server-Timing: db;dur=12.4;desc="7 queries", total;dur=31.0
+
+One structured log line per request follows it:
+
+  sql_metrics {"method": "GET", "path": "/delivered", "status": 200, "queries": 7,
+               "db_ms": 12.4, "total_ms": 31.0, "slowest": [{"ms": 5.1, "sql": "SELECT ..."}, ...]}
+
+Statements that take SLOW_QUERY_MS or longer are logged at WARNING as
+`slow_query` with the SQL text, the shape of the parameters (count and
+types, never the values) and the app frame that issued them. The log line
+keeps the SQL_METRICS_TOP slowest statements.
+
+Disabled (the default), it does not subscribe to the timer, and the two
+request hooks only read one config flag. Statements issued outside a
+request (CLI, background threads) are not counted. Neither are those of a
+streamed body after the headers are sent.
+"""
+import heapq
+import json
+import logging
+import os
+import time
+import traceback
+from typing import List, Tuple
+
+from flask import current_app, has_request_context, request
+
+from app import db_timing
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# Frames that execute on behalf of a caller; the call site is the frame above them.
+_HELPER_FILES = {os.path.abspath(__file__), os.path.join(_APP_DIR, 'scoped_query.py'),
+                 os.path.join(_APP_DIR, 'db_timing.py')}
+_MAX_SQL = 2000
+
+
+class RequestStats:
+    """SQL counters of one request (kept on `request`, not `g`)."""
+
+    __slots__ = ('db_seconds', 'queries', 'slowest', 'started')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.slowest: List[Tuple[float, str]] = []  # min-heap of (seconds, sql), SQL_METRICS_TOP long
+
+    def record(self, seconds: float, statement: str, keep: int) -> None:
+        self.queries += 1
+        self.db_seconds += seconds
+        if len(self.slowest) < keep:
+            heapq.heappush(self.slowest, (seconds, statement))
+        elif keep and seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (seconds, statement))
+
+
+def _stats():
+    return getattr(request, '_sql_stats', None) if has_request_context() else None
+
+
+def param_shape(parameters, executemany: bool = False) -> str:
+    """'3 params (int, str, NoneType)', '{id: int}' or '500 x ...' for executemany; never the values."""
+    if executemany:
+        rows = list(parameters or ())
+        return f"{len(rows)} x {param_shape(rows[0])}" if rows else "0 rows"
+    if not parameters:
+        return "no params"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in parameters.items()) + "}"
+    return f"{len(parameters)} params ({', '.join(type(v).__name__ for v in parameters)})"
+
+
+def call_site() -> str:
+    """The innermost app frame outside the query helpers, as 'app/x.py:123 in func'."""
+    for frame in reversed(traceback.extract_stack()):
+        path = os.path.abspath(frame.filename)
+        if path.startswith(_APP_DIR) and path not in _HELPER_FILES:
+            rel = os.path.relpath(path, os.path.dirname(_APP_DIR))
+            return f"{rel}:{frame.lineno} in {frame.name}"
+    return "?"
+
+
+def _record(cursor, statement, parameters, executemany, seconds):
+    stats = _stats()
+    if stats is None:
+        return
+    config = current_app.config
+    stats.record(seconds, statement, config['SQL_METRICS_TOP'])
+    if seconds * 1000 >= config['SLOW_QUERY_MS']:
+        current_app.logger.warning("slow_query %s", json.dumps({
+            "ms": round(seconds * 1000, 1),
+            "sql": statement[:_MAX_SQL],
+            "params": param_shape(parameters, executemany),
+            "site": call_site(),
+            "path": request.path,
+        }))
+
+
+def install_listeners(enabled: bool) -> None:
+    """Subscribe to (or leave) the shared statement timer."""
+    if enabled:
+        db_timing.subscribe(_record)
+    else:
+        db_timing.unsubscribe(_record)
+
+
+def start_request() -> None:
+    """before_request hook: start counting for this request."""
+    if current_app.config.get('SQL_METRICS'):
+        request._sql_stats = RequestStats()
+
+
+def finish_request(response):
+    """after_request hook: Server-Timing header and the sql_metrics log line."""
+    stats = _stats()
+    if stats is None:
+        return response
+    db_ms = round(stats.db_seconds * 1000, 1)
+    total_ms = round((time.perf_counter() - stats.started) * 1000, 1)
+    response.headers.add('Server-Timing', f'db;dur={db_ms};desc="{stats.queries} queries"')
+    response.headers.add('Server-Timing', f'total;dur={total_ms}')
+    current_app.logger.info("sql_metrics %s", json.dumps({
+        "method": request.method,
+        "path": request.path,
+        "status": response.status_code,
+        "queries": stats.queries,
+        "db_ms": db_ms,
+        "total_ms": total_ms,
+        "slowest": [{"ms": round(s * 1000, 1), "sql": sql[:_MAX_SQL]}
+                    for s, sql in sorted(stats.slowest, reverse=True)],
+    }))
+    return response
+
+
+def init_sql_metrics(app) -> None:
+    """Register the request hooks and subscribe to the timer when SQL_METRICS is on."""
+    app.before_request(start_request)
+    app.after_request(finish_request)
+    install_listeners(app.config.get('SQL_METRICS', False))
+    if app.config.get('SQL_METRICS') and app.logger.level == logging.NOTSET:
+        app.logger.setLevel(logging.INFO)  # the sql_metrics lines are INFO; the root default is WARNING
@@ -76,8 +76,8 @@ document.addEventListener("DOMContentLoaded", function () {
 fetch("/analytics/api/transit_efficiency")
   .then(res => res.json())
   .then(data => {
-    const labels = Object.keys(data);
-    const values = Object.values(data);
+    const labels = Object.keys(data.averages);
+    const values = Object.values(data.averages);
 
     const efficiencyCtx = document.getElementById("transitEfficiencyChart").getContext("2d");
 
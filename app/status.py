@@ -0,0 +1,172 @@
+# app/status.py
+"""
+Batch recomputation of the date-derived Order columns.
+
+Two kinds of state depend on today's date:
+  - transit_status (repair_timeline + transit_status_for, by ISO week),
+  - is_delayed / delay_days (delay_state: ETA passed, no ATA yet).
+ORM writes keep is_delayed/delay_days current through a before_flush hook,
+but both go stale as days pass. recompute_statuses() re-applies the rules
+to every order:
+
+  - ETD/ETA/ATA are fetched in id-ordered batches (keyset, no OFFSET),
+  - the rules run over the fetched columns,
+  - rows where anything changed are written in one executemany UPDATE by
+    primary key, and each batch is committed.
+
+Unchanged rows are never written, so a re-run on the same day is read-only.
+The stored dates themselves are left untouched; repairs only feed the status.
+
+Runs from `flask recompute-status` and `GET /_admin/recompute_status?token=…`.
+
+The daily job (run_daily_jobs) is the recompute followed by the KPI
+snapshot (app/kpi.py), the transit rollup (app/rollups.py), the ETA
+predictor (app/eta.py) and the order change log prune (app/snapshot.py).
+Each step runs on its own, so one failure does not skip the rest. A run
+first claims the day in `job_run` with a conditional UPDATE, so however
+many gunicorn workers or cron hosts start it, one of them does the work.
+Cron runs it with `flask daily-jobs` or `GET /_admin/daily_jobs?token=…`.
+With STATUS_RECOMPUTE_DAILY=true (off by default) each process also
+tries to claim it in a background thread on its first request of a day.
+"""
+import threading
+from datetime import date
+from typing import Dict, Optional
+
+from flask import current_app
+from sqlalchemy import event, insert, inspect, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.database import db
+from app.eta import train_eta_model
+from app.kpi import snapshot_kpi
+from app.models import JobRun, Order
+from app.rollups import rebuild_rollup
+from app.snapshot import prune_change_log
+from app.utils.dates import delay_state, parse_date, repair_timeline, transit_status_for, utcnow
+
+
+def recompute_statuses(today: Optional[date] = None, batch_size: Optional[int] = None) -> Dict[str, int]:
+    """Bring every order's transit_status and delay state in line with the rules. Returns counts."""
+    today = today or date.today()
+    batch_size = batch_size or current_app.config.get('STATUS_BATCH_SIZE', 1000)
+    scanned = updated = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(Order.id, Order.etd, Order.eta, Order.ata, Order.transit_status,
+                   Order.is_delayed, Order.delay_days)
+            .where(Order.id > last_id)
+            .order_by(Order.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        scanned += len(rows)
+
+        changed = []
+        for r in rows:
+            etd, eta, ata = repair_timeline(parse_date(r.etd), parse_date(r.eta), parse_date(r.ata))
+            values = {'transit_status': transit_status_for(etd, eta, ata, today),
+                      **delay_state(r.eta, r.ata, today)}
+            if any(getattr(r, k) != v for k, v in values.items()):
+                changed.append({'id': r.id, **values})
+        if changed:
+            db.session.execute(update(Order), changed)
+            db.session.commit()
+            updated += len(changed)
+        if len(rows) < batch_size:
+            break
+    return {'scanned': scanned, 'updated': updated}
+
+
+@event.listens_for(Session, 'before_flush')
+def _track_delay(session, flush_context, instances):
+    """Keep is_delayed/delay_days in step with ORM inserts and ETA/ATA edits."""
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Order):
+            continue
+        attrs = inspect(obj).attrs
+        if obj in session.new or attrs.eta.history.has_changes() or attrs.ata.history.has_changes():
+            for key, value in delay_state(obj.eta, obj.ata).items():
+                setattr(obj, key, value)
+
+
+DAILY_JOB = 'daily'
+
+
+def claim_day(today: date, name: str = DAILY_JOB) -> bool:
+    """Atomically record that this process runs `name` for `today`; False if someone already has."""
+    now = utcnow()
+    res = db.session.execute(
+        update(JobRun)
+        .where(JobRun.name == name, or_(JobRun.run_on.is_(None), JobRun.run_on < today))
+        .values(run_on=today, started_at=now, finished_at=None)
+    )
+    db.session.commit()
+    if res.rowcount == 1:
+        return True
+    if db.session.get(JobRun, name) is not None:
+        return False
+    try:  # first run ever: the insert is the claim
+        db.session.execute(insert(JobRun).values(name=name, run_on=today, started_at=now))
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+        return False
+
+
+def _daily_steps():
+    return (
+        ('transit status', recompute_statuses),
+        ('KPI snapshot', snapshot_kpi),
+        ('transit rollup', rebuild_rollup),
+        ('ETA model', train_eta_model),
+        ('order change log prune', prune_change_log),
+    )
+
+
+def run_daily_jobs(today: Optional[date] = None, force: bool = False) -> Optional[Dict[str, object]]:
+    """
+    Claim `today` and run every daily step; None when another process has
+    already claimed the day (`force` skips the claim). Returns each step's
+    result, or the error message of a step that failed.
+    """
+    today = today or date.today()
+    if not force and not claim_day(today):
+        return None
+    results: Dict[str, object] = {}
+    for label, step in _daily_steps():
+        try:
+            results[label] = step()
+            current_app.logger.info(f"Daily job, {label}: {results[label]}")
+        except Exception as e:  # noqa: BLE001 - one failing step must not stop the others
+            db.session.rollback()
+            results[label] = f"failed: {e}"
+            current_app.logger.error(f"Daily job, {label} failed: {e}")
+    db.session.execute(update(JobRun).where(JobRun.name == DAILY_JOB).values(finished_at=utcnow()))
+    db.session.commit()
+    return results
+
+
+def _thread_main(app) -> None:
+    with app.app_context():
+        try:
+            if run_daily_jobs() is None:
+                app.logger.info("Daily job already claimed by another process")
+        except Exception as e:  # noqa: BLE001 - a background thread has nobody to raise to
+            app.logger.error(f"Daily job could not start: {e}")
+        finally:
+            db.session.remove()
+
+
+def recompute_daily(app) -> None:
+    """The first time this process sees a new day, try to run the daily job in a background thread."""
+    today = date.today()
+    if app.config.get('_STATUS_RECOMPUTED_ON') == today:
+        return
+    app.config['_STATUS_RECOMPUTED_ON'] = today
+    threading.Thread(target=_thread_main, args=(app,), name="daily-jobs", daemon=True).start()
@@ -0,0 +1,193 @@
+# app/tiering.py
+"""
+Cold storage tier for DeliveredGoods, ArchivedOrder and archived WarehouseStock.
+
+Rows older than COLD_AFTER_DAYS (DeliveredGoods, ArchivedOrder) and
+soft-archived warehouse rows older than WAREHOUSE_ARCHIVE_AFTER_DAYS (with
+their StockReportEntry children) are moved into the "archive" database bind
+(Cold* models, same ids and columns). The hot database then only holds what
+the pages work with day to day, and the active warehouse set stays small.
+
+A move is copy-then-delete, one batch at a time:
+  1. rows whose id is not in the cold table yet are inserted there; commit
+  2. the hot rows are deleted; commit
+Delivered rows are shipments (app/shipments.py), so step 2 does not delete
+them: it blanks their details and sets stage "archived", which keeps the
+shipment id findable. The two databases cannot share a transaction, so if
+the process dies between the steps the next run finds the rows already
+copied, skips the insert and finishes step 2. Nothing is lost or duplicated.
+
+Read-through helpers let the Delivered search, the stock-report lookup by
+order number and the shipment lookup still find tiered rows.
+"""
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from flask import current_app
+from sqlalchemy import delete, func, insert, inspect, or_, select, text
+
+from app.database import db
+from app.models import (
+    ArchivedOrder,
+    ColdArchivedOrder,
+    ColdDeliveredGoods,
+    ColdStockReportEntry,
+    ColdWarehouseStock,
+    DeliveredGoods,
+    Shipment,
+    StockReportEntry,
+    WarehouseStock,
+)
+from app.roles import can_view_all
+from app.shipments import archive_shipments
+from app.utils.dates import sql_iso_date, utcnow
+
+COLD_SEARCH_LIMIT = 50
+
+
+def _columns(model) -> List[str]:
+    return [c.key for c in inspect(model).columns]
+
+
+def _copy(hot_model, cold_model, where, limit: Optional[int] = None) -> List[int]:
+    """Insert matching hot rows into the cold table (skipping ids already there). Returns their ids."""
+    cold_cols = set(_columns(cold_model))
+    cols = [c for c in _columns(hot_model) if c in cold_cols]
+    exprs = [getattr(hot_model, c) for c in cols]
+    if 'shipment_id' in cold_cols and issubclass(hot_model, Shipment):
+        cols.append('shipment_id')  # a stage row is its own shipment
+        exprs.append(hot_model.id)
+    q = select(*exprs).where(where).order_by(hot_model.id)
+    if limit:
+        q = q.limit(limit)
+    rows = db.session.execute(q).all()
+    if not rows:
+        return []
+    ids = [r.id for r in rows]
+
+    already = set(db.session.execute(select(cold_model.id).where(cold_model.id.in_(ids))).scalars())
+    now = utcnow()
+    fresh = [{**dict(zip(cols, r)), 'tiered_at': now} for r in rows if r.id not in already]
+    if fresh:
+        db.session.execute(insert(cold_model), fresh)
+    return ids
+
+
+def _move_batch(hot_model, cold_model, where, batch_size: int) -> int:
+    """
+    Copy up to batch_size matching hot rows (and their children) to the cold
+    tier, then delete them (delivered rows: archive them, see above).
+    """
+    ids = _copy(hot_model, cold_model, where, batch_size)
+    if not ids:
+        return 0
+    if hot_model is WarehouseStock:
+        _copy(StockReportEntry, ColdStockReportEntry, StockReportEntry.related_order_id.in_(ids))
+    db.session.commit()
+
+    if hot_model is DeliveredGoods:
+        archive_shipments(ids)
+    else:
+        if hot_model is WarehouseStock:
+            db.session.execute(delete(StockReportEntry).where(StockReportEntry.related_order_id.in_(ids)))
+        db.session.execute(delete(hot_model).where(hot_model.id.in_(ids)))
+    db.session.commit()
+    return len(ids)
+
+
+def _move_all(hot_model, cold_model, where, batch_size: int) -> int:
+    total = 0
+    while True:
+        moved = _move_batch(hot_model, cold_model, where, batch_size)
+        total += moved
+        if moved < batch_size:
+            return total
+
+
+def run_tiering(
+    days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    warehouse_days: Optional[int] = None,
+) -> Dict[str, int]:
+    """
+    Move DeliveredGoods (by delivery_date) and ArchivedOrder (by archived_at)
+    older than `days`, and soft-archived WarehouseStock rows (with their
+    StockReportEntry children) archived more than `warehouse_days` ago.
+    """
+    cfg = current_app.config
+    days = cfg.get('COLD_AFTER_DAYS', 365) if days is None else days
+    warehouse_days = cfg.get('WAREHOUSE_ARCHIVE_AFTER_DAYS', 30) if warehouse_days is None else warehouse_days
+    batch_size = batch_size or cfg.get('TIERING_BATCH_SIZE', 1000)
+    cutoff = utcnow() - timedelta(days=days)
+    warehouse_cutoff = utcnow() - timedelta(days=warehouse_days)
+
+    delivered_iso = sql_iso_date(DeliveredGoods.delivery_date)
+    delivered_old = (delivered_iso != '') & (delivered_iso < cutoff.strftime('%Y-%m-%d'))
+    archived_old = ArchivedOrder.archived_at < cutoff
+    # rows archived before archived_at existed have no timestamp; they are old by definition
+    stock_old = WarehouseStock.is_archived.is_(True) & or_(
+        WarehouseStock.archived_at.is_(None), WarehouseStock.archived_at < warehouse_cutoff
+    )
+
+    return {
+        'delivered': _move_all(DeliveredGoods, ColdDeliveredGoods, delivered_old, batch_size),
+        'archived_orders': _move_all(ArchivedOrder, ColdArchivedOrder, archived_old, batch_size),
+        'warehouse': _move_all(WarehouseStock, ColdWarehouseStock, stock_old, batch_size),
+    }
+
+
+def vacuum_hot_database() -> bool:
+    """Give freed pages back to the OS (SQLite only). Returns False on other backends."""
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return False
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        conn.execute(text('VACUUM'))
+    return True
+
+
+# ----------------------------
+# Read-through
+# ----------------------------
+def _scoped(q, model, user):
+    if user is not None and not can_view_all(user.role):
+        q = q.where(model.user_id == user.id)
+    return q
+
+
+def find_stock(order_number: str):
+    """
+    WarehouseStock by order number, falling back to tiered stock.
+    Returns (item, report entry model) so callers load entries from the same tier.
+    """
+    item = WarehouseStock.query.filter_by(order_number=order_number).first()
+    if item is not None:
+        return item, StockReportEntry
+    item = ColdWarehouseStock.query.filter_by(order_number=order_number).first()
+    if item is not None:
+        return item, ColdStockReportEntry
+    return None, StockReportEntry
+
+
+def find_delivered(order_number: str, user=None):
+    """DeliveredGoods by order number, falling back to the cold tier."""
+    for model in (DeliveredGoods, ColdDeliveredGoods):
+        q = _scoped(select(model).where(model.order_number == order_number), model, user)
+        item = db.session.execute(q.order_by(model.id).limit(1)).scalars().first()
+        if item is not None:
+            return item
+    return None
+
+
+def search_cold_delivered(search: str, user, limit: int = COLD_SEARCH_LIMIT) -> List[ColdDeliveredGoods]:
+    """Tiered delivered rows matching the Delivered page search (order number, product, notes)."""
+    if not search:
+        return []
+    like_term = f"%{search.lower()}%"
+    q = select(ColdDeliveredGoods).where(or_(
+        func.lower(ColdDeliveredGoods.order_number).like(like_term),
+        func.lower(ColdDeliveredGoods.product_name).like(like_term),
+        func.lower(ColdDeliveredGoods.notes).like(like_term),
+    ))
+    q = _scoped(q, ColdDeliveredGoods, user).order_by(ColdDeliveredGoods.id.desc()).limit(limit)
+    return list(db.session.execute(q).scalars())
@@ -0,0 +1,93 @@
+# app/transactions.py
+"""
+Write transactions that survive lock contention.
+
+With several workers on one SQLite file, a commit can fail with
+"database is locked". That happens when busy_timeout runs out, or at once
+when a WAL read snapshot can no longer be upgraded to a write. PostgreSQL
+has the same class of failure as serialization errors and deadlocks. The
+failed transaction cannot be resumed, but the work can be redone.
+run_in_transaction(work) does that:
+
+  - calls work() and commits,
+  - on a lock/busy error rolls back, sleeps a jittered exponential backoff
+    (WRITE_RETRY_BASE_MS * 2**attempt, capped at WRITE_RETRY_MAX_MS, "full
+    jitter") and calls work() again, up to WRITE_RETRIES times,
+  - then raises DatabaseBusy, which the app turns into a 503 with
+    Retry-After instead of a 500 carrying the driver's message.
+
+work() must be safe to re-run: read what it needs inside, don't commit,
+and pass commit=False to log_activity. The rollback expires every object
+the request loaded before.
+
+SINGLE_WRITER=true also funnels the units of work of a worker process
+through one writer lock, so its request threads (gthread workers) and
+import jobs never compete for the database write lock with each other.
+Only writes that bypass run_in_transaction still collide: other
+processes and the daily job, which commits its own batches. The retry
+covers the first; the busy_timeout of app/sqlite_profile.py covers the
+rest.
+"""
+import random
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+
+from flask import current_app
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+from app.database import db
+
+T = TypeVar('T')
+
+_LOCK_MESSAGES = ('database is locked', 'database table is locked', 'database is busy')
+_LOCK_PGCODES = ('40001', '40P01', '55P03')  # serialization failure, deadlock, lock not available
+
+_writer_lock = threading.RLock()
+
+
+class DatabaseBusy(RuntimeError):
+    """A unit of work kept failing on lock contention; safe for the client to retry later."""
+
+
+def is_lock_error(exc: BaseException) -> bool:
+    """True for SQLite busy/locked errors and PostgreSQL serialization/deadlock/lock-timeout errors."""
+    if isinstance(exc, OperationalError) and any(m in str(exc.orig).lower() for m in _LOCK_MESSAGES):
+        return True
+    return isinstance(exc, DBAPIError) and getattr(exc.orig, 'pgcode', None) in _LOCK_PGCODES
+
+
+def backoff_delay(attempt: int, base_ms: int, max_ms: int) -> float:
+    """Seconds to sleep before retry `attempt` (0-based): uniform in [0, min(max, base * 2**attempt)]."""
+    return random.uniform(0, min(max_ms, base_ms * (2 ** attempt))) / 1000.0
+
+
+def run_in_transaction(work: Callable[[], T], retries: Optional[int] = None) -> T:
+    """Run work() and commit, re-running it after lock errors. Returns work()'s result."""
+    config = current_app.config
+    retries = config.get('WRITE_RETRIES', 5) if retries is None else retries
+    single_writer = config.get('SINGLE_WRITER', False)
+    attempt = 0
+    while True:
+        try:
+            if single_writer:
+                with _writer_lock:
+                    result = work()
+                    db.session.commit()
+            else:
+                result = work()
+                db.session.commit()
+            return result
+        except DBAPIError as e:
+            db.session.rollback()
+            if not is_lock_error(e):
+                raise
+            if attempt >= retries:
+                current_app.logger.warning(f"Write gave up after {attempt + 1} attempts: {e.orig}")
+                raise DatabaseBusy("The database is busy, please retry.") from e
+            time.sleep(backoff_delay(attempt, config.get('WRITE_RETRY_BASE_MS', 50),
+                                     config.get('WRITE_RETRY_MAX_MS', 1000)))
+            attempt += 1
+        except Exception:
+            db.session.rollback()
+            raise
@@ -0,0 +1,133 @@
+from datetime import UTC, date, datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import String, case, func
+
+DATE_FORMATS = ("%d.%m.%y", "%Y-%m-%d", "%d.%m.%Y", "%d/%m/%Y")
+
+
+def parse_date(value):
+    """Return a date from a stored date string (any legacy format), else None."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    s = str(value).strip()
+    if not s:
+        return None
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(s, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def utcnow() -> datetime:
+    """Naive UTC now: what the DateTime columns store."""
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+def _sub(expr, start, length):
+    return func.substr(expr, start, length, type_=String)
+
+
+def sql_iso_date(column):
+    """
+    SQL expression turning a stored date string into 'YYYY-MM-DD'.
+
+    Dates are stored as strings in mixed legacy formats ('dd.mm.yy' mostly,
+    'YYYY-MM-DD', 'dd.mm.YYYY' and 'dd/mm/YYYY' from older paths). The ISO
+    form compares and sorts correctly as text, so it can be used in ORDER BY
+    and WHERE clauses. Missing or unrecognised values become '' (sorts first,
+    like date.min in the Python helpers).
+    """
+    c = func.trim(func.coalesce(column, ""), type_=String)
+    n = func.length(c)
+    yy = _sub(c, 7, 2)
+    century = case((yy < "69", "20"), else_="19")  # same pivot as strptime %y
+    return case(
+        ((n == 10) & (_sub(c, 5, 1) == "-"), c),
+        (
+            (n == 8) & (_sub(c, 3, 1) == ".") & (_sub(c, 6, 1) == "."),
+            century + yy + "-" + _sub(c, 4, 2) + "-" + _sub(c, 1, 2),
+        ),
+        (
+            (n == 10) & _sub(c, 3, 1).in_((".", "/")),
+            _sub(c, 7, 4) + "-" + _sub(c, 4, 2) + "-" + _sub(c, 1, 2),
+        ),
+        else_="",
+    )
+
+
+def sql_year(column):
+    """SQL expression with the 4-digit year of a stored date string ('' if missing)."""
+    return _sub(sql_iso_date(column), 1, 4)
+
+
+# ── Transit timeline rules ─────────────────────────────────────────────────────
+TRANSIT_STATUSES = ("in process", "en route", "arrived")
+
+
+def iso_week_bounds(day: date) -> Tuple[date, date]:
+    """Monday and Sunday of the ISO week containing `day`."""
+    start = day - timedelta(days=day.isoweekday() - 1)
+    return start, start + timedelta(days=6)
+
+
+def repair_timeline(etd: Optional[date], eta: Optional[date], ata: Optional[date]):
+    """
+    Fill in and order a transit timeline so that ETD < ETA <= ATA:
+    a missing ETA is derived from ETD/ATA, a missing ETD from ETA, and
+    out-of-order dates are pushed forward. Returns (etd, eta, ata).
+    """
+    if etd and not eta and ata:
+        eta = min(ata, etd + timedelta(days=21))
+    if not etd and eta:
+        etd = eta - timedelta(days=7)
+    if etd and eta and eta <= etd:
+        eta = etd + timedelta(days=7)
+    if ata and eta and ata < eta:
+        ata = eta
+    return etd, eta, ata
+
+
+def transit_status_for(etd: Optional[date], eta: Optional[date], ata: Optional[date],
+                       today: Optional[date] = None) -> str:
+    """
+    Transit status of a (repaired) timeline relative to the current ISO week:
+    'arrived' once ATA is this week or earlier, 'en route' when under way or
+    overdue without ATA, 'in process' when departure is still ahead.
+    """
+    today = today or date.today()
+    wk_start, wk_end = iso_week_bounds(today)
+
+    if ata and ata < wk_start:
+        return "arrived"
+    if not ata and eta and eta < today:
+        return "en route"
+    if etd and etd > wk_end and eta and eta > wk_end:
+        return "in process"
+    if etd and etd < wk_start and eta and eta > wk_end:
+        return "en route"
+    if ata and wk_start <= ata <= wk_end:
+        return "arrived"
+    if eta and eta > wk_end:
+        return "in process"
+    if etd and etd < wk_start:
+        return "en route"
+    return "in process"
+
+
+def delay_state(eta, ata, today: Optional[date] = None) -> dict:
+    """
+    Order.is_delayed / delay_days for stored ETA/ATA strings: delayed while
+    ETA has passed and there is no ATA yet, by the number of days past ETA.
+    """
+    today = today or date.today()
+    eta_d = parse_date(eta)
+    if eta_d is None or eta_d >= today or (ata or "").strip():
+        return {"is_delayed": False, "delay_days": None}
+    return {"is_delayed": True, "delay_days": (today - eta_d).days}
@@ -0,0 +1,142 @@
+"""
+Background runner for upload-and-import jobs (POST /api/v1/imports).
+
+A job is processed in chunks with order_import.upsert_chunk. Each chunk's
+rows and the job's progress (last_row, counters) are committed in the same
+transaction, so a job interrupted by a restart can be resumed from
+`last_row` without re-applying or skipping rows.
+
+A chunk that hits a locked database is re-run (app/transactions.py)
+instead of being rejected; if it stays locked the job fails and can be
+resumed.
+
+Jobs are claimed with a conditional UPDATE (queued, or running with a stale
+heartbeat), so only one worker thread processes a job even when several
+gunicorn workers try to resume it.
+"""
+import json
+import os
+import threading
+from datetime import timedelta
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.database import db
+from app.models import ImportJob
+from app.transactions import DatabaseBusy, run_in_transaction
+from app.utils.dates import utcnow
+from app.utils.order_import import (
+    ImportReport,
+    iter_chunks,
+    prepare_chunk,
+    upsert_chunk,
+)
+
+DEFAULT_CHUNK_SIZE = 1000
+STALE_AFTER = timedelta(seconds=90)  # a running job without heartbeat this long is resumable
+MAX_STORED_ERRORS = 200
+
+
+def is_stale(job: ImportJob, now=None) -> bool:
+    now = now or utcnow()
+    if job.status == 'queued':
+        return job.created_at is None or job.created_at < now - STALE_AFTER
+    if job.status == 'running':
+        return job.heartbeat_at is None or job.heartbeat_at < now - STALE_AFTER
+    return False
+
+
+def claim_job(job_id: int) -> bool:
+    """Atomically mark the job as running by this process; False if someone else has it."""
+    now = utcnow()
+    res = db.session.execute(
+        update(ImportJob)
+        .where(
+            ImportJob.id == job_id,
+            or_(
+                ImportJob.status == 'queued',
+                and_(
+                    ImportJob.status == 'running',
+                    or_(ImportJob.heartbeat_at.is_(None), ImportJob.heartbeat_at < now - STALE_AFTER),
+                ),
+            ),
+        )
+        .values(status='running', heartbeat_at=now)
+    )
+    db.session.commit()
+    return res.rowcount == 1
+
+
+def run_job(job_id: int, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+    """Process (or resume) an import job in the current app context."""
+    if not claim_job(job_id):
+        return
+
+    job = db.session.get(ImportJob, job_id)
+
+    def _progress(chunk, report):
+        job.processed_rows += len(chunk)
+        job.last_row = chunk[-1][0]
+        job.inserted += report.inserted
+        job.updated += report.updated
+        job.unchanged += report.unchanged
+        job.rejected += len(report.rejected)
+        errors = json.loads(job.errors or "[]")
+        room = MAX_STORED_ERRORS - len(errors)
+        if room > 0:
+            errors.extend({"row": n, "reason": reason} for n, reason in report.rejected[:room])
+        job.errors = json.dumps(errors)
+        job.heartbeat_at = utcnow()
+
+    def _apply(chunk):
+        report = ImportReport()
+        prepared = prepare_chunk(chunk, job.user_id, report)
+        if prepared:
+            upsert_chunk(prepared, job.user_id, report)
+        _progress(chunk, report)
+
+    try:
+        for chunk in iter_chunks(job.stored_path, chunk_size, start_after=job.last_row):
+            try:
+                run_in_transaction(lambda chunk=chunk: _apply(chunk))  # chunk rows + progress together
+            except DatabaseBusy:
+                raise
+            except SQLAlchemyError as e:
+                report = ImportReport()
+                report.rejected.append((chunk[0][0], f"chunk rows {chunk[0][0]}-{chunk[-1][0]} failed: {e}"))
+                run_in_transaction(lambda chunk=chunk, report=report: _progress(chunk, report))
+
+        job.status = 'done'
+        job.finished_at = utcnow()
+        job.total_rows = job.processed_rows
+        db.session.commit()
+        try:
+            os.remove(job.stored_path)
+        except OSError:
+            pass
+    except Exception as e:  # noqa: BLE001 - whatever stopped it, the job is marked failed
+        db.session.rollback()
+        job = db.session.get(ImportJob, job_id)
+        job.status = 'failed'
+        job.message = str(e)
+        job.finished_at = utcnow()
+        db.session.commit()
+
+
+def _thread_main(app, job_id: int) -> None:
+    with app.app_context():
+        try:
+            run_job(job_id, app.config.get('IMPORT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE))
+        except Exception as e:  # noqa: BLE001 - a background thread has nobody to raise to
+            app.logger.error(f"Import job {job_id} crashed: {e}")
+        finally:
+            db.session.remove()
+
+
+def start_job(app, job_id: int) -> None:
+    """Run the job in a daemon thread (or inline when IMPORT_JOBS_INLINE is set, e.g. tests)."""
+    if app.config.get('IMPORT_JOBS_INLINE'):
+        run_job(job_id, app.config.get('IMPORT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE))
+        return
+    threading.Thread(target=_thread_main, args=(app, job_id), name=f"import-job-{job_id}", daemon=True).start()
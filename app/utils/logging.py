@@ -2,7 +2,7 @@ from app.models import ActivityLog, db
 from flask_login import current_user
 from datetime import datetime
 
-def log_activity(action, details):
+def log_activity(action, details, commit=True):
     from flask import has_request_context
     user_id = current_user.id if has_request_context() and current_user.is_authenticated else None
     log = ActivityLog(
@@ -12,4 +12,5 @@ def log_activity(action, details):
         timestamp=datetime.utcnow()
     )
     db.session.add(log)
-    db.session.commit()
+    if commit:
+        db.session.commit()
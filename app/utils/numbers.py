@@ -0,0 +1,21 @@
+from sqlalchemy import Float, String, case, cast, func
+
+
+def sql_number(column):
+    """
+    SQL expression with a stored numeric string as a Float, else NULL.
+
+    Quantities are free-text String columns ('10', '2.5', but also '' or
+    '10 pcs' from the order form). A bare CAST raises on PostgreSQL for
+    anything that is not a number, so only plain decimals (digits with at
+    most one '.') are cast; everything else becomes NULL and drops out of
+    SUM(). Uses only trim/replace/length, which every supported backend has.
+    """
+    c = func.trim(column, type_=String)
+    rest = c
+    for digit in "0123456789":
+        rest = func.replace(rest, digit, "", type_=String)
+    return case(
+        (rest.in_(("", ".")) & (func.length(c) > func.length(rest)), cast(c, Float)),
+        else_=None,
+    )
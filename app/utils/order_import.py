@@ -0,0 +1,357 @@
+"""
+Bulk order import engine (CSV / XLSX -> Order rows).
+
+Rows are streamed from the source file (read-only openpyxl workbook or
+csv.DictReader), normalized a chunk at a time, and written with one
+executemany INSERT per chunk, each chunk in its own transaction. Memory is
+bounded by the chunk size, not the file size.
+
+With `upsert=True` rows are matched on (user_id, order_number) and a
+per-row content hash, so re-importing a mostly unchanged file only writes
+the rows that changed.
+
+Date normalization is done per column per chunk: the distinct raw values of
+a column are parsed once (and memoized across chunks) and then mapped back
+onto the rows, instead of calling a date parser for every cell.
+"""
+from __future__ import annotations
+
+import csv
+import hashlib
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.database import db
+from app.models import Order
+from app.rollups import sync_samples
+from app.utils.dates import delay_state
+
+# Columns expected in the source file (same as data/orders_2025.xlsx).
+IMPORT_COLUMNS = (
+    "order_date", "order_number", "product_name", "buyer", "responsible",
+    "quantity", "required_delivery", "terms_of_delivery", "payment_date",
+    "etd", "eta", "ata", "transit_status", "transport",
+)
+DATE_COLUMNS = ("order_date", "payment_date", "etd", "eta", "ata")
+REQUIRED_COLUMNS = ("order_date", "product_name", "buyer", "responsible", "transit_status", "transport")
+
+_TEXT_DATE_FORMATS = ("%d.%m.%y", "%Y-%m-%d", "%d.%m.%Y", "%d/%m/%Y", "%Y-%m-%d %H:%M:%S")
+_EXCEL_EPOCH = date(1899, 12, 30)
+
+# raw value -> normalized 'dd.mm.yy' (or the raw text when it is not a date,
+# e.g. "mid May"). Shared across chunks; distinct date values are few.
+_date_memo: Dict[object, str] = {}
+_DATE_MEMO_MAX = 100_000
+
+
+@dataclass
+class ImportReport:
+    rows_read: int = 0
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    rejected: List[Tuple[int, str]] = field(default_factory=list)  # (source row number, reason)
+    chunks: int = 0
+    elapsed: float = 0.0
+    dry_run: bool = False
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows_read / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        verb = "validated" if self.dry_run else "inserted"
+        upserted = f", {self.updated} updated, {self.unchanged} unchanged" if self.updated or self.unchanged else ""
+        return (
+            f"{self.rows_read} rows read, {self.inserted} {verb}{upserted}, {len(self.rejected)} rejected "
+            f"in {self.elapsed:.2f}s ({self.rows_per_sec:,.0f} rows/s, {self.chunks} chunks)"
+        )
+
+
+# ----------------------------
+# Sources
+# ----------------------------
+def iter_source_rows(path: str) -> Iterator[Tuple[int, dict]]:
+    """Yield (source_row_number, {column: raw value}) from a .csv or .xlsx file."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        yield from _iter_csv(path)
+    elif ext in (".xlsx", ".xlsm"):
+        yield from _iter_xlsx(path)
+    else:
+        raise ValueError(f"Unsupported file type '{ext}'. Use .csv or .xlsx.")
+
+
+def _iter_csv(path: str) -> Iterator[Tuple[int, dict]]:
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        for n, row in enumerate(reader, start=2):  # header is line 1
+            yield n, {(k or "").strip(): v for k, v in row.items()}
+
+
+def _iter_xlsx(path: str) -> Iterator[Tuple[int, dict]]:
+    try:
+        from openpyxl import load_workbook
+    except ImportError as e:  # pragma: no cover - openpyxl is in requirements.txt
+        raise RuntimeError("Reading .xlsx needs openpyxl (pip install openpyxl).") from e
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if not header:
+            return
+        names = [str(h).strip() if h is not None else "" for h in header]
+        for n, values in enumerate(rows, start=2):
+            if values is None or all(v is None or v == "" for v in values):
+                continue
+            yield n, dict(zip(names, values))
+    finally:
+        wb.close()
+
+
+# ----------------------------
+# Normalization
+# ----------------------------
+def _clean(value) -> str:
+    if value is None:
+        return ""
+    s = str(value).strip()
+    return "" if s.lower() in {"none", "nan", "nat", "—", "--"} else s
+
+
+def _normalize_date(raw) -> str:
+    if isinstance(raw, datetime):
+        return raw.strftime("%d.%m.%y")
+    if isinstance(raw, date):
+        return raw.strftime("%d.%m.%y")
+    if isinstance(raw, (int, float)) and not isinstance(raw, bool):
+        # Excel serial date that slipped through as a number (CSV exports)
+        if 20000 < raw < 80000:
+            return (_EXCEL_EPOCH + timedelta(days=int(raw))).strftime("%d.%m.%y")
+        return _clean(raw)
+    s = _clean(raw)
+    if not s:
+        return ""
+    for fmt in _TEXT_DATE_FORMATS:
+        try:
+            return datetime.strptime(s, fmt).strftime("%d.%m.%y")
+        except ValueError:
+            continue
+    return s  # free text such as "mid May" is kept as-is
+
+
+def normalize_dates(rows: List[dict], columns: Iterable[str] = DATE_COLUMNS) -> None:
+    """Normalize date columns in place, parsing each distinct raw value once."""
+    if len(_date_memo) > _DATE_MEMO_MAX:
+        _date_memo.clear()
+    for col in columns:
+        values = [r.get(col) for r in rows]
+        for v in set(values) - _date_memo.keys():
+            _date_memo[v] = _normalize_date(v)
+        for r, v in zip(rows, values):
+            r[col] = _date_memo[v]
+
+
+def _quantity(raw) -> Optional[str]:
+    """Positive quantity in the stored string form ("25", "2.5"), or None."""
+    if isinstance(raw, (int, float)) and not isinstance(raw, bool):
+        q = float(raw)
+    else:
+        s = _clean(raw).replace(",", ".").replace(" ", "")
+        if not s:
+            return None
+        try:
+            q = float(s)
+        except ValueError:
+            return None
+    if not q > 0:
+        return None
+    return str(int(q)) if q.is_integer() else str(q)
+
+
+def row_hash(row: dict) -> str:
+    """Fingerprint of the imported values; lets re-imports skip unchanged rows."""
+    payload = "\x1f".join("" if row.get(c) is None else str(row[c]) for c in IMPORT_COLUMNS)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def prepare_chunk(
+    chunk: List[Tuple[int, dict]], user_id: int, report: ImportReport
+) -> List[Tuple[int, dict]]:
+    """Turn raw source rows into (row number, Order params); record rejects on the report."""
+    rows = []
+    for n, raw in chunk:
+        row = {c: raw.get(c) for c in IMPORT_COLUMNS}
+        rows.append((n, row))
+
+    normalize_dates([row for _, row in rows])
+
+    prepared = []
+    for n, row in rows:
+        for col in IMPORT_COLUMNS:
+            if col not in DATE_COLUMNS and col != "quantity":
+                row[col] = _clean(row[col])
+        missing = [c for c in REQUIRED_COLUMNS if not row[c]]
+        if missing:
+            report.rejected.append((n, f"missing {', '.join(missing)}"))
+            continue
+        qty = _quantity(row["quantity"])
+        if qty is None:
+            report.rejected.append((n, f"invalid quantity {row['quantity']!r}"))
+            continue
+        row["quantity"] = qty
+        row["order_number"] = row["order_number"] or None
+        row["user_id"] = user_id
+        row["row_hash"] = row_hash(row)
+        row.update(delay_state(row["eta"], row["ata"]))
+        prepared.append((n, row))
+    return prepared
+
+
+# ----------------------------
+# Engine
+# ----------------------------
+def _chunked(it: Iterator, size: int) -> Iterator[list]:
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_chunks(path: str, chunk_size: int, start_after: int = 0) -> Iterator[List[Tuple[int, dict]]]:
+    """Raw source rows in chunks, skipping rows up to source row `start_after` (resume)."""
+    rows = iter_source_rows(path)
+    if start_after:
+        rows = ((n, r) for n, r in rows if n > start_after)
+    return _chunked(rows, chunk_size)
+
+
+def count_source_rows(path: str) -> Optional[int]:
+    """Cheap row count for progress reporting (None if it cannot be known upfront)."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        with open(path, "rb") as f:
+            return max(sum(1 for _ in f) - 1, 0)
+    try:
+        from openpyxl import load_workbook
+        wb = load_workbook(path, read_only=True)
+        try:
+            return max((wb.active.max_row or 1) - 1, 0)
+        finally:
+            wb.close()
+    except Exception:  # noqa: BLE001 - only an estimate; an unreadable workbook fails later with a reason
+        return None
+
+
+def insert_chunk(prepared: List[Tuple[int, dict]], report: ImportReport) -> None:
+    """Plain INSERT of every prepared row (one executemany). Caller commits."""
+    last_id = db.session.execute(select(func.max(Order.id))).scalar() or 0
+    db.session.execute(insert(Order), [row for _, row in prepared])
+    sync_samples(Order.id > last_id)
+    report.inserted += len(prepared)
+
+
+def upsert_chunk(prepared: List[Tuple[int, dict]], user_id: int, report: ImportReport) -> None:
+    """
+    Upsert by (user_id, order_number). Caller commits.
+
+    One indexed IN lookup fetches the existing ids and row hashes for the
+    chunk. New order numbers are inserted in one executemany, rows whose
+    hash changed are updated in one executemany by primary key, and rows
+    whose hash matches are skipped. The stored hash is the last imported
+    content, so UI edits are not overwritten by a re-import of an
+    unchanged file.
+    """
+    by_number: Dict[str, Tuple[int, dict]] = {}
+    for n, row in prepared:
+        num = row["order_number"]
+        if not num:
+            report.rejected.append((n, "missing order_number (required to upsert)"))
+            continue
+        if num in by_number:
+            report.rejected.append((by_number[num][0], f"duplicate order_number {num!r}; row {n} wins"))
+        by_number[num] = (n, row)
+    if not by_number:
+        return
+
+    existing: Dict[str, Tuple[int, Optional[str]]] = {}
+    found = db.session.execute(
+        select(Order.id, Order.order_number, Order.row_hash)
+        .where(Order.user_id == user_id, Order.order_number.in_(list(by_number)))
+        .order_by(Order.id.desc())
+    )
+    for oid, num, h in found:
+        existing[num] = (oid, h)  # lowest id wins if legacy duplicates exist
+
+    inserts, updates = [], []
+    for num, (_, row) in by_number.items():
+        if num not in existing:
+            inserts.append(row)
+        elif existing[num][1] != row["row_hash"]:
+            updates.append({**row, "id": existing[num][0]})
+        else:
+            report.unchanged += 1
+
+    if inserts:
+        last_id = db.session.execute(select(func.max(Order.id))).scalar() or 0
+        db.session.execute(insert(Order), inserts)
+        sync_samples(Order.id > last_id)
+        report.inserted += len(inserts)
+    if updates:
+        db.session.execute(update(Order), updates)
+        sync_samples(Order.id.in_([row["id"] for row in updates]))
+        report.updated += len(updates)
+
+
+def import_orders(
+    path: str,
+    user_id: int,
+    chunk_size: int = 1000,
+    dry_run: bool = False,
+    upsert: bool = False,
+) -> ImportReport:
+    """
+    Stream `path` into the Order table for `user_id`.
+
+    Each chunk is one executemany INSERT (or an upsert, see upsert_chunk) in
+    its own transaction; a failing chunk is rolled back and its rows reported
+    as rejected, earlier chunks stay committed. With `dry_run` nothing is
+    written.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be >= 1")
+
+    report = ImportReport(dry_run=dry_run)
+    started = time.perf_counter()
+
+    for chunk in iter_chunks(path, chunk_size):
+        report.rows_read += len(chunk)
+        report.chunks += 1
+        prepared = prepare_chunk(chunk, user_id, report)
+        if not prepared:
+            continue
+        if dry_run:
+            report.inserted += len(prepared)
+            continue
+        try:
+            if upsert:
+                upsert_chunk(prepared, user_id, report)
+            else:
+                insert_chunk(prepared, report)
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            first, last = chunk[0][0], chunk[-1][0]
+            report.rejected.append((first, f"chunk rows {first}-{last} failed: {e}"))
+
+    report.elapsed = time.perf_counter() - started
+    return report
@@ -0,0 +1,188 @@
+"""
+Write-only, streaming XLSX writer.
+
+An .xlsx file is a zip of XML parts. The worksheet part is written row by
+row into a zip stream that has no seek support (zipfile then uses data
+descriptors), and the compressed bytes are handed to the caller as they are
+produced. Nothing grows with the row count: no shared-strings table
+(strings are written inline), no in-memory workbook, no temp file. This lets
+a Flask response start sending before the last row is read from the DB.
+
+openpyxl (used to read uploads, app/utils/order_import.py) has a write-only
+workbook too, but it only produces bytes on save(), after the last row,
+from a temp file, so a download could not start until the export is done.
+"""
+import io
+import math
+import re
+import zipfile
+from datetime import date, datetime
+from typing import Iterable, Iterator, Sequence
+from xml.sax.saxutils import escape
+
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+_EXCEL_EPOCH = date(1899, 12, 30)
+_ILLEGAL_XML = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+# Style 0: default, 1: bold header, 2: date (dd.mm.yy to match the UI).
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="dd.mm.yy"/></numFmts>'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="3">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+
+class _Sink(io.RawIOBase):
+    """Unseekable byte sink; the zip writer appends, the generator drains."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def to_number(value):
+    """Quantities are stored as strings; write them as numbers when they parse to a finite value."""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    try:
+        f = float(str(value).strip())
+    except ValueError:
+        return value
+    if not math.isfinite(f):  # 'nan', 'inf', '1e400': Excel has no such numbers
+        return value
+    return int(f) if f.is_integer() else f
+
+
+def _workbook_xml(sheet_name: str) -> str:
+    name = escape(_ILLEGAL_XML.sub("", sheet_name)[:31] or "Sheet1", {'"': "&quot;"})
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+
+
+def _cell(value, style: int = 0) -> str:
+    if value is None or value == "":
+        return "<c/>"
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, int) or (isinstance(value, float) and math.isfinite(value)):
+        return f"<c><v>{value!r}</v></c>"
+    if isinstance(value, (date, datetime)):
+        d = value.date() if isinstance(value, datetime) else value
+        return f'<c s="2"><v>{(d - _EXCEL_EPOCH).days}</v></c>'
+    text = escape(_ILLEGAL_XML.sub("", str(value)))
+    s_attr = f' s="{style}"' if style else ""
+    return f'<c t="inlineStr"{s_attr}><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _row(values: Sequence, style: int = 0) -> str:
+    return "<row>" + "".join(_cell(v, style) for v in values) + "</row>"
+
+
+def stream_xlsx(
+    header: Sequence[str],
+    rows: Iterable[Sequence],
+    sheet_name: str = "Sheet1",
+    flush_every: int = 500,
+) -> Iterator[bytes]:
+    """
+    Yield the bytes of a single-sheet .xlsx file.
+
+    `rows` is consumed lazily; compressed output is yielded every
+    `flush_every` rows. Cell values may be str, int, float, bool, date or
+    None; dates are written as real Excel dates.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        zf.writestr("_rels/.rels", _ROOT_RELS)
+        zf.writestr("xl/workbook.xml", _workbook_xml(sheet_name))
+        zf.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        zf.writestr("xl/styles.xml", _STYLES)
+        yield sink.drain()
+
+        with zf.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b'<sheetViews><sheetView workbookViewId="0">'
+                b'<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+                b'</sheetView></sheetViews><sheetData>'
+            )
+            sheet.write(_row(header, style=1).encode("utf-8"))
+            buf = []
+            for i, values in enumerate(rows, start=1):
+                buf.append(_row(values))
+                if i % flush_every == 0:
+                    sheet.write("".join(buf).encode("utf-8"))
+                    buf.clear()
+                    yield sink.drain()
+            if buf:
+                sheet.write("".join(buf).encode("utf-8"))
+            sheet.write(b"</sheetData></worksheet>")
+        yield sink.drain()
+    yield sink.drain()
@@ -0,0 +1,26 @@
+# gunicorn.conf.py — server hooks; gunicorn loads this file from the working directory.
+# The Procfile flags (bind, workers, threads, --preload) still set the server options.
+#
+# With PROMETHEUS_MULTIPROC_DIR set (app/metrics.py), every worker writes its
+# metric values to mmap files in that directory. The master clears the files
+# of the previous run at startup and marks each exited worker dead, so its
+# live gauges (requests in progress) drop out of the sum.
+import glob
+import os
+
+
+def on_starting(server):
+    multiproc_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if multiproc_dir:
+        os.makedirs(multiproc_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(multiproc_dir, "*.db")):
+            os.remove(path)
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        try:
+            from prometheus_client import multiprocess
+        except ImportError:
+            return
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,39 @@
+"""Add kpi_daily (per-day, per-user KPI events)
+
+Revision ID: a2c4e6f8b0d1
+Revises: f1b6d8e2a4c7
+Create Date: 2026-10-19 19:00:00.000000
+
+The table is backfilled from history by the first daily refresh (or
+`flask kpi-snapshot --full`).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a2c4e6f8b0d1'
+down_revision = 'f1b6d8e2a4c7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'kpi_daily',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('user_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('transit', sa.Integer(), nullable=False),
+        sa.Column('warehouse', sa.Integer(), nullable=False),
+        sa.Column('delivered', sa.Integer(), nullable=False),
+        sa.Column('delayed', sa.Integer(), nullable=False),
+        sa.Column('transit_qty', sa.Float(), nullable=False),
+        sa.Column('warehouse_qty', sa.Float(), nullable=False),
+        sa.Column('delivered_qty', sa.Float(), nullable=False),
+        sa.Column('refreshed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('day', 'user_id'),
+    )
+
+
+def downgrade():
+    op.drop_table('kpi_daily')
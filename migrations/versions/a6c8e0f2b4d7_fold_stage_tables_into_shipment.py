@@ -0,0 +1,422 @@
+"""Fold order / warehouse_stock / delivered_goods into the shipment table
+
+Revision ID: a6c8e0f2b4d7
+Revises: f3b5d7e9a1c2
+Create Date: 2026-10-20 12:00:00.000000
+
+Every stage row becomes the shipment row it pointed at (shipment_id), so a
+stage transition is one UPDATE of shipment.stage. Rows without a live
+shipment of their stage (legacy rows, soft-archived warehouse rows) get a
+new shipment row. Shipments left without a stage row are dropped. Rows are
+copied BATCH_SIZE at a time.
+
+stock_report_entry.related_order_id is remapped to the new ids and now
+references shipment. order_change_log is cleared (it held old order ids;
+snapshot workers reload). The stage counter triggers move to the shipment
+table and the counts are rebuilt; like f1b6d8e2a4c7 the DDL is written out
+here, not imported from app/counters.py.
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6c8e0f2b4d7'
+down_revision = 'f3b5d7e9a1c2'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+# columns added to shipment (user_id, order_number, stage, parent_id, timestamps exist already)
+NEW_COLUMNS = (
+    ('product_name', sa.String(length=100)),
+    ('quantity', sa.String(length=50)),
+    ('ata', sa.String(length=10)),
+    ('transit_status', sa.String(length=20)),
+    ('transport', sa.String(length=20)),
+    ('notes', sa.String(length=120)),
+    ('pod_filename', sa.String(length=120)),
+    ('warehouse_address', sa.String(length=255)),
+    ('client', sa.String(length=255)),
+    ('pos_no', sa.String(length=50)),
+    ('customer_ref', sa.String(length=50)),
+    ('order_date', sa.String(length=10)),
+    ('buyer', sa.String(length=100)),
+    ('responsible', sa.String(length=100)),
+    ('required_delivery', sa.String(length=10)),
+    ('terms_of_delivery', sa.String(length=100)),
+    ('payment_date', sa.String(length=10)),
+    ('etd', sa.String(length=10)),
+    ('eta', sa.String(length=10)),
+    ('row_hash', sa.String(length=40)),
+    ('delay_days', sa.Integer()),
+    ('is_manual', sa.Boolean()),
+    ('is_archived', sa.Boolean()),
+    ('archived_at', sa.DateTime()),
+    ('delivery_source', sa.String(length=50)),
+    ('delivery_date', sa.String(length=10)),
+)
+
+# stage table, stage, detail columns (besides id and shipment_id)
+STAGE_TABLES = (
+    ('order', 'transit', (
+        'user_id', 'order_date', 'order_number', 'product_name', 'buyer', 'responsible', 'quantity',
+        'required_delivery', 'terms_of_delivery', 'payment_date', 'etd', 'eta', 'ata', 'transit_status',
+        'transport', 'pod_filename', 'row_hash', 'is_delayed', 'delay_days',
+    )),
+    ('warehouse_stock', 'warehouse', (
+        'user_id', 'order_number', 'product_name', 'quantity', 'ata', 'transit_status', 'notes', 'transport',
+        'is_manual', 'pod_filename', 'warehouse_address', 'client', 'pos_no', 'customer_ref', 'is_archived',
+        'archived_at',
+    )),
+    ('delivered_goods', 'delivered', (
+        'user_id', 'order_number', 'product_name', 'quantity', 'delivery_source', 'delivery_date', 'transport',
+        'notes', 'pod_filename', 'warehouse_address', 'client', 'pos_no', 'customer_ref',
+    )),
+)
+STAGES = tuple(stage for _, stage, _ in STAGE_TABLES)
+
+# stage, counted-row condition (sqlite, postgresql)
+COUNTED = (
+    ('transit', None, None),
+    ('warehouse', '{row}.is_archived = 0', '{row}.is_archived = false'),
+    ('delivered', None, None),
+)
+
+PG_FUNCTION = """
+CREATE OR REPLACE FUNCTION {name}() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE'){old_ok} THEN
+        PERFORM stage_counter_bump(OLD.user_id, '{stage}', -1);
+    END IF;
+    IF TG_OP IN ('UPDATE', 'INSERT'){new_ok} THEN
+        PERFORM stage_counter_bump(NEW.user_id, '{stage}', 1);
+    END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql
+"""
+
+
+def _shipment_table():
+    cols = {c for _, _, detail in STAGE_TABLES for c in detail}
+    return sa.table('shipment', sa.column('id', sa.Integer), sa.column('stage', sa.String),
+                    sa.column('created_at', sa.DateTime), sa.column('updated_at', sa.DateTime),
+                    *(sa.column(c) for c in sorted(cols)))
+
+
+def _fold(bind, table_name, stage, detail, claimed):
+    """Move the rows of one stage table into shipment. Returns {old row id: shipment id}."""
+    src = sa.table(table_name, sa.column('id', sa.Integer), sa.column('shipment_id', sa.Integer),
+                   *(sa.column(c) for c in detail))
+    shipment = _shipment_table()
+    set_detail = shipment.update().where(shipment.c.id == sa.bindparam('sid')).values(
+        stage=stage, **{c: sa.bindparam(f'v_{c}') for c in detail}
+    )
+    now = datetime.utcnow()
+    new_ids, last = {}, 0
+    while True:
+        rows = bind.execute(
+            sa.select(src).where(src.c.id > last).order_by(src.c.id).limit(BATCH_SIZE)
+        ).mappings().all()
+        if not rows:
+            return new_ids
+        last = rows[-1]['id']
+        linked = {r['shipment_id'] for r in rows if r['shipment_id'] is not None}
+        stage_of = dict(bind.execute(
+            sa.select(shipment.c.id, shipment.c.stage).where(shipment.c.id.in_(linked))
+        ).all()) if linked else {}
+
+        updates, inserts = [], []
+        for r in rows:
+            sid = r['shipment_id']
+            live = not (table_name == 'warehouse_stock' and r['is_archived'])
+            if live and sid is not None and stage_of.get(sid) == stage and sid not in claimed:
+                claimed.add(sid)
+                new_ids[r['id']] = sid
+                updates.append({'sid': sid, **{f'v_{c}': r[c] for c in detail}})
+            else:
+                inserts.append(r)
+        if updates:
+            bind.execute(set_detail, updates)
+        if inserts:
+            ids = bind.execute(
+                sa.insert(shipment).returning(shipment.c.id, sort_by_parameter_order=True),
+                [{'stage': stage, 'created_at': now, 'updated_at': now, **{c: r[c] for c in detail}}
+                 for r in inserts],
+            ).scalars().all()
+            claimed.update(ids)
+            new_ids.update((r['id'], sid) for r, sid in zip(inserts, ids))
+
+
+def _drop_orphans(bind, claimed):
+    """Delete stage shipments that no stage row was folded into."""
+    shipment = _shipment_table()
+    last = 0
+    while True:
+        ids = bind.execute(
+            sa.select(shipment.c.id).where(shipment.c.stage.in_(STAGES), shipment.c.id > last)
+            .order_by(shipment.c.id).limit(BATCH_SIZE)
+        ).scalars().all()
+        if not ids:
+            return
+        last = ids[-1]
+        orphans = [i for i in ids if i not in claimed]
+        if orphans:
+            bind.execute(shipment.delete().where(shipment.c.id.in_(orphans)))
+
+
+def _remap_stock_reports(bind, id_map):
+    """Point stock report entries at the shipment ids of their warehouse rows (NULL if the row is gone)."""
+    entry = sa.table('stock_report_entry', sa.column('id', sa.Integer), sa.column('related_order_id', sa.Integer))
+    remap = entry.update().where(entry.c.id == sa.bindparam('entry_id')).values(
+        related_order_id=sa.bindparam('target')
+    )
+    last = 0
+    while True:
+        rows = bind.execute(
+            sa.select(entry.c.id, entry.c.related_order_id)
+            .where(entry.c.related_order_id.is_not(None), entry.c.id > last)
+            .order_by(entry.c.id).limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        last = rows[-1].id
+        bind.execute(remap, [{'entry_id': r.id, 'target': id_map.get(r.related_order_id)} for r in rows])
+
+
+def _counter_triggers(dialect):
+    if dialect == 'sqlite':
+        cols = 'user_id, stage, is_archived'
+        for stage, live, _ in COUNTED:
+            name = f"shipment_{stage}_count"
+            cond = f"{{row}}.stage = '{stage}'" + (f" AND {live}" if live else "")
+            up = (f"INSERT INTO stage_counters (user_id, stage, count) VALUES (NEW.user_id, '{stage}', 1) "
+                  f"ON CONFLICT (user_id, stage) DO UPDATE SET count = count + 1;")
+            down = f"UPDATE stage_counters SET count = count - 1 WHERE user_id = OLD.user_id AND stage = '{stage}';"
+            old_when, new_when = cond.format(row='OLD'), cond.format(row='NEW')
+            yield f'CREATE TRIGGER IF NOT EXISTS {name}_ins AFTER INSERT ON shipment WHEN {new_when} BEGIN {up} END'
+            yield f'CREATE TRIGGER IF NOT EXISTS {name}_del AFTER DELETE ON shipment WHEN {old_when} BEGIN {down} END'
+            yield (f'CREATE TRIGGER IF NOT EXISTS {name}_upd_old AFTER UPDATE OF {cols} ON shipment '
+                   f'WHEN {old_when} BEGIN {down} END')
+            yield (f'CREATE TRIGGER IF NOT EXISTS {name}_upd_new AFTER UPDATE OF {cols} ON shipment '
+                   f'WHEN {new_when} BEGIN {up} END')
+    elif dialect == 'postgresql':
+        cols = 'user_id, stage, is_archived'
+        for stage, _, live in COUNTED:
+            name = f"shipment_{stage}_count"
+            cond = f"{{row}}.stage = '{stage}'" + (f" AND {live}" if live else "")
+            yield PG_FUNCTION.format(name=name, stage=stage, old_ok=f" AND {cond.format(row='OLD')}",
+                                     new_ok=f" AND {cond.format(row='NEW')}")
+            yield f'DROP TRIGGER IF EXISTS {name} ON shipment'
+            yield (f'CREATE TRIGGER {name} AFTER INSERT OR DELETE OR UPDATE OF {cols} ON shipment '
+                   f'FOR EACH ROW EXECUTE FUNCTION {name}()')
+
+
+def _drop_counter_triggers(bind, triggers):
+    """Drop the counting triggers given as (trigger name, table) pairs."""
+    for name, table in triggers:
+        if bind.dialect.name == 'sqlite':
+            for suffix in ('ins', 'del', 'upd_old', 'upd_new'):
+                bind.execute(sa.text(f"DROP TRIGGER IF EXISTS {name}_{suffix}"))
+        elif bind.dialect.name == 'postgresql':
+            bind.execute(sa.text(f'DROP TRIGGER IF EXISTS {name} ON "{table}"'))
+            bind.execute(sa.text(f"DROP FUNCTION IF EXISTS {name}()"))
+
+
+def upgrade():
+    bind = op.get_bind()
+    with op.batch_alter_table('shipment', schema=None) as batch_op:
+        for name, type_ in NEW_COLUMNS:
+            batch_op.add_column(sa.Column(name, type_, nullable=True))
+        batch_op.add_column(sa.Column('is_delayed', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+    claimed = set()
+    id_maps = {table_name: _fold(bind, table_name, stage, detail, claimed)
+               for table_name, stage, detail in STAGE_TABLES}
+    _drop_orphans(bind, claimed)
+
+    has_reports = sa.inspect(bind).has_table('stock_report_entry')
+    if has_reports:
+        _remap_stock_reports(bind, id_maps['warehouse_stock'])
+        with op.batch_alter_table('stock_report_entry', schema=None) as batch_op:
+            batch_op.drop_constraint('fk_stockreport_warehouse', type_='foreignkey')
+            batch_op.create_foreign_key('fk_stockreport_shipment', 'shipment', ['related_order_id'], ['id'])
+    op.execute(sa.text('DELETE FROM order_change_log'))
+
+    _drop_counter_triggers(bind, [(f"{t}_stage_count", t) for t, _, _ in STAGE_TABLES])
+    for table_name, _, _ in STAGE_TABLES:
+        op.drop_table(table_name)
+
+    op.create_index('ix_shipment_user_order_number', 'shipment', ['user_id', 'order_number'], unique=False)
+    op.create_index(
+        'ix_order_delayed', 'shipment', ['delay_days'], unique=False,
+        sqlite_where=sa.text('is_delayed = 1'),
+        postgresql_where=sa.text('is_delayed = true'),
+    )
+    op.create_index(
+        'ix_warehouse_stock_active', 'shipment', ['user_id', 'ata'], unique=False,
+        sqlite_where=sa.text('is_archived = 0'),
+        postgresql_where=sa.text('is_archived = false'),
+    )
+
+    for sql in _counter_triggers(bind.dialect.name):
+        bind.execute(sa.text(sql))
+    bind.execute(sa.text('DELETE FROM stage_counters'))
+    for stage, live, _ in COUNTED:
+        where = "stage = :stage" + (" AND is_archived = :no" if live else "")
+        bind.execute(sa.text(
+            f'INSERT INTO stage_counters (user_id, stage, count) '
+            f'SELECT user_id, :stage, COUNT(*) FROM shipment WHERE {where} GROUP BY user_id'
+        ), {'stage': stage, 'no': False})
+
+
+# ---------------- downgrade ----------------
+OLD_TABLES = {
+    'order': lambda: [
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), nullable=False),
+        sa.Column('order_date', sa.String(length=10), nullable=False),
+        sa.Column('order_number', sa.String(length=50), nullable=True),
+        sa.Column('product_name', sa.String(length=100), nullable=False),
+        sa.Column('buyer', sa.String(length=100), nullable=False),
+        sa.Column('responsible', sa.String(length=100), nullable=False),
+        sa.Column('quantity', sa.String(length=50), nullable=False),
+        sa.Column('required_delivery', sa.String(length=10), nullable=True),
+        sa.Column('terms_of_delivery', sa.String(length=100), nullable=True),
+        sa.Column('payment_date', sa.String(length=10), nullable=True),
+        sa.Column('etd', sa.String(length=10), nullable=True),
+        sa.Column('eta', sa.String(length=10), nullable=True),
+        sa.Column('ata', sa.String(length=10), nullable=True),
+        sa.Column('transit_status', sa.String(length=20), nullable=False),
+        sa.Column('transport', sa.String(length=20), nullable=False),
+        sa.Column('pod_filename', sa.String(length=120), nullable=True),
+        sa.Column('row_hash', sa.String(length=40), nullable=True),
+        sa.Column('is_delayed', sa.Boolean(), server_default=sa.false(), nullable=False),
+        sa.Column('delay_days', sa.Integer(), nullable=True),
+    ],
+    'warehouse_stock': lambda: [
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), nullable=False),
+        sa.Column('order_number', sa.String(length=50), nullable=False),
+        sa.Column('product_name', sa.String(length=100), nullable=False),
+        sa.Column('quantity', sa.String(length=50), nullable=False),
+        sa.Column('ata', sa.String(length=10), nullable=True),
+        sa.Column('transit_status', sa.String(length=20), nullable=False),
+        sa.Column('notes', sa.String(length=120), nullable=True),
+        sa.Column('transport', sa.String(length=20), nullable=True),
+        sa.Column('is_manual', sa.Boolean(), nullable=True),
+        sa.Column('pod_filename', sa.String(length=120), nullable=True),
+        sa.Column('warehouse_address', sa.String(length=255), nullable=True),
+        sa.Column('client', sa.String(length=255), nullable=True),
+        sa.Column('pos_no', sa.String(length=50), nullable=True),
+        sa.Column('customer_ref', sa.String(length=50), nullable=True),
+        sa.Column('is_archived', sa.Boolean(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=True),
+    ],
+    'delivered_goods': lambda: [
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), nullable=False),
+        sa.Column('order_number', sa.String(length=50), nullable=False),
+        sa.Column('product_name', sa.String(length=100), nullable=False),
+        sa.Column('quantity', sa.String(length=50), nullable=False),
+        sa.Column('delivery_source', sa.String(length=50), nullable=False),
+        sa.Column('delivery_date', sa.String(length=10), nullable=False),
+        sa.Column('transport', sa.String(length=20), nullable=True),
+        sa.Column('notes', sa.String(length=120), nullable=True),
+        sa.Column('pod_filename', sa.String(length=120), nullable=True),
+        sa.Column('warehouse_address', sa.String(length=255), nullable=True),
+        sa.Column('client', sa.String(length=255), nullable=True),
+        sa.Column('pos_no', sa.String(length=50), nullable=True),
+        sa.Column('customer_ref', sa.String(length=50), nullable=True),
+    ],
+}
+
+OLD_COUNTED = (
+    ('order', 'transit', 'user_id', None, None),
+    ('warehouse_stock', 'warehouse', 'user_id, is_archived', '{row}.is_archived = 0', '{row}.is_archived = false'),
+    ('delivered_goods', 'delivered', 'user_id', None, None),
+)
+
+
+def _old_counter_triggers(dialect):
+    for table, stage, cols, sqlite_live, pg_live in OLD_COUNTED:
+        name = f"{table}_stage_count"
+        if dialect == 'sqlite':
+            up = (f"INSERT INTO stage_counters (user_id, stage, count) VALUES (NEW.user_id, '{stage}', 1) "
+                  f"ON CONFLICT (user_id, stage) DO UPDATE SET count = count + 1;")
+            down = f"UPDATE stage_counters SET count = count - 1 WHERE user_id = OLD.user_id AND stage = '{stage}';"
+            old_when = f" WHEN {sqlite_live.format(row='OLD')}" if sqlite_live else ""
+            new_when = f" WHEN {sqlite_live.format(row='NEW')}" if sqlite_live else ""
+            yield f'CREATE TRIGGER IF NOT EXISTS {name}_ins AFTER INSERT ON "{table}"{new_when} BEGIN {up} END'
+            yield f'CREATE TRIGGER IF NOT EXISTS {name}_del AFTER DELETE ON "{table}"{old_when} BEGIN {down} END'
+            yield (f'CREATE TRIGGER IF NOT EXISTS {name}_upd_old AFTER UPDATE OF {cols} ON "{table}"{old_when} '
+                   f'BEGIN {down} END')
+            yield (f'CREATE TRIGGER IF NOT EXISTS {name}_upd_new AFTER UPDATE OF {cols} ON "{table}"{new_when} '
+                   f'BEGIN {up} END')
+        elif dialect == 'postgresql':
+            old_ok = f" AND {pg_live.format(row='OLD')}" if pg_live else ""
+            new_ok = f" AND {pg_live.format(row='NEW')}" if pg_live else ""
+            yield PG_FUNCTION.format(name=name, stage=stage, old_ok=old_ok, new_ok=new_ok)
+            yield f'DROP TRIGGER IF EXISTS {name} ON "{table}"'
+            yield (f'CREATE TRIGGER {name} AFTER INSERT OR DELETE OR UPDATE OF {cols} ON "{table}" '
+                   f'FOR EACH ROW EXECUTE FUNCTION {name}()')
+
+
+def downgrade():
+    """Split the stage rows back out; each keeps the shipment's id and points at it."""
+    bind = op.get_bind()
+    _drop_counter_triggers(bind, [(f"shipment_{stage}_count", 'shipment') for stage in STAGES])
+    op.drop_index('ix_warehouse_stock_active', table_name='shipment')
+    op.drop_index('ix_order_delayed', table_name='shipment')
+    op.drop_index('ix_shipment_user_order_number', table_name='shipment')
+
+    shipment = _shipment_table()
+    for table_name, stage, detail in STAGE_TABLES:
+        op.create_table(
+            table_name,
+            sa.Column('id', sa.Integer(), primary_key=True),
+            *OLD_TABLES[table_name](),
+            sa.Column('shipment_id', sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(['shipment_id'], ['shipment.id'], name=f'fk_{table_name}_shipment',
+                                    ondelete='SET NULL'),
+        )
+        op.create_index(f'ix_{table_name}_shipment_id', table_name, ['shipment_id'], unique=False)
+        dst = sa.table(table_name, sa.column('id'), sa.column('shipment_id'), *(sa.column(c) for c in detail))
+        bind.execute(dst.insert().from_select(
+            ['id', 'shipment_id', *detail],
+            sa.select(shipment.c.id, shipment.c.id, *(shipment.c[c] for c in detail))
+            .where(shipment.c.stage == stage),
+        ))
+        if bind.dialect.name == 'postgresql':
+            bind.execute(sa.text(
+                f"SELECT setval(pg_get_serial_sequence('\"{table_name}\"', 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM \"{table_name}\"), 0) + 1, false)"
+            ))
+    # soft-archived warehouse rows were history without a shipment of their own
+    op.execute(sa.text("UPDATE warehouse_stock SET shipment_id = NULL WHERE is_archived = :yes").bindparams(yes=True))
+    op.execute(sa.text("DELETE FROM shipment WHERE stage = 'warehouse' AND is_archived = :yes").bindparams(yes=True))
+    op.execute(sa.text('DELETE FROM order_change_log'))
+
+    op.create_index('ix_order_user_order_number', 'order', ['user_id', 'order_number'], unique=False)
+    op.create_index(
+        'ix_order_delayed', 'order', ['delay_days'], unique=False,
+        sqlite_where=sa.text('is_delayed = 1'),
+        postgresql_where=sa.text('is_delayed = true'),
+    )
+    op.create_index(
+        'ix_warehouse_stock_active', 'warehouse_stock', ['user_id', 'ata'], unique=False,
+        sqlite_where=sa.text('is_archived = 0'),
+        postgresql_where=sa.text('is_archived = false'),
+    )
+    if sa.inspect(bind).has_table('stock_report_entry'):
+        with op.batch_alter_table('stock_report_entry', schema=None) as batch_op:
+            batch_op.drop_constraint('fk_stockreport_shipment', type_='foreignkey')
+            batch_op.create_foreign_key('fk_stockreport_warehouse', 'warehouse_stock', ['related_order_id'], ['id'])
+
+    with op.batch_alter_table('shipment', schema=None) as batch_op:
+        for name, _ in NEW_COLUMNS:
+            batch_op.drop_column(name)
+        batch_op.drop_column('is_delayed')
+
+    for sql in _old_counter_triggers(bind.dialect.name):
+        bind.execute(sa.text(sql))
@@ -0,0 +1,45 @@
+"""Add transit_sample and transit_rollup (lead-time analytics)
+
+Revision ID: b4d6f8a0c2e3
+Revises: a2c4e6f8b0d1
+Create Date: 2026-10-19 20:00:00.000000
+
+Fill them once with `flask rebuild-rollups` (the daily job does the same).
+Lead times of orders that already left the order table cannot be recovered.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4d6f8a0c2e3'
+down_revision = 'a2c4e6f8b0d1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'transit_sample',
+        sa.Column('shipment_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('transport', sa.String(length=20), nullable=False),
+        sa.Column('month', sa.String(length=7), nullable=False),
+        sa.Column('days', sa.Integer(), nullable=False),
+        sa.Column('bucket', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('shipment_id'),
+    )
+    op.create_table(
+        'transit_rollup',
+        sa.Column('transport', sa.String(length=20), nullable=False),
+        sa.Column('month', sa.String(length=7), nullable=False),
+        sa.Column('bucket', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('n', sa.Integer(), nullable=False),
+        sa.Column('sum_days', sa.Integer(), nullable=False),
+        sa.Column('sum_sq_days', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('transport', 'month', 'bucket'),
+    )
+
+
+def downgrade():
+    op.drop_table('transit_rollup')
+    op.drop_table('transit_sample')
@@ -0,0 +1,97 @@
+"""Add shipment table and shipment_id on the stage tables (batched backfill)
+
+Revision ID: c4e8a1f0b6d2
+Revises: b3c1d9e4f2a7
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e8a1f0b6d2'
+down_revision = 'b3c1d9e4f2a7'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+STAGE_TABLES = (('order', 'transit'), ('warehouse_stock', 'warehouse'), ('delivered_goods', 'delivered'))
+
+
+def _backfill(bind, table_name, stage):
+    """Give every existing row its own shipment, BATCH_SIZE rows per statement."""
+    shipment = sa.Table(
+        'shipment', sa.MetaData(),
+        sa.Column('id', sa.Integer, primary_key=True), sa.Column('user_id', sa.Integer),
+        sa.Column('order_number', sa.String), sa.Column('stage', sa.String),
+        sa.Column('created_at', sa.DateTime), sa.Column('updated_at', sa.DateTime),
+    )
+    cols = [sa.column('id', sa.Integer), sa.column('user_id', sa.Integer),
+            sa.column('order_number', sa.String), sa.column('shipment_id', sa.Integer)]
+    if table_name == 'warehouse_stock':
+        cols.append(sa.column('is_archived', sa.Boolean))
+    detail = sa.table(table_name, *cols)
+
+    live = sa.true()
+    if table_name == 'warehouse_stock':
+        live = sa.or_(detail.c.is_archived.is_(None), detail.c.is_archived.is_(False))
+
+    now = datetime.utcnow()
+    while True:
+        rows = bind.execute(
+            sa.select(detail.c.id, detail.c.user_id, detail.c.order_number)
+            .where(detail.c.shipment_id.is_(None), live)
+            .order_by(detail.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        ids = bind.execute(
+            sa.insert(shipment).returning(shipment.c.id, sort_by_parameter_order=True),
+            [{'user_id': r.user_id, 'order_number': r.order_number, 'stage': stage,
+              'created_at': now, 'updated_at': now} for r in rows],
+        ).scalars().all()
+        bind.execute(
+            sa.update(detail).where(detail.c.id == sa.bindparam('row_id')).values(shipment_id=sa.bindparam('sid')),
+            [{'row_id': r.id, 'sid': sid} for r, sid in zip(rows, ids)],
+        )
+
+
+def upgrade():
+    op.create_table(
+        'shipment',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('order_number', sa.String(length=50), nullable=True),
+        sa.Column('stage', sa.String(length=20), nullable=False),
+        sa.Column('parent_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+    )
+    op.create_index('ix_shipment_order_number', 'shipment', ['order_number'], unique=False)
+
+    for table_name, _ in STAGE_TABLES:
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('shipment_id', sa.Integer(), nullable=True))
+            batch_op.create_index(f'ix_{table_name}_shipment_id', ['shipment_id'], unique=False)
+            batch_op.create_foreign_key(
+                f'fk_{table_name}_shipment', 'shipment', ['shipment_id'], ['id'], ondelete='SET NULL'
+            )
+
+    bind = op.get_bind()
+    for table_name, stage in STAGE_TABLES:
+        _backfill(bind, table_name, stage)
+
+
+def downgrade():
+    for table_name, _ in STAGE_TABLES:
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.drop_constraint(f'fk_{table_name}_shipment', type_='foreignkey')
+            batch_op.drop_index(f'ix_{table_name}_shipment_id')
+            batch_op.drop_column('shipment_id')
+    op.drop_index('ix_shipment_order_number', table_name='shipment')
+    op.drop_table('shipment')
@@ -0,0 +1,37 @@
+"""Add buyer / eta / ata / synced_at to transit_sample (lead-time percentiles)
+
+Revision ID: c6e8a0b2d4f5
+Revises: b4d6f8a0c2e3
+Create Date: 2026-10-19 21:00:00.000000
+
+Run `flask rebuild-rollups` once after upgrading to fill the new columns for
+orders still in transit; samples of shipments that already left the order
+table keep them empty and count towards lead times but not slippage.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6e8a0b2d4f5'
+down_revision = 'b4d6f8a0c2e3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('transit_sample', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('buyer', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('eta', sa.Date(), nullable=True))
+        batch_op.add_column(sa.Column('ata', sa.Date(), nullable=True))
+        batch_op.add_column(sa.Column('synced_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_transit_sample_synced_at'), ['synced_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('transit_sample', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_transit_sample_synced_at'))
+        batch_op.drop_column('synced_at')
+        batch_op.drop_column('ata')
+        batch_op.drop_column('eta')
+        batch_op.drop_column('buyer')
@@ -0,0 +1,33 @@
+"""Add WarehouseStock.archived_at and a partial index on active (non-archived) rows
+
+Revision ID: d5f2b7c3a9e1
+Revises: c4e8a1f0b6d2
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5f2b7c3a9e1'
+down_revision = 'c4e8a1f0b6d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('warehouse_stock', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('archived_at', sa.DateTime(), nullable=True))
+
+    op.create_index(
+        'ix_warehouse_stock_active', 'warehouse_stock', ['user_id', 'ata'], unique=False,
+        sqlite_where=sa.text('is_archived = 0'),
+        postgresql_where=sa.text('is_archived = false'),
+    )
+
+
+def downgrade():
+    op.drop_index('ix_warehouse_stock_active', table_name='warehouse_stock')
+    with op.batch_alter_table('warehouse_stock', schema=None) as batch_op:
+        batch_op.drop_column('archived_at')
@@ -0,0 +1,39 @@
+"""Add eta_model (ETA predictor) and transit_sample.product
+
+Revision ID: d8f0b2c4e6a7
+Revises: c6e8a0b2d4f5
+Create Date: 2026-10-19 22:00:00.000000
+
+Run `flask rebuild-rollups` and then `flask train-eta-model` once after
+upgrading (the daily job does both).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8f0b2c4e6a7'
+down_revision = 'c6e8a0b2d4f5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('transit_sample', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('product', sa.String(length=100), nullable=True))
+
+    op.create_table(
+        'eta_model',
+        sa.Column('level', sa.String(length=40), nullable=False),
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.Column('days', sa.Integer(), nullable=False),
+        sa.Column('n', sa.Integer(), nullable=False),
+        sa.Column('trained_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('level', 'key'),
+    )
+
+
+def downgrade():
+    op.drop_table('eta_model')
+    with op.batch_alter_table('transit_sample', schema=None) as batch_op:
+        batch_op.drop_column('product')
@@ -0,0 +1,39 @@
+"""Add order_change_log (columnar order snapshot)
+
+Revision ID: e2a4c6e8f0b3
+Revises: d8f0b2c4e6a7
+Create Date: 2026-10-19 23:00:00.000000
+
+The triggers are not created here: a worker with ORDER_SNAPSHOT=true
+installs them before its first snapshot load (`flask snapshot-triggers`).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a4c6e8f0b3'
+down_revision = 'd8f0b2c4e6a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'order_change_log',
+        sa.Column('seq', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('seq'),
+        sqlite_autoincrement=True,
+    )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for event in ('insert', 'update', 'delete'):
+            op.execute(f"DROP TRIGGER IF EXISTS order_change_log_{event}")
+    elif dialect == 'postgresql':
+        op.execute('DROP TRIGGER IF EXISTS order_change_log ON "order"')
+        op.execute("DROP FUNCTION IF EXISTS order_change_log()")
+    op.drop_table('order_change_log')
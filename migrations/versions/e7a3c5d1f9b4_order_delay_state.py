@@ -0,0 +1,37 @@
+"""Add Order.is_delayed / delay_days with a partial index on the delayed set
+
+Revision ID: e7a3c5d1f9b4
+Revises: d5f2b7c3a9e1
+Create Date: 2026-10-19 16:00:00.000000
+
+Existing rows start as not delayed; run `flask recompute-status` once after
+upgrading (the daily sweep would also pick them up).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a3c5d1f9b4'
+down_revision = 'd5f2b7c3a9e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('is_delayed', sa.Boolean(), server_default=sa.false(), nullable=False))
+        batch_op.add_column(sa.Column('delay_days', sa.Integer(), nullable=True))
+
+    op.create_index(
+        'ix_order_delayed', 'order', ['delay_days'], unique=False,
+        sqlite_where=sa.text('is_delayed = 1'),
+        postgresql_where=sa.text('is_delayed = true'),
+    )
+
+
+def downgrade():
+    op.drop_index('ix_order_delayed', table_name='order')
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.drop_column('delay_days')
+        batch_op.drop_column('is_delayed')
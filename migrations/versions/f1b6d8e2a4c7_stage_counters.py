@@ -0,0 +1,120 @@
+"""Add stage_counters (per-user, per-stage live row counts) and its triggers
+
+Revision ID: f1b6d8e2a4c7
+Revises: e7a3c5d1f9b4
+Create Date: 2026-10-19 18:00:00.000000
+
+The trigger DDL is written out here rather than imported from
+app/counters.py, so later edits to the app cannot change what this
+revision creates.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1b6d8e2a4c7'
+down_revision = 'e7a3c5d1f9b4'
+branch_labels = None
+depends_on = None
+
+COUNTS = (
+    ('order', 'transit', 'true'),
+    ('warehouse_stock', 'warehouse', 'is_archived = false'),
+    ('delivered_goods', 'delivered', 'true'),
+)
+
+# table, stage, UPDATE OF columns, counted-row condition (sqlite, postgresql)
+TRIGGERS = (
+    ('order', 'transit', 'user_id', None, None),
+    ('warehouse_stock', 'warehouse', 'user_id, is_archived', '{row}.is_archived = 0', '{row}.is_archived = false'),
+    ('delivered_goods', 'delivered', 'user_id', None, None),
+)
+
+PG_BUMP = """
+CREATE OR REPLACE FUNCTION stage_counter_bump(uid integer, stg text, delta integer) RETURNS void AS $$
+BEGIN
+    INSERT INTO stage_counters (user_id, stage, count) VALUES (uid, stg, delta)
+    ON CONFLICT (user_id, stage) DO UPDATE SET count = stage_counters.count + EXCLUDED.count;
+END $$ LANGUAGE plpgsql
+"""
+
+PG_FUNCTION = """
+CREATE OR REPLACE FUNCTION {name}() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE'){old_ok} THEN
+        PERFORM stage_counter_bump(OLD.user_id, '{stage}', -1);
+    END IF;
+    IF TG_OP IN ('UPDATE', 'INSERT'){new_ok} THEN
+        PERFORM stage_counter_bump(NEW.user_id, '{stage}', 1);
+    END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql
+"""
+
+
+def _sqlite_triggers():
+    for table, stage, cols, live, _ in TRIGGERS:
+        name = f"{table}_stage_count"
+        up = (f"INSERT INTO stage_counters (user_id, stage, count) VALUES (NEW.user_id, '{stage}', 1) "
+              f"ON CONFLICT (user_id, stage) DO UPDATE SET count = count + 1;")
+        down = f"UPDATE stage_counters SET count = count - 1 WHERE user_id = OLD.user_id AND stage = '{stage}';"
+        old_when = f" WHEN {live.format(row='OLD')}" if live else ""
+        new_when = f" WHEN {live.format(row='NEW')}" if live else ""
+        yield f'CREATE TRIGGER IF NOT EXISTS {name}_ins AFTER INSERT ON "{table}"{new_when} BEGIN {up} END'
+        yield f'CREATE TRIGGER IF NOT EXISTS {name}_del AFTER DELETE ON "{table}"{old_when} BEGIN {down} END'
+        yield (f'CREATE TRIGGER IF NOT EXISTS {name}_upd_old AFTER UPDATE OF {cols} ON "{table}"{old_when} '
+               f'BEGIN {down} END')
+        yield (f'CREATE TRIGGER IF NOT EXISTS {name}_upd_new AFTER UPDATE OF {cols} ON "{table}"{new_when} '
+               f'BEGIN {up} END')
+
+
+def _postgresql_triggers():
+    yield PG_BUMP
+    for table, stage, cols, _, live in TRIGGERS:
+        name = f"{table}_stage_count"
+        old_ok = f" AND {live.format(row='OLD')}" if live else ""
+        new_ok = f" AND {live.format(row='NEW')}" if live else ""
+        yield PG_FUNCTION.format(name=name, stage=stage, old_ok=old_ok, new_ok=new_ok)
+        yield f'DROP TRIGGER IF EXISTS {name} ON "{table}"'
+        yield (f'CREATE TRIGGER {name} AFTER INSERT OR DELETE OR UPDATE OF {cols} ON "{table}" '
+               f'FOR EACH ROW EXECUTE FUNCTION {name}()')
+
+
+def upgrade():
+    op.create_table(
+        'stage_counters',
+        sa.Column('user_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('stage', sa.String(length=20), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('user_id', 'stage'),
+    )
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        statements = _sqlite_triggers()
+    elif bind.dialect.name == 'postgresql':
+        statements = _postgresql_triggers()
+    else:
+        statements = ()
+    for sql in statements:
+        bind.execute(sa.text(sql))
+    for table, stage, where in COUNTS:
+        bind.execute(sa.text(
+            f'INSERT INTO stage_counters (user_id, stage, count) '
+            f'SELECT user_id, :stage, COUNT(*) FROM "{table}" WHERE {where} GROUP BY user_id'
+        ), {'stage': stage})
+
+
+def downgrade():
+    bind = op.get_bind()
+    for table, *_ in TRIGGERS:
+        name = f"{table}_stage_count"
+        if bind.dialect.name == 'sqlite':
+            for suffix in ('ins', 'del', 'upd_old', 'upd_new'):
+                bind.execute(sa.text(f"DROP TRIGGER IF EXISTS {name}_{suffix}"))
+        elif bind.dialect.name == 'postgresql':
+            bind.execute(sa.text(f'DROP TRIGGER IF EXISTS {name} ON "{table}"'))
+            bind.execute(sa.text(f"DROP FUNCTION IF EXISTS {name}()"))
+    if bind.dialect.name == 'postgresql':
+        bind.execute(sa.text("DROP FUNCTION IF EXISTS stage_counter_bump(integer, text, integer)"))
+    op.drop_table('stage_counters')
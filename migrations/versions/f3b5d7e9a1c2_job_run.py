@@ -0,0 +1,32 @@
+"""Add job_run (per-day claim of the daily job)
+
+Revision ID: f3b5d7e9a1c2
+Revises: e2a4c6e8f0b3
+Create Date: 2026-10-20 09:00:00.000000
+
+The row is created by the first run of `flask daily-jobs`.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b5d7e9a1c2'
+down_revision = 'e2a4c6e8f0b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'job_run',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('run_on', sa.Date(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('name'),
+    )
+
+
+def downgrade():
+    op.drop_table('job_run')
@@ -1,5 +1,8 @@
 import os
+
 import pytest
+from flask import g
+
 from app import create_app
 from app.database import db as _db
 
@@ -8,9 +11,11 @@ from app.database import db as _db
 def app():
     os.environ.setdefault("SECRET_KEY", "test-secret")
     os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+    os.environ.setdefault("ARCHIVE_DATABASE_URL", "sqlite://")
     os.environ["DEMO_MODE"] = "false"
     os.environ["AUTO_SEED_ON_EMPTY"] = "false"
     os.environ["USE_SEED_BOOT"] = "false"
+    os.environ["STATUS_RECOMPUTE_DAILY"] = "false"
 
     application = create_app()
     application.config["TESTING"] = True
@@ -25,3 +30,73 @@ def app():
 @pytest.fixture()
 def client(app):
     return app.test_client()
+
+
+@pytest.fixture()
+def admin_client(app):
+    """Test client logged in as an admin (can view all, can edit)."""
+    from app.models import User
+
+    user = User.query.filter_by(username="test-admin").first()
+    if not user:
+        user = User(username="test-admin", role="admin")
+        user.set_password("test-pass")
+        _db.session.add(user)
+        _db.session.commit()
+
+    client = app.test_client()
+    client.post("/login", data={"form_type": "login", "username": "test-admin", "password": "test-pass"})
+    yield client
+    # The session-wide app context is reused by every request, so Flask-Login's
+    # cached user on `g` would otherwise leak into later anonymous tests.
+    g.pop("_login_user", None)
+
+
+ORDER_DEFAULTS = {
+    "order_date": "01.02.24", "product_name": "Widgets", "buyer": "Test Co", "responsible": "Anna",
+    "quantity": "10", "required_delivery": "", "terms_of_delivery": "FOB", "payment_date": "",
+    "etd": "05.02.24", "eta": "20.02.24", "ata": "21.02.24", "transit_status": "arrived", "transport": "sea",
+}
+
+
+class OrderFactory:
+    """Adds complete Order rows; cleanup() removes them and whatever they became in later stages."""
+
+    def __init__(self):
+        self.orders = []
+        self.numbers = set()
+
+    def __call__(self, user_id, order_number, **fields):
+        from app.models import Order
+
+        order = Order(user_id=user_id, order_number=order_number, **{**ORDER_DEFAULTS, **fields})
+        _db.session.add(order)
+        self.orders.append(order)
+        if order_number:
+            self.numbers.add(order_number)
+        return order
+
+    def cleanup(self):
+        """Delete the orders in whatever stage they are now, and their archived copies. Safe to call twice."""
+        from sqlalchemy import inspect
+
+        from app.models import ArchivedOrder, Shipment
+
+        _db.session.rollback()
+        ids = [key[0] for key in (inspect(o).identity for o in self.orders) if key]
+        if ids:
+            # any stage: the order's row keeps its id when it is stocked or delivered
+            Shipment.query.filter(Shipment.id.in_(ids)).delete(synchronize_session=False)
+        if self.numbers:
+            for model in (ArchivedOrder, Shipment):
+                model.query.filter(model.order_number.in_(self.numbers)).delete(synchronize_session=False)
+        _db.session.commit()
+        self.orders, self.numbers = [], set()
+
+
+@pytest.fixture()
+def make_order(app):
+    """make_order(user_id, number, **fields) -> Order (added, not committed); cleaned up after the test."""
+    factory = OrderFactory()
+    yield factory
+    factory.cleanup()
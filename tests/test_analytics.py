@@ -0,0 +1,82 @@
+"""
+Lead-time percentiles and ETA slippage — vectorized per group, cached per ledger version.
+"""
+import numpy as np
+
+from app import analytics
+from app.analytics import _grouped_percentiles, lead_time_stats
+from app.database import db
+from app.models import Order, Shipment, TransitSample, User
+from app.rollups import rebuild_rollup
+
+# (number, etd, eta, ata): lead days 10, 20, 31, 40; slippage -2, +5, +10, none
+CASES = [
+    ("PO-STATS-1", "01.05.19", "13.05.19", "11.05.19"),
+    ("PO-STATS-2", "01.05.19", "16.05.19", "21.05.19"),
+    ("PO-STATS-3", "01.06.19", "22.06.19", "2019-07-02"),
+    ("PO-STATS-4", "01.06.19", "11.07.19", None),
+]
+
+
+def _cleanup():
+    Order.query.filter(Order.buyer == "Stats Co").delete(synchronize_session=False)
+    Shipment.query.filter(Shipment.order_number.like("PO-STATS-%")).delete(synchronize_session=False)
+    db.session.commit()
+    rebuild_rollup()  # drops the samples of the deleted shipments
+
+
+def _group(body, key):
+    return next(g for g in body["groups"] if g["key"] == key)
+
+
+def test_grouped_percentiles_match_numpy():
+    rng = np.random.default_rng(7)
+    group = rng.integers(0, 5, 200)
+    values = rng.normal(20, 6, 200)
+    got = _grouped_percentiles(group, values, 6)
+    for g in range(5):
+        assert np.allclose(got[g], np.percentile(values[group == g], (50, 90, 95)))
+    assert np.isnan(got[5]).all()
+
+
+def test_lead_time_and_slippage_endpoints(admin_client):
+    admin = User.query.filter_by(username="test-admin").one()
+    _cleanup()
+    try:
+        for number, etd, eta, ata in CASES:
+            db.session.add(Order(
+                user_id=admin.id, order_date="01.01.19", order_number=number, product_name="Kegs",
+                buyer="Stats Co", responsible="Anna", quantity="1", required_delivery="",
+                terms_of_delivery="FOB", payment_date="", etd=etd, eta=eta, ata=ata,
+                transit_status="en route", transport="air-test",
+            ))
+        db.session.commit()
+
+        lead = _group(admin_client.get("/analytics/api/lead_times").get_json(), "air-test")
+        expected = np.percentile([10, 20, 31, 40], (50, 90, 95))
+        assert lead["n"] == 4 and lead["mean"] == 25.25
+        assert [lead["p50"], lead["p90"], lead["p95"]] == [round(float(v), 2) for v in expected]
+
+        slip = _group(admin_client.get("/analytics/api/eta_slippage?group_by=buyer").get_json(), "Stats Co")
+        assert slip["n"] == 3 and slip["p50"] == 5.0 and slip["on_time_rate"] == round(1 / 3, 4)
+        hist = {b["days"]: b["n"] for b in slip["histogram"]}
+        assert (hist["-6 to -3"], hist["1 to 3"], hist["4 to 7"], hist["8 to 14"]) == (0, 0, 1, 1)
+        assert hist["-2 to 0"] == 1
+
+        months = admin_client.get("/analytics/api/lead_times?group_by=month").get_json()
+        assert _group(months, "2019-06")["n"] >= 2
+        assert admin_client.get("/analytics/api/lead_times?group_by=product").status_code == 400
+
+        # cached until the ledger changes
+        first = lead_time_stats("transport")
+        assert lead_time_stats("transport") is first
+        Order.query.filter_by(order_number="PO-STATS-4").one().ata = "01.07.19"
+        db.session.commit()
+        assert lead_time_stats("transport") is not first
+        assert db.session.execute(
+            db.select(TransitSample.ata).join(Shipment, Shipment.id == TransitSample.shipment_id)
+            .where(Shipment.order_number == "PO-STATS-4")
+        ).scalar().isoformat() == "2019-07-01"
+    finally:
+        _cleanup()
+        analytics._cache.clear()
@@ -0,0 +1,103 @@
+"""
+Bulk lifecycle endpoints — many items per request, one transaction, per-item results.
+"""
+from app.database import db
+from app.models import (
+    ActivityLog,
+    ArchivedOrder,
+    DeliveredGoods,
+    Order,
+    User,
+    WarehouseStock,
+)
+
+
+def test_bulk_stock_then_partial_deliver_then_restore(admin_client, make_order):
+    admin = User.query.filter_by(username="test-admin").one()
+    a, b, c = make_order(admin.id, "PO-BULK-1"), make_order(admin.id, "PO-BULK-2"), make_order(admin.id, None)
+    db.session.commit()
+    ids = [a.id, b.id, c.id]
+
+    res = admin_client.post("/api/v1/orders/bulk/stock", json={"ids": ids + [999999]})
+    assert res.status_code == 200
+    body = res.get_json()
+    statuses = {r["id"]: r["status"] for r in body["data"]}
+    assert statuses == {a.id: "ok", b.id: "ok", c.id: "invalid", 999999: "not_found"}
+    assert body["meta"]["succeeded"] == 2
+    assert Order.query.filter(Order.order_number.like("PO-BULK-%")).count() == 0
+
+    stock = {s.order_number: s for s in WarehouseStock.query.filter(WarehouseStock.order_number.like("PO-BULK-%"))}
+    assert stock["PO-BULK-1"].transit_status == "In Stock"
+    assert ActivityLog.query.filter_by(action="Bulk Stock Orders").count() >= 1
+
+    s1, s2 = stock["PO-BULK-1"].id, stock["PO-BULK-2"].id
+    res = admin_client.post(
+        "/api/v1/warehouse/bulk/deliver",
+        json={"items": [{"id": s1, "quantity": 4}, {"id": s2, "quantity": 10}]},
+    )
+    assert [r["status"] for r in res.get_json()["data"]] == ["ok", "ok"]
+    db.session.expire_all()
+    assert float(db.session.get(WarehouseStock, s1).quantity) == 6
+    assert db.session.get(WarehouseStock, s2) is None  # fully delivered: the row itself moved on
+    assert float(db.session.get(DeliveredGoods, s2).quantity) == 10
+    delivered = DeliveredGoods.query.filter(DeliveredGoods.order_number.like("PO-BULK-%")).all()
+    assert sorted(float(d.quantity) for d in delivered) == [4, 10]
+
+    res = admin_client.post(
+        "/api/v1/warehouse/bulk/deliver", json={"items": [{"id": s1, "quantity": 100}]}
+    )
+    assert res.get_json()["data"][0]["status"] == "invalid"
+
+    # the fully delivered row is no longer stock: no second delivery, no restore from the warehouse
+    res = admin_client.post("/api/v1/warehouse/bulk/deliver", json={"items": [{"id": s2, "quantity": 1}]})
+    assert res.get_json()["data"][0] == {"id": s2, "status": "not_found", "message": "No such item."}
+    res = admin_client.post("/api/v1/warehouse/bulk/restore", json={"ids": [s2]})
+    assert res.get_json()["data"][0]["status"] == "not_found"
+    assert DeliveredGoods.query.filter(DeliveredGoods.order_number.like("PO-BULK-%")).count() == 2
+
+    res = admin_client.post("/api/v1/delivered/bulk/restore", json={"ids": [d.id for d in delivered]})
+    assert res.get_json()["meta"]["succeeded"] == 2
+    assert DeliveredGoods.query.filter(DeliveredGoods.order_number.like("PO-BULK-%")).count() == 0
+    restored = Order.query.filter(Order.order_number.like("PO-BULK-%")).all()
+    assert {o.transit_status for o in restored} == {"in process"}
+    assert {o.transport for o in restored} == {"sea"}
+
+
+def test_bulk_deliver_orders_archives_and_validates(admin_client, make_order):
+    admin = User.query.filter_by(username="test-admin").one()
+    o = make_order(admin.id, "PO-BULK-9")
+    db.session.commit()
+
+    assert admin_client.post("/api/v1/orders/bulk/deliver", json={"ids": "x"}).status_code == 400
+
+    res = admin_client.post("/api/v1/orders/bulk/deliver", json={"ids": [o.id]})
+    assert res.get_json()["data"][0]["status"] == "ok"
+    assert ArchivedOrder.query.filter_by(order_number="PO-BULK-9").one().quantity == 10.0
+    assert DeliveredGoods.query.filter_by(order_number="PO-BULK-9").one().delivery_source == "Direct from Transit"
+
+
+def test_bulk_forbidden_for_other_users_rows(app, make_order):
+    owner = User.query.filter_by(username="test-admin").first()
+    viewer = User.query.filter_by(username="bulk-user").first()
+    if not viewer:
+        viewer = User(username="bulk-user", role="user")
+        viewer.set_password("pw")
+        db.session.add(viewer)
+        db.session.commit()
+    if owner is None:
+        owner = User(username="test-admin", role="admin")
+        owner.set_password("test-pass")
+        db.session.add(owner)
+        db.session.commit()
+
+    from flask import g
+    client = app.test_client()
+    client.post("/login", data={"form_type": "login", "username": "bulk-user", "password": "pw"})
+    try:
+        o = make_order(owner.id, "PO-BULK-X")
+        db.session.commit()
+        res = client.post("/api/v1/orders/bulk/stock", json={"ids": [o.id]})
+        assert res.get_json()["data"][0]["status"] == "forbidden"
+        assert Order.query.filter_by(order_number="PO-BULK-X").count() == 1
+    finally:
+        g.pop("_login_user", None)
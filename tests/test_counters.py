@@ -0,0 +1,48 @@
+"""
+Stage counters — kept exact by triggers through ORM and Core writes; checker and rebuild.
+"""
+from sqlalchemy import insert
+
+from app.counters import check_counters, rebuild_counters, stage_totals
+from app.database import db
+from app.models import StageCounter, User, WarehouseStock
+
+
+def test_counters_follow_every_write_path(admin_client, make_order):
+    admin = User.query.filter_by(username="test-admin").one()
+    before = stage_totals(admin.id)
+    try:
+        a, b = make_order(admin.id, "PO-CNT-1"), make_order(admin.id, "PO-CNT-2")
+        db.session.commit()
+        assert stage_totals(admin.id)["transit"] == before["transit"] + 2
+
+        # Core INSERT ... SELECT / DELETE through the bulk endpoints
+        admin_client.post("/api/v1/orders/bulk/stock", json={"ids": [a.id, b.id]})
+        stock = WarehouseStock.query.filter(WarehouseStock.order_number.like("PO-CNT-%")).all()
+        admin_client.post("/api/v1/warehouse/bulk/deliver",
+                          json={"items": [{"id": stock[0].id, "quantity": 10}]})
+        totals = stage_totals(admin.id)
+        assert totals["transit"] == before["transit"]
+        assert totals["warehouse"] == before["warehouse"] + 1  # the delivered one is archived
+        assert totals["delivered"] == before["delivered"] + 1
+        assert check_counters() == []
+
+        html = admin_client.get("/dashboard").get_data(as_text=True)
+        assert str(stage_totals()["warehouse"]) in html
+    finally:
+        make_order.cleanup()
+    assert stage_totals(admin.id) == before
+    assert check_counters() == []
+
+
+def test_check_and_rebuild(app):
+    rebuild_counters()
+    assert check_counters() == []
+
+    db.session.execute(insert(StageCounter).values(user_id=999999, stage="transit", count=5))
+    db.session.commit()
+    assert check_counters() == [{"user_id": 999999, "stage": "transit", "stored": 5, "actual": 0}]
+
+    rebuild_counters()
+    assert check_counters() == []
+    assert db.session.get(StageCounter, (999999, "transit")) is None
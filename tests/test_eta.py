@@ -0,0 +1,50 @@
+"""
+ETA predictor — trained from completed shipments, most specific key first, served from memory.
+"""
+from functools import partial
+
+from app import eta
+from app.database import db
+from app.eta import predict, train_eta_model
+from app.models import EtaModel, User
+from app.rollups import rebuild_rollup
+
+
+def test_eta_estimates(admin_client, make_order):
+    admin = User.query.filter_by(username="test-admin").one()
+    pumps = partial(make_order, product_name="Pumps", buyer="Eta Co", eta="", transit_status="en route",
+                    transport="ship-test")
+    try:
+        # completed: 20, 22 and 30 days for Eta Co pumps, 40 days for another buyer's pumps
+        pumps(admin.id, "PO-ETA-1", etd="01.03.21", ata="21.03.21")
+        pumps(admin.id, "PO-ETA-2", etd="01.03.21", ata="23.03.21")
+        pumps(admin.id, "PO-ETA-3", etd="01.04.21", ata="01.05.21")
+        pumps(admin.id, "PO-ETA-4", etd="01.04.21", ata="11.05.21", buyer="Other Co")
+        open_order = pumps(admin.id, "PO-ETA-5", etd="10.06.21", ata=None)
+        db.session.commit()
+
+        counts = train_eta_model()
+        assert counts["keys"] == db.session.query(EtaModel).count() > 0
+        assert db.session.get(EtaModel, ("transport+buyer+product", "ship-test|eta co|pumps")).days == 22
+        assert db.session.get(EtaModel, ("transport", "ship-test")).days == 26  # median of 20, 22, 30, 40
+
+        assert predict("ship-test", "ETA CO ", "pumps")["level"] == "transport+buyer+product"
+        assert predict("ship-test", "Eta Co", "Valves")["level"] == "transport+buyer"
+        assert predict("ship-test", "Nobody", "Valves", "2021-09-01") == {"days": 26, "level": "transport", "n": 4}
+        assert predict("", "Eta Co", "Pumps")["level"] == "all"
+
+        body = admin_client.get(f"/api/v1/orders/{open_order.id}/eta_estimate").get_json()["data"]
+        assert body == {"order_id": open_order.id, "etd": "2021-06-10", "eta": None,
+                        "estimated_eta": "2021-07-02", "transit_days": 22,
+                        "basis": "transport+buyer+product", "samples": 3}
+        assert admin_client.get("/api/v1/orders/999999999/eta_estimate").status_code == 404
+
+        res = admin_client.get(f"/api/v1/orders/eta_estimates?ids={open_order.id},999999999")
+        assert [e["order_id"] for e in res.get_json()["data"]] == [open_order.id]
+        assert admin_client.get("/api/v1/orders/eta_estimates?ids=a,b").status_code == 400
+    finally:
+        make_order.cleanup()
+        rebuild_rollup()
+        train_eta_model()
+    assert predict("ship-test") is None or predict("ship-test")["level"] == "all"
+    assert eta._model[1].get(("transport", "ship-test")) is None
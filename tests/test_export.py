@@ -0,0 +1,62 @@
+"""
+Streaming export — GET /api/v1/orders/export keeps the list contract
+(filters, sort, RBAC) and streams NDJSON / CSV, optionally gzipped.
+"""
+import csv
+import gzip
+import io
+import json
+
+import pytest
+
+from app.database import db
+from app.models import Order, User
+
+
+@pytest.fixture()
+def orders(app):
+    owner = User.query.filter_by(username="test-admin").first()
+    rows = [
+        ("01.02.24", "PO-EXP-1", "15.02.24", "sea"),
+        ("2024-03-05", "PO-EXP-2", "", "air"),
+        ("10.01.23", "PO-EXP-3", "20.01.23", "sea"),
+    ]
+    created = []
+    for od, num, eta, transport in rows:
+        o = Order(
+            user_id=owner.id, order_date=od, order_number=num, product_name="Gloves",
+            buyer="Acme", responsible="Anna", quantity="10", eta=eta,
+            transit_status="en route", transport=transport,
+        )
+        db.session.add(o)
+        created.append(o)
+    db.session.commit()
+    yield created
+    for o in created:
+        db.session.delete(o)
+    db.session.commit()
+
+
+def test_export_ndjson_sorted_and_filtered(admin_client, orders):
+    resp = admin_client.get("/api/v1/orders/export?format=ndjson&filter[year]=2024&sort=order_date:asc")
+    assert resp.status_code == 200
+    assert resp.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    assert [r["order_number"] for r in lines] == ["PO-EXP-1", "PO-EXP-2"]
+    assert lines[0]["order_date"] == "2024-02-01"
+
+
+def test_export_csv_gzip(admin_client, orders):
+    resp = admin_client.get("/api/v1/orders/export?format=csv&gzip=1&filter[transport]=sea&sort=eta:desc")
+    assert resp.status_code == 200
+    assert resp.headers["Content-Encoding"] == "gzip"
+    text = gzip.decompress(resp.get_data()).decode("utf-8")
+    rows = list(csv.DictReader(io.StringIO(text)))
+    assert [r["order_number"] for r in rows] == ["PO-EXP-1", "PO-EXP-3"]
+
+
+def test_export_rejects_paging_params(admin_client):
+    resp = admin_client.get("/api/v1/orders/export?page=2&format=xml")
+    assert resp.status_code == 400
+    fields = {d["field"] for d in resp.get_json()["error"]["details"]}
+    assert "page" in fields
@@ -0,0 +1,93 @@
+"""
+Daily KPI snapshot — backfill, month deltas in /api/kpi and bucketed history.
+"""
+from datetime import date, timedelta
+
+from app.database import db
+from app.kpi import kpi_sums, refresh_kpi, snapshot_kpi
+from app.models import KpiDaily, Order, User
+
+
+def test_snapshot_feeds_kpi_and_history(admin_client, make_order):
+    admin = User.query.filter_by(username="test-admin").one()
+    today = date.today()
+    this_month = today.replace(day=1)
+    last_month = (this_month - timedelta(days=1)).replace(day=1)
+    fmt = "%d.%m.%y"
+    try:
+        make_order(admin.id, "PO-KPI-1", order_date=this_month.strftime(fmt), etd=None, eta="01.01.20", ata=None)
+        make_order(admin.id, "PO-KPI-2", order_date=last_month.strftime(fmt), etd=None, eta="01.01.20",
+                   ata="02.01.20", quantity="2.5")
+        make_order(admin.id, "PO-KPI-3", order_date=last_month.strftime("%Y-%m-%d"), etd=None, eta="01.01.20",
+                   ata="02.01.20")
+        db.session.commit()
+        db.session.query(KpiDaily).delete()
+        db.session.commit()
+
+        assert snapshot_kpi() > 0  # empty table: full backfill
+        assert db.session.get(KpiDaily, (date(2020, 1, 1), admin.id)).delayed == 1
+
+        body = admin_client.get("/api/kpi").get_json()
+        assert body["in_transit"]["count"] >= 3
+        assert isinstance(body["in_transit"]["delta_pct"], int)
+
+        res = admin_client.get(f"/api/v1/kpi/history?from={last_month.isoformat()}&to={today.isoformat()}")
+        periods = {p["period"]: p for p in res.get_json()["data"]}
+        assert periods[last_month.isoformat()]["transit"] >= 2
+        assert periods[last_month.isoformat()]["transit_qty"] >= 12.5
+        assert periods[this_month.isoformat()]["transit"] >= 1
+
+        weekly = admin_client.get("/api/v1/kpi/history?from=2019-12-30&to=2020-01-05&bucket=week").get_json()
+        assert [p["period"] for p in weekly["data"]] == ["2019-12-30"]
+        assert admin_client.get("/api/v1/kpi/history?bucket=year").status_code == 400
+        assert admin_client.get("/api/v1/kpi/history?from=2024-02-01&to=2024-01-01").status_code == 400
+
+        # a window refresh leaves days outside it alone
+        Order.query.filter_by(order_number="PO-KPI-1").delete()
+        db.session.commit()
+        refresh_kpi(start=this_month)
+        assert db.session.get(KpiDaily, (date(2020, 1, 1), admin.id)).delayed == 1
+    finally:
+        make_order.cleanup()
+        refresh_kpi()
+
+
+def test_kpi_sums_count_today_live(admin_client, make_order):
+    admin = User.query.filter_by(username="test-admin").one()
+    today = date.today()
+    try:
+        refresh_kpi()
+        before = kpi_sums(today.replace(day=1), today, admin.id)["transit"]
+        make_order(admin.id, "PO-KPI-LIVE", order_date=today.strftime("%d.%m.%y"), eta="", ata=None)
+        db.session.commit()
+        # today is never closed in the snapshot, so the new order counts at once
+        assert kpi_sums(today.replace(day=1), today, admin.id)["transit"] == before + 1
+
+        db.session.query(KpiDaily).delete()  # daily job off: everything is live
+        db.session.commit()
+        assert kpi_sums(today.replace(day=1), today, admin.id)["transit"] == before + 1
+    finally:
+        make_order.cleanup()
+        refresh_kpi()
+
+
+def test_kpi_quantities_skip_free_text(admin_client, make_order):
+    admin = User.query.filter_by(username="test-admin").one()
+    today = date.today()
+    try:
+        db.session.query(KpiDaily).delete()
+        db.session.commit()
+        before = kpi_sums(today, today, admin.id)
+        for n, qty in enumerate(("4", " 2.5 ", "", "10 pcs", "1.2.3")):
+            make_order(admin.id, f"PO-KPI-QTY-{n}", order_date=today.strftime("%d.%m.%y"), quantity=qty)
+        db.session.commit()
+        # every order counts; only the plain numbers add to the quantity
+        after = kpi_sums(today, today, admin.id)
+        assert after["transit"] == before["transit"] + 5
+        assert after["transit_qty"] == before["transit_qty"] + 6.5
+
+        refresh_kpi()
+        assert db.session.get(KpiDaily, (today, admin.id)).transit_qty == after["transit_qty"]
+    finally:
+        make_order.cleanup()
+        refresh_kpi()
@@ -0,0 +1,85 @@
+"""
+Prometheus /metrics — token, request/DB/cache metrics, scrape-time gauges, multi-worker aggregation.
+"""
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from app import metrics
+
+pytest.importorskip("prometheus_client")
+
+
+@pytest.fixture()
+def enabled(app):
+    metrics.enable(app, True)
+    yield app
+    metrics.enable(app, False)
+
+
+def _sample(body: str, name: str) -> float:
+    """Value of the exposition line starting with `name ` (name includes any labels)."""
+    for line in body.splitlines():
+        if line.startswith(name + " "):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"{name} not in /metrics")
+
+
+def test_token_required_and_503_when_off(client, app):
+    token, was_on = app.config["DEMO_RESET_TOKEN"], app.config["METRICS"]
+    metrics.enable(app, False)
+    try:
+        assert client.get("/metrics").status_code == 403
+        assert client.get("/metrics?token=wrong").status_code == 403
+        assert client.get(f"/metrics?token={token}").status_code == 503
+    finally:
+        metrics.enable(app, was_on)
+
+
+def test_request_db_cache_and_scrape_time_metrics(admin_client, enabled):
+    token = enabled.config["DEMO_RESET_TOKEN"]
+    for _ in range(2):
+        assert admin_client.get("/api/v1/orders").status_code == 200
+        assert admin_client.get("/analytics/api/lead_times").status_code == 200
+
+    resp = admin_client.get("/metrics", headers={"Authorization": f"Bearer {token}"})
+    assert resp.status_code == 200 and resp.mimetype == "text/plain"
+    body = resp.get_data(as_text=True)
+
+    assert _sample(body, 'http_requests_total{endpoint="api_v1.list_orders",method="GET",status="200"}') >= 2
+    assert _sample(body, 'http_request_duration_seconds_count{endpoint="api_v1.list_orders",method="GET"}') >= 2
+    assert _sample(body, "http_requests_in_progress") >= 1  # this scrape
+    assert _sample(body, 'db_query_duration_seconds_count{operation="select"}') >= 2
+    assert _sample(body, 'app_cache_lookups_total{cache="analytics",result="hit"}') >= 1
+    assert _sample(body, 'app_import_jobs{status="queued"}') >= 0
+
+
+def test_workers_aggregate_through_multiproc_dir(tmp_path):
+    script = textwrap.dedent("""
+        import os
+        from app import create_app
+        from app.database import db
+
+        app = create_app()
+        with app.app_context():
+            db.create_all()
+        client = app.test_client()
+        pid = os.fork()
+        if pid == 0:  # a second worker
+            client.get("/health")
+            os._exit(0)
+        os.waitpid(pid, 0)
+        client.get("/health")
+        print(client.get("/metrics?token=" + app.config["DEMO_RESET_TOKEN"]).get_data(as_text=True))
+    """)
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path), METRICS="true", SECRET_KEY="t",
+               DATABASE_URL="sqlite://", ARCHIVE_DATABASE_URL="sqlite://", DEMO_MODE="false",
+               AUTO_SEED_ON_EMPTY="false", USE_SEED_BOOT="false", STATUS_RECOMPUTE_DAILY="false")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, "-c", script], env=env, cwd=root, capture_output=True, text=True,
+                         timeout=60, check=False)
+    assert out.returncode == 0, out.stderr
+    assert _sample(out.stdout, 'http_requests_total{endpoint="health_check",method="GET",status="200"}') == 2
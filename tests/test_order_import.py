@@ -0,0 +1,86 @@
+"""
+Bulk import engine — streaming CSV/XLSX rows into Order in chunks.
+"""
+import io
+import os
+
+import pytest
+
+from app.database import db
+from app.models import ImportJob, Order, User
+from app.utils.order_import import import_orders, normalize_dates
+
+HEADER = ("order_date,order_number,product_name,buyer,responsible,quantity,required_delivery,"
+          "terms_of_delivery,payment_date,etd,eta,ata,transit_status,transport\n")
+
+
+@pytest.fixture()
+def owner(app):
+    return User.query.filter_by(username="test-admin").first() or _make_owner()
+
+
+def _make_owner():
+    u = User(username="test-admin", role="admin")
+    u.set_password("test-pass")
+    db.session.add(u)
+    db.session.commit()
+    return u
+
+
+def test_normalize_dates_handles_mixed_inputs():
+    rows = [{"eta": "2024-03-05"}, {"eta": "05.03.2024"}, {"eta": "mid May"}, {"eta": None}]
+    normalize_dates(rows, columns=("eta",))
+    assert [r["eta"] for r in rows] == ["05.03.24", "05.03.24", "mid May", ""]
+
+
+def test_import_csv_chunks_and_rejects(tmp_path, owner):
+    src = tmp_path / "orders.csv"
+    src.write_text(
+        HEADER
+        + "2024-01-02,PO-IMP-1,Gloves,Acme,Anna,10,,FOB,,2024-01-05,2024-01-20,,en route,sea\n"
+        + "2024-01-03,PO-IMP-2,Masks,Acme,Anna,abc,,FOB,,,,,in process,air\n"
+        + "2024-01-04,PO-IMP-3,Gowns,,Anna,5,,FOB,,,,,in process,air\n"
+        + "2024-01-05,PO-IMP-4,Caps,Acme,Anna,7,,FOB,,,,,in process,truck\n",
+        encoding="utf-8",
+    )
+
+    dry = import_orders(str(src), owner.id, chunk_size=2, dry_run=True)
+    assert (dry.rows_read, dry.inserted, dry.chunks) == (4, 2, 2)
+    assert Order.query.filter(Order.order_number.like("PO-IMP-%")).count() == 0
+
+    report = import_orders(str(src), owner.id, chunk_size=2)
+    try:
+        assert report.inserted == 2
+        assert sorted(n for n, _ in report.rejected) == [3, 4]
+        o = Order.query.filter_by(order_number="PO-IMP-1").one()
+        assert (o.order_date, o.eta, o.user_id) == ("02.01.24", "20.01.24", owner.id)
+    finally:
+        Order.query.filter(Order.order_number.like("PO-IMP-%")).delete(synchronize_session=False)
+        db.session.commit()
+
+
+def test_import_job_upserts_and_skips_unchanged(app, admin_client, monkeypatch, tmp_path):
+    monkeypatch.setitem(app.config, "IMPORT_UPLOAD_DIR", str(tmp_path))
+    app.config["IMPORT_JOBS_INLINE"] = True
+    first = (HEADER
+             + "2024-01-02,PO-JOB-1,Gloves,Acme,Anna,10,,FOB,,,,,in process,sea\n"
+             + "2024-01-02,PO-JOB-2,Masks,Acme,Anna,20,,FOB,,,,,in process,sea\n")
+    second = first.replace("Masks,Acme,Anna,20", "Masks,Acme,Anna,25")
+    try:
+        resp = admin_client.post("/api/v1/imports", data={"file": (io.BytesIO(first.encode()), "o.csv")},
+                                 content_type="multipart/form-data")
+        assert resp.status_code == 202
+        job = resp.get_json()["data"]
+        assert (job["status"], job["inserted"], job["progress_pct"]) == ("done", 2, 100.0)
+
+        resp = admin_client.post("/api/v1/imports", data={"file": (io.BytesIO(second.encode()), "o.csv")},
+                                 content_type="multipart/form-data")
+        job = admin_client.get(f"/api/v1/imports/{resp.get_json()['data']['id']}").get_json()["data"]
+        assert (job["inserted"], job["updated"], job["unchanged"]) == (0, 1, 1)
+        assert Order.query.filter_by(order_number="PO-JOB-2").one().quantity == "25"
+        stored = db.session.get(ImportJob, job["id"]).stored_path
+        assert os.path.dirname(stored) == str(tmp_path) and not os.path.exists(stored)
+    finally:
+        app.config["IMPORT_JOBS_INLINE"] = False
+        Order.query.filter(Order.order_number.like("PO-JOB-%")).delete(synchronize_session=False)
+        db.session.commit()
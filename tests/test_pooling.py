@@ -0,0 +1,42 @@
+"""
+Pool options from DB_POOL_* settings; engines are disposed in forked children.
+"""
+import os
+
+import pytest
+from sqlalchemy import text
+
+from app.database import db
+from app.pooling import engine_options
+
+CONFIG = {"DB_POOL_SIZE": 3, "DB_MAX_OVERFLOW": 5, "DB_POOL_TIMEOUT": 30,
+          "DB_POOL_RECYCLE": 1800, "DB_POOL_PRE_PING": None}
+
+
+def test_engine_options():
+    assert engine_options("sqlite://", CONFIG) == {}
+    assert engine_options("sqlite:///:memory:", CONFIG) == {}
+    assert engine_options("sqlite:////tmp/x.db", CONFIG) == {"pool_size": 3, "max_overflow": 5, "pool_timeout": 30}
+    assert engine_options("postgresql://u@h/db", CONFIG) == {
+        "pool_size": 3, "max_overflow": 5, "pool_timeout": 30, "pool_pre_ping": True, "pool_recycle": 1800,
+    }
+    tuned = dict(CONFIG, DB_POOL_PRE_PING=False, DB_POOL_RECYCLE=-1)
+    assert engine_options("postgresql://u@h/db", tuned) == {"pool_size": 3, "max_overflow": 5, "pool_timeout": 30}
+
+
+def test_app_engine_uses_pool_settings(app):
+    assert db.engine.pool.size() == app.config["DB_POOL_SIZE"]
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_forked_child_does_not_reuse_parent_connections(app):
+    with db.engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert db.engine.pool.checkedin() >= 1
+
+    pid = os.fork()
+    if pid == 0:  # child: the after-fork hook has dropped the inherited pool
+        os._exit(0 if db.engine.pool.checkedin() == 0 else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert db.engine.pool.checkedin() >= 1  # the parent's pool is untouched
@@ -0,0 +1,63 @@
+"""
+Aggregated query statistics — normalization, merge across processes, admin page, CSV and reset.
+"""
+import os
+
+import pytest
+
+from app import query_stats
+from app.query_stats import normalize
+
+
+@pytest.fixture()
+def stats(app, tmp_path):
+    app.config.update(QUERY_STATS=True, QUERY_STATS_PATH=str(tmp_path / "query_stats.db"))
+    query_stats.install_listeners(True)
+    query_stats.reset(app)
+    yield app
+    query_stats.install_listeners(False)
+    app.config["QUERY_STATS"] = False
+    query_stats.reset(app)
+
+
+def test_normalize_folds_literals_params_and_in_lists():
+    assert normalize("SELECT a FROM t WHERE id IN (?, ?, ?) AND x = 'it''s'\n  LIMIT 10 OFFSET ?") == \
+        "SELECT a FROM t WHERE id IN (?, ...) AND x = ? LIMIT ? OFFSET ?"
+    assert normalize("SELECT count_1, x::text FROM t WHERE a = %(a_1)s AND b = :b") == \
+        "SELECT count_1, x::text FROM t WHERE a = ? AND b = ?"
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_workers_sum_into_the_shared_file(stats):
+    query_stats.record("SELECT 1 FROM t WHERE id = 5", 0.002, 1)
+    pid = os.fork()
+    if pid == 0:  # another worker: its own counters (the parent's were dropped at fork), same file
+        query_stats.record("SELECT 1 FROM t WHERE id = 9", 0.004, 1)
+        os._exit(0 if query_stats.flush(stats) == 1 else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    query_stats.flush(stats)
+
+    (row,) = [r for r in query_stats.load(stats) if r["statement"] == "SELECT ? FROM t WHERE id = ?"]
+    assert row["calls"] == 2 and row["rows"] == 2
+    assert row["total_ms"] == pytest.approx(6.0) and row["max_ms"] == pytest.approx(4.0)
+    assert row["mean_ms"] == pytest.approx(3.0)
+
+
+def test_admin_page_csv_and_reset(admin_client, stats):
+    for _ in range(3):
+        assert admin_client.get("/api/v1/orders/delayed").status_code == 200
+
+    page = admin_client.get("/activity_logs/queries?sort=calls")
+    assert page.status_code == 200
+    assert b"Query Statistics" in page.data and b"is_delayed" in page.data
+
+    csv_resp = admin_client.get("/activity_logs/queries.csv")
+    assert csv_resp.mimetype == "text/csv"
+    header, *lines = csv_resp.get_data(as_text=True).splitlines()
+    assert header == "day,statement,calls,total_ms,mean_ms,max_ms,rows"
+    assert any("is_delayed" in line and ",3," in line for line in lines)
+
+    assert admin_client.post("/activity_logs/queries/reset").status_code == 302
+    query_stats.install_listeners(False)  # nothing new after the reset
+    assert query_stats.load(stats) == []
@@ -0,0 +1,74 @@
+"""
+Read/write split — GET reads on the read-only engine, writes and read-your-writes on the primary.
+"""
+import pytest
+from sqlalchemy import event, insert, select
+from sqlalchemy.exc import OperationalError
+
+from app.database import db
+from app.models import ActivityLog, Order
+from app.read_routing import init_read_routing, read_url_for, use_primary
+
+
+@pytest.fixture()
+def routing(app):
+    app.config["DB_READ_ROUTING"] = True
+    init_read_routing(app, db)
+    engine = app.extensions["read_engine"]
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    yield engine, statements
+    db.session.remove()
+    app.config["DB_READ_ROUTING"] = False
+    init_read_routing(app, db)
+    engine.dispose()
+
+
+def test_read_engine_is_read_only(app, routing):
+    engine, _ = routing
+    assert read_url_for(app).endswith("?mode=ro&uri=true")
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA query_only").scalar() == 1
+        with pytest.raises(OperationalError):
+            conn.execute(insert(ActivityLog).values(action="nope"))
+
+
+def test_get_binds_to_read_engine_unless_overridden(app, routing):
+    engine, _ = routing
+    with app.test_request_context("/api/v1/orders"):
+        assert db.session.get_bind(Order) is engine
+        assert db.session.get_bind(clause=insert(Order)) is db.engine
+        use_primary()
+        assert db.session.get_bind(Order) is db.engine
+    with app.test_request_context("/api/v1/orders", method="POST"):
+        assert db.session.get_bind(Order) is db.engine
+    assert db.session.get_bind(Order) is db.engine  # outside a request (CLI, threads)
+
+
+def test_reads_route_and_writers_read_their_own_writes(app, admin_client, routing):
+    _, statements = routing
+    db.session.remove()
+    assert admin_client.get("/api/v1/orders").status_code == 200
+    assert any("FROM shipment" in s for s in statements)
+
+    statements.clear()
+    resp = admin_client.post("/add_order", data={
+        "order_number": "PO-RYW-1", "product_name": "", "buyer": "b", "responsible": "r", "quantity": "1",
+        "order_date": "01.01.24", "required_delivery": "01.03.24", "terms_of_delivery": "FOB",
+        "payment_date": "01.01.24", "etd": "05.01.24", "eta": "01.02.24", "transit_status": "en route",
+        "transport": "sea",
+    })
+    assert resp.status_code == 200 and statements == []
+    try:
+        body = admin_client.get("/api/v1/orders?per_page=100").get_json()
+        assert "PO-RYW-1" in [o["order_number"] for o in body["data"]]
+        assert statements == []  # within READ_YOUR_WRITES_SECONDS: primary
+
+        app.config["READ_YOUR_WRITES_SECONDS"] = 0
+        admin_client.get("/api/v1/orders")
+        assert statements
+    finally:
+        app.config["READ_YOUR_WRITES_SECONDS"] = 5
+        db.session.execute(db.delete(Order).where(Order.order_number == "PO-RYW-1"))
+        db.session.commit()
+    assert db.session.execute(select(Order.id).where(Order.order_number == "PO-RYW-1")).first() is None
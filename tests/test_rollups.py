@@ -0,0 +1,53 @@
+"""
+Transit lead-time rollup — incremental on ORM edits, kept across stage moves, exact after rebuild.
+"""
+from sqlalchemy import select
+
+from app.database import db
+from app.models import Order, TransitRollup, User
+from app.rollups import lead_time_sample, rebuild_rollup
+
+
+def _rollup():
+    return {(r.month, r.bucket): (r.n, r.sum_days, r.sum_sq_days) for r in db.session.execute(
+        select(TransitRollup).where(TransitRollup.transport == "rail-test", TransitRollup.n != 0)
+    ).scalars()}
+
+
+def test_lead_time_sample():
+    assert lead_time_sample("sea", "01.03.19", "2019-03-11", None) == ("sea", "2019-03", 10, 1)
+    assert lead_time_sample("sea", "01.03.19", "11.03.19", "31.03.19") == ("sea", "2019-03", 30, 3)
+    assert lead_time_sample("sea", None, "11.03.19", None) is None
+    assert lead_time_sample("sea", "11.03.19", "01.03.19", None) is None
+
+
+def test_rollup_follows_orders(admin_client, make_order):
+    admin = User.query.filter_by(username="test-admin").one()
+    try:
+        a = make_order(admin.id, "PO-ROLL-1", etd="01.03.19", eta="11.03.19", ata=None, transport="rail-test")
+        make_order(admin.id, "PO-ROLL-2", etd="05.03.19", eta="2019-03-10", ata="2019-03-25", transport="rail-test")
+        db.session.commit()
+        assert _rollup() == {("2019-03", 1): (1, 10, 100), ("2019-03", 2): (1, 20, 400)}
+
+        a.ata = "26.03.19"  # arrives later than planned: 25 days
+        db.session.commit()
+        assert _rollup() == {("2019-03", 2): (1, 20, 400), ("2019-03", 3): (1, 25, 625)}
+
+        # moving to the warehouse keeps the completed lead time
+        admin_client.post("/api/v1/orders/bulk/stock", json={"ids": [a.id]})
+        assert Order.query.filter_by(order_number="PO-ROLL-1").count() == 0
+        assert rebuild_rollup()["synced"] == 0
+        assert _rollup() == {("2019-03", 2): (1, 20, 400), ("2019-03", 3): (1, 25, 625)}
+
+        body = admin_client.get("/analytics/api/transit_efficiency").get_json()
+        stats = body["transports"]["rail-test"]
+        assert (stats["n"], stats["mean"], stats["variance"]) == (2, 22.5, 6.25)
+        assert [b["n"] for b in stats["histogram"]] == [0, 0, 1, 1, 0, 0, 0, 0]
+        assert stats["histogram"][2]["days"] == "15-21"
+        assert body["averages"]["rail-test"] == 22.5
+        assert {"month": "2019-03", "transport": "rail-test", "n": 2, "mean": 22.5,
+                "variance": 6.25, "stddev": 2.5} in body["trend"]
+    finally:
+        make_order.cleanup()
+        rebuild_rollup()
+    assert _rollup() == {}
@@ -0,0 +1,89 @@
+"""
+ScopedQuery — RBAC scope, cached lambda statements with varying parameters, pagination, Row projection.
+"""
+from app.api.v1.schemas import ORDER_COLUMNS, serialize_order_row
+from app.database import db
+from app.models import Order, User, WarehouseStock
+from app.scoped_query import ScopedQuery
+
+
+def _stock(user_id, number, ata, notes=""):
+    db.session.add(WarehouseStock(
+        user_id=user_id, order_number=number, product_name="Valve", quantity="1", ata=ata,
+        notes=notes, transport="sq-test", is_archived=False,
+    ))
+
+
+def _listing(user_id, transport, term, column, direction):
+    # One call site, as in a view: the lambdas keep their code locations across calls.
+    q = ScopedQuery(WarehouseStock, user_id)
+    q.where(lambda s: s.where(WarehouseStock.transport == transport))
+    if term:
+        like = f"%{term}%"
+        q.where(lambda s: s.where(WarehouseStock.notes.like(like)))
+    if direction == "asc":
+        q.order_by(lambda s: s.order_by(column.asc()))
+    else:
+        q.order_by(lambda s: s.order_by(column.desc()))
+    return q
+
+
+def test_scope_params_and_pagination(admin_client):
+    admin = User.query.filter_by(username="test-admin").one()
+    other = User.query.filter_by(username="sq-other").first() or User(username="sq-other", role="user")
+    other.set_password("x")
+    db.session.add(other)
+    db.session.commit()
+    try:
+        _stock(admin.id, "SQ-1", "2024-01-03", "red")
+        _stock(admin.id, "SQ-2", "2024-01-01", "blue")
+        _stock(admin.id, "SQ-3", "2024-01-02", "red")
+        _stock(other.id, "SQ-4", "2024-01-04", "red")
+        db.session.commit()
+
+        def numbers(rows):
+            return [r.order_number for r in rows]
+
+        assert numbers(_listing(None, "sq-test", "", WarehouseStock.ata, "asc").all()) == ["SQ-2", "SQ-3", "SQ-1", "SQ-4"]
+        assert numbers(_listing(admin.id, "sq-test", "", WarehouseStock.ata, "asc").all()) == ["SQ-2", "SQ-3", "SQ-1"]
+        # same statement shape, new closure values: the cached SQL must pick them up
+        assert numbers(_listing(other.id, "sq-test", "red", WarehouseStock.ata, "desc").all()) == ["SQ-4"]
+        assert numbers(_listing(admin.id, "sq-test", "red", WarehouseStock.order_number, "desc").all()) == ["SQ-3", "SQ-1"]
+        assert _listing(admin.id, "none", "", WarehouseStock.ata, "asc").all() == []
+
+        q = _listing(None, "sq-test", "", WarehouseStock.ata, "desc")
+        assert q.count() == 4
+        assert numbers(q.page(1, 2)) == ["SQ-1", "SQ-3"]
+        assert q.first().order_number == "SQ-4"
+        pagination = q.paginate(page=2, per_page=3, error_out=False)
+        assert pagination.total == 4 and pagination.pages == 2 and numbers(pagination.items) == ["SQ-2"]
+
+        rows = db.session.execute(q.select(WarehouseStock.order_number, WarehouseStock.ata)).all()
+        assert [tuple(r) for r in rows][:2] == [("SQ-4", "2024-01-04"), ("SQ-1", "2024-01-03")]
+    finally:
+        WarehouseStock.query.filter(WarehouseStock.transport == "sq-test").delete(synchronize_session=False)
+        db.session.commit()
+
+
+def test_project_rows_serialize_like_entities(admin_client):
+    admin = User.query.filter_by(username="test-admin").one()
+    order = Order(
+        user_id=admin.id, order_date="02.01.24", order_number="SQ-ROW-1", product_name="Valve", buyer="B",
+        responsible="R", quantity="3", required_delivery=None, terms_of_delivery=None, payment_date="",
+        etd="2024-01-05", eta="10/02/2024", ata=None, transit_status="en route", transport="sq-test",
+    )
+    db.session.add(order)
+    db.session.commit()
+    try:
+        q = ScopedQuery(Order, admin.id).where(lambda s: s.where(Order.order_number == "SQ-ROW-1"))
+        (row,) = q.project(*ORDER_COLUMNS).all()
+        assert not isinstance(row, Order) and row.order_number == "SQ-ROW-1"
+        assert q.count() == 1 and q.page(0, 5) == [row]
+
+        item = serialize_order_row(row)
+        assert item["id"] == order.id and item["quantity"] == "3" and item["transport"] == "sq-test"
+        assert (item["required_delivery"], item["terms_of_delivery"], item["payment_date"]) == ("", "", "")
+        assert (item["order_date"], item["etd"], item["eta"], item["ata"]) == ("2024-01-02", "2024-01-05", "2024-02-10", "")
+    finally:
+        db.session.delete(order)
+        db.session.commit()
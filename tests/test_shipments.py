@@ -0,0 +1,138 @@
+"""
+Shipment identity — one id and a stage column across Order/Warehouse/Delivered.
+"""
+from flask import g
+from sqlalchemy import event
+
+from app import lifecycle
+from app.database import db
+from app.models import (
+    DeliveredGoods,
+    Order,
+    Shipment,
+    StockReportEntry,
+    User,
+    WarehouseStock,
+)
+
+
+def test_shipment_keeps_identity_across_stages(admin_client, make_order):
+    admin = User.query.filter_by(username="test-admin").one()
+    o = make_order(admin.id, "PO-SHIP-1")
+    db.session.commit()
+    sid = o.id
+    assert db.session.get(Shipment, sid).stage == "transit"
+
+    admin_client.post(f"/stock_order/{sid}")
+    stock = WarehouseStock.query.filter_by(order_number="PO-SHIP-1").one()
+    assert stock.id == sid and db.session.get(Order, sid) is None
+
+    admin_client.post(f"/deliver_partial/{stock.id}", data={"quantity": "4"})
+    split = DeliveredGoods.query.filter_by(order_number="PO-SHIP-1").one()
+    assert split.id != sid and split.parent_id == sid
+    assert (split.quantity, split.delivery_source, split.client) == ("4.0", "From Warehouse", stock.client)
+
+    res = admin_client.get("/api/v1/shipments?order_number=PO-SHIP-1")
+    stages = {s["id"]: (s["stage"], s["detail_id"]) for s in res.get_json()["data"]}
+    assert stages == {sid: ("warehouse", sid), split.id: ("delivered", split.id)}
+
+    admin_client.post(f"/deliver_partial/{stock.id}", data={"quantity": "6"})
+    db.session.expire_all()
+    moved = db.session.get(Shipment, sid)
+    assert isinstance(moved, DeliveredGoods) and (moved.stage, moved.quantity) == ("delivered", "6.0")
+    assert WarehouseStock.query.filter_by(id=sid).count() == 0
+    assert admin_client.get("/api/v1/shipments").status_code == 400
+
+
+def test_transition_is_one_update_of_the_row(app, make_order):
+    owner = User.query.first()
+    if owner is None:
+        owner = User(username="ship-owner", role="admin")
+        db.session.add(owner)
+        db.session.commit()
+    o = make_order(owner.id, "PO-SHIP-2")
+    db.session.commit()
+    sid = o.id
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split()[0].upper())
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        result = lifecycle.stock_orders([sid], owner, allowed=lifecycle.any_editor)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+    db.session.commit()
+    assert result[sid][0] == lifecycle.OK
+    assert "INSERT" not in statements and "DELETE" not in statements
+    assert statements.count("UPDATE") == 1
+    assert Shipment.query.filter_by(order_number="PO-SHIP-2").count() == 1
+
+    # an ORM delete removes the shipment with its row
+    db.session.delete(db.session.get(WarehouseStock, sid))
+    db.session.commit()
+    assert db.session.get(Shipment, sid) is None
+
+
+def _login(app, username, role):
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        user = User(username=username, role=role)
+        user.set_password("pw")
+        db.session.add(user)
+        db.session.commit()
+    client = app.test_client()
+    g.pop("_login_user", None)
+    client.post("/login", data={"form_type": "login", "username": username, "password": "pw"})
+    return user, client
+
+
+def _post(client, url):
+    g.pop("_login_user", None)  # the app context is shared, so drop the last client's user
+    return client.post(url)
+
+
+def test_single_row_routes_keep_their_permission_rules(app, make_order):
+    boss, boss_client = _login(app, "ship-super", "superuser")  # sees everything, cannot edit
+    _, clerk_client = _login(app, "ship-clerk", "user")         # edits, sees own rows
+    entry = None
+    try:
+        own, other = make_order(boss.id, "PO-SHIP-R1"), make_order(boss.id, "PO-SHIP-R2")
+        db.session.commit()
+
+        # deliver_direct: an editor, or the owner
+        _post(boss_client, f"/deliver_direct/{own.id}")
+        delivered = DeliveredGoods.query.filter_by(order_number="PO-SHIP-R1").one()
+
+        # stock_order: any editor, whoever owns the order
+        _post(clerk_client, f"/stock_order/{other.id}")
+        stock = WarehouseStock.query.filter_by(order_number="PO-SHIP-R2").one()
+        entry = StockReportEntry(related_order_id=stock.id, product="Boxes")
+        db.session.add(entry)
+        db.session.commit()
+
+        # restore_to_dashboard: the owner only; the stock report entry loses its link
+        _post(clerk_client, f"/restore_to_dashboard?item_id={stock.id}")
+        assert WarehouseStock.query.filter_by(id=stock.id).count() == 1
+        _post(boss_client, f"/restore_to_dashboard?item_id={stock.id}")
+        db.session.expire_all()
+        assert WarehouseStock.query.filter_by(id=stock.id).count() == 0
+        assert db.session.get(StockReportEntry, entry.id).related_order_id is None
+        assert Order.query.filter_by(order_number="PO-SHIP-R2").one().eta == "21.02.24"  # the stock's ATA
+
+        # restore_from_delivered: the owner only, ETD/ETA/ATA left blank
+        # /restore_from_delivered is served by delivered_routes (registered first): editors only
+        assert _post(boss_client, f"/restore_from_delivered?item_id={delivered.id}").status_code == 403
+        # restore_routes' variant: the owner only, ETD/ETA/ATA left blank
+        result = lifecycle.restore_delivered([delivered.id], boss, allowed=lifecycle.owner_only, arrived_today=False)
+        assert result[delivered.id][0] == lifecycle.OK
+        db.session.commit()
+        back = Order.query.filter_by(order_number="PO-SHIP-R1").one()
+        assert (back.etd, back.eta, back.ata, back.transit_status) == ("", "", "", "in process")
+    finally:
+        g.pop("_login_user", None)
+        if entry is not None:
+            db.session.delete(entry)
+            db.session.commit()
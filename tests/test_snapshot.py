@@ -0,0 +1,123 @@
+"""
+Columnar order snapshot — same answers as the row-by-row paths, refreshed from the change log.
+"""
+import pytest
+from sqlalchemy import text
+
+from app.database import db
+from app.models import Order, User
+from app.snapshot import _snapshot, prune_change_log
+
+ROWS = [
+    # number, order_date, etd, eta, ata, buyer, transport, status
+    ("PO-SNAP-1", "03.01.22", "10.01.22", "2022-02-01", "", "snap co", "sea", "arrived"),
+    ("PO-SNAP-2", "2022-01-03", "12.01.2022", "15.02.22", None, "Snap Co", "air", "en route"),
+    ("PO-SNAP-3", "", "05/12/2021", "20.01.22", "21.01.22", "Other Snap", "sea", "arrived"),
+    ("PO-SNAP-4", "01.06.23", "", "", "", "snap co", "rail", "in process"),
+]
+QUERIES = [
+    "/api/v1/orders?per_page=100",
+    "/api/v1/orders?per_page=2&page=2&sort=buyer:asc,order_date:desc",
+    "/api/v1/orders?filter[year]=2021&sort=etd:asc",
+    "/api/v1/orders?filter[transport]=sea&filter[buyer]=snap co&sort=transit_status:desc",
+    "/api/v1/orders?filter[buyer]=nobody",
+    "/api/v1/orders?filter[q]=SNAP-2",
+    "/api/years",
+    "/api/orders",
+    "/api/orders?year=2022",
+]
+
+
+@pytest.fixture()
+def snapshot_on(app):
+    app.config["ORDER_SNAPSHOT"] = True
+    yield
+    app.config["ORDER_SNAPSHOT"] = False
+
+
+def _triggers():
+    return db.session.execute(text(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'order_change_log_%'"
+    )).scalars().all()
+
+
+def test_triggers_only_while_the_snapshot_is_used(admin_client, app):
+    snap = _snapshot()
+    runner = app.test_cli_runner()
+    try:
+        runner.invoke(args=["snapshot-triggers", "--drop"])
+        snap.logging = False
+        admin_client.get(QUERIES[0])  # flag off: no triggers, no log writes
+        assert _triggers() == []
+
+        app.config["ORDER_SNAPSHOT"] = True
+        admin_client.get(QUERIES[0])
+        assert len(_triggers()) == 3
+    finally:
+        app.config["ORDER_SNAPSHOT"] = False
+    assert "removed" in runner.invoke(args=["snapshot-triggers", "--drop"]).output
+    assert _triggers() == []
+    assert "installed" in runner.invoke(args=["snapshot-triggers"]).output
+    assert len(_triggers()) == 3
+
+
+def _answers(client):
+    bodies = [client.get(url).get_json() for url in QUERIES]
+    return [{k: v for k, v in body.items() if k != "trace_id"} for body in bodies]
+
+
+def test_snapshot_matches_row_paths(admin_client, app):
+    admin = User.query.filter_by(username="test-admin").one()
+    try:
+        for number, od, etd, eta, ata, buyer, transport, status in ROWS:
+            db.session.add(Order(
+                user_id=admin.id, order_date=od, order_number=number, product_name="Nails", buyer=buyer,
+                responsible="Anna", quantity="1", required_delivery="", terms_of_delivery="FOB",
+                payment_date="", etd=etd, eta=eta, ata=ata, transit_status=status, transport=transport,
+            ))
+        db.session.commit()
+        expected = _answers(admin_client)
+
+        app.config["ORDER_SNAPSHOT"] = True
+        snap = _snapshot()
+        assert _answers(admin_client) == expected
+        hits = snap.hits
+        admin_client.get(QUERIES[0])
+        assert snap.hits == hits + 1
+
+        # writes reach the snapshot through the change log, incrementally
+        loads = snap.full_loads
+        Order.query.filter_by(order_number="PO-SNAP-4").one().buyer = "Alpha"
+        Order.query.filter_by(order_number="PO-SNAP-1").delete()
+        db.session.commit()
+        app.config["ORDER_SNAPSHOT"] = False
+        expected = _answers(admin_client)
+        app.config["ORDER_SNAPSHOT"] = True
+        assert _answers(admin_client) == expected
+        assert snap.full_loads == loads and snap.incremental_loads >= 1
+
+        # pruning past the snapshot's position forces a full reload
+        db.session.add(Order(
+            user_id=admin.id, order_date="01.01.24", order_number="PO-SNAP-5", product_name="Nails",
+            buyer="snap co", responsible="Anna", quantity="1", required_delivery="", terms_of_delivery="FOB",
+            payment_date="", etd="", eta="", ata="", transit_status="in process", transport="sea",
+        ))
+        db.session.commit()
+        db.session.add(Order(
+            user_id=admin.id, order_date="02.01.24", order_number="PO-SNAP-6", product_name="Nails",
+            buyer="snap co", responsible="Anna", quantity="1", required_delivery="", terms_of_delivery="FOB",
+            payment_date="", etd="", eta="", ata="", transit_status="in process", transport="sea",
+        ))
+        db.session.commit()
+        prune_change_log(keep=1)
+        ids = [o["id"] for o in admin_client.get(QUERIES[0]).get_json()["data"]]
+        assert snap.full_loads == loads + 1
+        assert Order.query.filter_by(order_number="PO-SNAP-6").one().id in ids
+
+        stats = admin_client.get("/_admin/snapshot_stats?token=change-me").get_json()
+        assert stats["enabled"] and stats["rows"] == len(snap.view) and stats["array_bytes"] > 0
+        assert 0 < stats["hit_rate"] < 1
+    finally:
+        app.config["ORDER_SNAPSHOT"] = False
+        Order.query.filter(Order.order_number.like("PO-SNAP-%")).delete(synchronize_session=False)
+        db.session.commit()
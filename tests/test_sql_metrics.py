@@ -0,0 +1,75 @@
+"""
+Per-request SQL metrics — Server-Timing header, sql_metrics log line, slow-query log.
+"""
+import json
+import logging
+
+import pytest
+from sqlalchemy.exc import DBAPIError
+
+from app import db_timing, sql_metrics
+from app.database import db
+from app.sql_metrics import install_listeners, param_shape
+
+
+@pytest.fixture()
+def metrics(app):
+    app.config["SQL_METRICS"] = True
+    install_listeners(True)
+    yield app
+    app.config["SQL_METRICS"] = False
+    app.config["SLOW_QUERY_MS"] = 200
+    install_listeners(False)
+
+
+def _logged(caplog, prefix):
+    return [json.loads(r.getMessage()[len(prefix) + 1:]) for r in caplog.records if r.getMessage().startswith(prefix)]
+
+
+def test_server_timing_and_log_line(admin_client, metrics, caplog):
+    with caplog.at_level(logging.INFO):
+        resp = admin_client.get("/api/v1/orders")
+    assert resp.status_code == 200
+    db_timing, total_timing = resp.headers.getlist("Server-Timing")
+    assert db_timing.startswith("db;dur=") and total_timing.startswith("total;dur=")
+
+    (line,) = _logged(caplog, "sql_metrics")
+    assert line["path"] == "/api/v1/orders" and line["status"] == 200
+    assert line["queries"] >= 1
+    assert f'desc="{line["queries"]} queries"' in db_timing
+    assert 0 < len(line["slowest"]) <= metrics.config["SQL_METRICS_TOP"]
+    assert line["slowest"][0]["ms"] >= line["slowest"][-1]["ms"]
+
+
+def test_slow_query_log(admin_client, metrics, caplog):
+    metrics.config["SLOW_QUERY_MS"] = 0
+    with caplog.at_level(logging.WARNING):
+        admin_client.get("/api/v1/orders/delayed")
+    slow = _logged(caplog, "slow_query")
+    assert slow and all(s["path"] == "/api/v1/orders/delayed" for s in slow)
+    assert any("app/api/v1/orders.py" in s["site"] and "list_delayed_orders" in s["site"] for s in slow)
+    assert all("params" in s and "SELECT" in s["sql"] for s in slow)
+
+
+def test_disabled_attaches_nothing(admin_client, app):
+    assert not db_timing.subscribed(sql_metrics._record)
+    assert "Server-Timing" not in admin_client.get("/api/v1/orders").headers
+
+
+
+def test_failed_statement_leaves_no_timer_behind(app, metrics):
+    with app.test_request_context("/"):
+        sql_metrics.start_request()
+        with db.engine.connect() as conn:
+            info = dict(conn.info)
+            with pytest.raises(DBAPIError):
+                conn.exec_driver_sql("SELECT * FROM no_such_table")
+            conn.exec_driver_sql("SELECT 1")
+            assert conn.info == info  # the start time lived on the failed statement's context
+        assert sql_metrics._stats().queries == 1
+
+def test_param_shape_never_shows_values():
+    assert param_shape(("secret", 3, None)) == "3 params (str, int, NoneType)"
+    assert param_shape({"id": 7}) == "{id: int}"
+    assert param_shape([("a", 1), ("b", 2)], executemany=True) == "2 x 2 params (str, int)"
+    assert param_shape(()) == "no params"
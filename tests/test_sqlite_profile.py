@@ -0,0 +1,71 @@
+"""
+SQLite pragma profile — parsed from SQLITE_PRAGMAS, applied on connect; WAL checkpoints.
+"""
+import pytest
+from sqlalchemy import text
+
+from app import lifecycle
+from app.database import db
+from app.models import Order, StockReportEntry, User, WarehouseStock
+from app.sqlite_profile import (
+    DEFAULT_PRAGMAS,
+    checkpoint,
+    checkpoint_all,
+    parse_pragmas,
+)
+
+
+def test_parse_pragmas():
+    assert parse_pragmas(None) == DEFAULT_PRAGMAS
+    assert parse_pragmas("off") == {}
+    custom = parse_pragmas("busy_timeout=10000, mmap_size=default, cache_size=-4000")
+    assert custom["busy_timeout"] == "10000" and custom["cache_size"] == "-4000"
+    assert "mmap_size" not in custom and custom["journal_mode"] == "WAL"
+    with pytest.raises(ValueError):
+        parse_pragmas("journal_mode=WAL; DROP TABLE user")
+
+
+def test_profile_applied_and_checkpoint(app):
+    with db.engine.connect() as conn:
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+        assert conn.execute(text("PRAGMA foreign_keys")).scalar() == 0  # not part of the profile
+        assert conn.execute(text("PRAGMA temp_store")).scalar() == 2  # MEMORY
+        journal = conn.execute(text("PRAGMA journal_mode")).scalar()
+
+    result = checkpoint(db.engine, "passive")
+    if journal == "wal":
+        assert set(result) == {"busy", "log", "checkpointed"} and result["busy"] == 0
+    else:  # in-memory database
+        assert result is None
+    assert set(checkpoint_all(db)) == {"", "archive"}
+    with pytest.raises(ValueError):
+        checkpoint(db.engine, "now")
+
+
+def test_restore_with_stock_report_entry_under_foreign_keys(admin_client):
+    """Opting in to foreign_keys=ON must not break restoring a referenced stock row."""
+    admin = User.query.filter_by(username="test-admin").one()
+    stock = WarehouseStock(
+        user_id=admin.id, order_number="PO-FK-1", product_name="Bolts", quantity="3", ata="21.02.24",
+        transit_status="In Stock", transport="sea",
+    )
+    db.session.add(stock)
+    db.session.commit()
+    entry = StockReportEntry(related_order_id=stock.id, product="Bolts")
+    db.session.add(entry)
+    db.session.commit()
+
+    raw = db.session.connection().connection.dbapi_connection
+    raw.execute("PRAGMA foreign_keys=ON")  # outside a transaction, so it takes effect
+    try:
+        result = lifecycle.restore_warehouse([stock.id], admin)
+        db.session.commit()
+        assert result[stock.id][0] == lifecycle.OK
+        assert db.session.get(StockReportEntry, entry.id).related_order_id is None
+    finally:
+        db.session.rollback()
+        raw.execute("PRAGMA foreign_keys=OFF")
+        db.session.delete(db.session.get(StockReportEntry, entry.id))
+        Order.query.filter_by(order_number="PO-FK-1").delete()
+        WarehouseStock.query.filter_by(order_number="PO-FK-1").delete()
+        db.session.commit()
@@ -0,0 +1,98 @@
+"""
+Transit status recompute — timeline rules applied in batches, only changed rows written.
+"""
+from datetime import date, timedelta
+
+from app import status
+from app.database import db
+from app.models import JobRun, Order, User
+from app.status import recompute_statuses
+
+TODAY = date(2024, 3, 13)  # Wednesday; ISO week runs 11.03.24 – 17.03.24
+
+
+def test_recompute_updates_only_stale_rows(app, make_order):
+    owner = User.query.first()
+    if owner is None:
+        owner = User(username="status-owner", role="admin")
+        db.session.add(owner)
+        db.session.commit()
+    cases = {
+        "PO-STAT-1": (("01.02.24", "20.02.24", "21.02.24", "en route"), "arrived"),
+        "PO-STAT-2": (("01.02.24", "2024-03-01", None, "in process"), "en route"),
+        "PO-STAT-3": (("01.04.24", "20.04.24", None, "en route"), "in process"),
+        "PO-STAT-4": (("01.03.24", "12.03.24", "14.03.2024", "arrived"), "arrived"),
+        # ETA before ETD is pushed a week past ETD, i.e. still ahead
+        "PO-STAT-5": (("20.03.24", "01.03.24", None, "en route"), "in process"),
+    }
+    for number, ((etd, eta, ata, state), _) in cases.items():
+        make_order(owner.id, number, etd=etd, eta=eta, ata=ata, transit_status=state)
+    db.session.commit()
+
+    counts = recompute_statuses(today=TODAY, batch_size=2)
+    assert counts["updated"] >= 4
+    db.session.expire_all()
+    got = {o.order_number: o.transit_status
+           for o in Order.query.filter(Order.order_number.like("PO-STAT-%"))}
+    assert got == {number: expected for number, (_, expected) in cases.items()}
+    assert Order.query.filter_by(order_number="PO-STAT-5").one().eta == "01.03.24"
+
+    assert recompute_statuses(today=TODAY)["updated"] == 0
+
+
+def test_delay_state_kept_on_write_and_listed_by_delay(admin_client, make_order):
+    admin = User.query.filter_by(username="test-admin").one()
+    today = date.today()
+    late = make_order(admin.id, "PO-STAT-D1", buyer="Status Co", etd="01.01.20",
+                      eta=(today - timedelta(days=9)).strftime("%d.%m.%y"), ata=None, transit_status="en route")
+    later = make_order(admin.id, "PO-STAT-D2", buyer="Status Co", etd="01.01.20", eta="2020-02-01", ata="",
+                       transit_status="en route")
+    make_order(admin.id, "PO-STAT-D3", buyer="Status Co", etd="01.01.20",
+               eta=(today + timedelta(days=5)).strftime("%d.%m.%y"), ata=None, transit_status="in process")
+    db.session.commit()
+    assert (late.is_delayed, late.delay_days) == (True, 9)
+
+    res = admin_client.get("/api/v1/orders/delayed?filter[buyer]=Status Co")
+    body = res.get_json()
+    assert [o["order_number"] for o in body["data"]] == ["PO-STAT-D2", "PO-STAT-D1"]
+    assert body["data"][1]["delay_days"] == 9 and body["meta"]["total"] == 2
+    assert admin_client.get("/api/v1/orders/delayed?sort=eta").status_code == 400
+
+    later.ata = "03.02.20"
+    db.session.commit()
+    assert (later.is_delayed, later.delay_days) == (False, None)
+
+    # overnight: the sweep moves delay_days forward
+    recompute_statuses(today=today + timedelta(days=1))
+    db.session.expire_all()
+    assert db.session.get(Order, late.id).delay_days == 10
+
+
+def test_daily_jobs_run_once_per_day_and_isolate_steps(app, monkeypatch):
+    db.session.query(JobRun).delete()
+    db.session.commit()
+    ran = []
+
+    def step(name):
+        return lambda: ran.append(name) or name
+
+    def broken():
+        raise RuntimeError("rollup broke")
+
+    for name in ("recompute_statuses", "snapshot_kpi", "train_eta_model", "prune_change_log"):
+        monkeypatch.setattr(status, name, step(name))
+    monkeypatch.setattr(status, "rebuild_rollup", broken)
+
+    results = status.run_daily_jobs(today=TODAY)
+    assert results["transit rollup"] == "failed: rollup broke"
+    assert ran == ["recompute_statuses", "snapshot_kpi", "train_eta_model", "prune_change_log"]
+    assert db.session.get(JobRun, status.DAILY_JOB).finished_at is not None
+
+    # another worker (or cron host) on the same day finds it claimed
+    assert status.run_daily_jobs(today=TODAY) is None
+    assert status.claim_day(TODAY + timedelta(days=1)) is True
+    assert status.run_daily_jobs(today=TODAY, force=True) is not None
+    assert len(ran) == 8
+
+    db.session.query(JobRun).delete()
+    db.session.commit()
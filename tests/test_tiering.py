@@ -0,0 +1,125 @@
+"""
+Cold tier — old delivered goods / archived orders move to the archive bind.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, text
+
+from app.counters import _counted
+from app.database import db
+from app.models import (
+    ArchivedOrder,
+    ColdArchivedOrder,
+    ColdDeliveredGoods,
+    ColdStockReportEntry,
+    ColdWarehouseStock,
+    DeliveredGoods,
+    Shipment,
+    StockReportEntry,
+    User,
+    WarehouseStock,
+)
+from app.shipments import where_is
+from app.tiering import find_delivered, find_stock, run_tiering
+from app.utils.dates import utcnow
+
+
+def _delivered(user_id, number, date):
+    d = DeliveredGoods(
+        user_id=user_id, order_number=number, product_name="Crates", quantity="3",
+        delivery_source="From Warehouse", delivery_date=date, transport="sea",
+    )
+    db.session.add(d)
+    return d
+
+
+def _cleanup():
+    for model in (DeliveredGoods, ColdDeliveredGoods, ArchivedOrder, ColdArchivedOrder, Shipment,
+                  WarehouseStock, ColdWarehouseStock):
+        model.query.filter(model.order_number.like("PO-COLD-%")).delete(synchronize_session=False)
+    for model in (StockReportEntry, ColdStockReportEntry):
+        model.query.filter_by(stockref="COLD-REF").delete(synchronize_session=False)
+    db.session.commit()
+
+
+def test_tiering_moves_old_rows_and_reads_through(admin_client):
+    admin = User.query.filter_by(username="test-admin").one()
+    try:
+        old = _delivered(admin.id, "PO-COLD-1", "03.01.20")
+        _delivered(admin.id, "PO-COLD-2", datetime.now().strftime("%Y-%m-%d"))
+        crashed = _delivered(admin.id, "PO-COLD-3", "2019-05-01")
+        db.session.add(ArchivedOrder(order_number="PO-COLD-4", user_id=admin.id,
+                                     archived_at=utcnow() - timedelta(days=800)))
+        db.session.commit()
+        old_id = old.id
+
+        # a previous run copied this row but died before deleting it
+        db.session.add(ColdDeliveredGoods(id=crashed.id, user_id=admin.id, order_number="PO-COLD-3",
+                                          product_name="Crates", quantity="3",
+                                          delivery_source="From Warehouse", delivery_date="2019-05-01"))
+        db.session.commit()
+
+        counts = run_tiering(days=365, batch_size=1)
+        assert (counts["delivered"], counts["archived_orders"]) == (2, 1)
+        assert DeliveredGoods.query.filter(DeliveredGoods.order_number.like("PO-COLD-%")).count() == 1
+        assert ColdDeliveredGoods.query.filter(ColdDeliveredGoods.order_number.like("PO-COLD-%")).count() == 2
+        assert ColdArchivedOrder.query.filter_by(order_number="PO-COLD-4").count() == 1
+
+        assert find_delivered("PO-COLD-1").id == old_id
+        assert [(s["stage"], s["detail_id"]) for s in where_is("PO-COLD-1", admin)] == [("archived", old_id)]
+        assert db.session.get(Shipment, old_id).stage == "archived"
+        assert db.session.get(Shipment, old_id).product_name is None  # the details live in the cold tier
+
+        page = admin_client.get("/delivered?search=po-cold-1")
+        assert page.status_code == 200
+        assert b"From archive (1)" in page.data
+    finally:
+        _cleanup()
+
+
+def test_archived_stock_moves_with_report_entries(app):
+    owner = User.query.first() or User(username="cold-owner", role="admin")
+    db.session.add(owner)
+    db.session.commit()
+    try:
+        def stock(number, archived, archived_at=None):
+            item = WarehouseStock(user_id=owner.id, order_number=number, product_name="Crates", quantity="5",
+                                  is_archived=archived, archived_at=archived_at)
+            db.session.add(item)
+            return item
+
+        old = stock("PO-COLD-10", True, utcnow() - timedelta(days=90))
+        stock("PO-COLD-11", True)  # archived before archived_at existed
+        stock("PO-COLD-12", True, utcnow())
+        stock("PO-COLD-13", False)
+        db.session.commit()
+        db.session.add(StockReportEntry(related_order_id=old.id, stockref="COLD-REF", pcs=5))
+        db.session.commit()
+        old_id = old.id
+
+        counts = run_tiering(warehouse_days=30, batch_size=1)
+        assert counts["warehouse"] == 2
+        remaining = {w.order_number for w in WarehouseStock.query.filter(WarehouseStock.order_number.like("PO-COLD-%"))}
+        assert remaining == {"PO-COLD-12", "PO-COLD-13"}
+        assert StockReportEntry.query.filter_by(stockref="COLD-REF").count() == 0
+
+        item, entry_model = find_stock("PO-COLD-10")
+        assert (item.id, entry_model) == (old_id, ColdStockReportEntry)
+        assert entry_model.query.filter_by(related_order_id=old_id).one().pcs == 5
+    finally:
+        _cleanup()
+
+
+def test_active_warehouse_queries_use_partial_index(app):
+    plan = db.session.execute(text(
+        "EXPLAIN QUERY PLAN SELECT count(*) FROM shipment "
+        "WHERE stage = 'warehouse' AND is_archived = 0 AND user_id = 1"
+    )).all()
+    assert any("ix_warehouse_stock_active" in str(row) for row in plan)
+
+    # the predicate the app builds must render the same way (IS 0 would not match the index)
+    active = select(func.count()).where(_counted("warehouse"), Shipment.user_id == 1)
+    sql = str(active.compile(dialect=db.engine.dialect, compile_kwargs={"literal_binds": True}))
+    assert "is_archived = 0" in sql
+    plan = db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+    assert any("ix_warehouse_stock_active" in str(row) for row in plan)
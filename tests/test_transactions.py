@@ -0,0 +1,126 @@
+"""
+Write contention — retry-on-locked with jittered backoff, 503 when it persists, single-writer lock.
+"""
+import sqlite3
+import threading
+import time
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from app import lifecycle, transactions
+from app.database import db
+from app.models import ActivityLog
+from app.transactions import (
+    DatabaseBusy,
+    backoff_delay,
+    is_lock_error,
+    run_in_transaction,
+)
+
+
+def _locked():
+    return OperationalError("UPDATE ...", {}, sqlite3.OperationalError("database is locked"))
+
+
+@pytest.fixture()
+def no_sleep(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(transactions.time, "sleep", sleeps.append)
+    return sleeps
+
+
+def test_is_lock_error_and_backoff():
+    assert is_lock_error(_locked())
+    assert not is_lock_error(OperationalError("SELECT", {}, sqlite3.OperationalError("no such table: x")))
+    assert not is_lock_error(IntegrityError("INSERT", {}, sqlite3.IntegrityError("UNIQUE constraint failed")))
+    assert not is_lock_error(ValueError("database is locked"))
+    delays = [backoff_delay(attempt, 50, 1000) for attempt in range(10) for _ in range(20)]
+    assert all(0 <= d <= 1.0 for d in delays)
+    assert max(backoff_delay(0, 50, 1000) for _ in range(50)) <= 0.05
+
+
+def test_retries_rerun_the_unit_of_work(app, no_sleep):
+    calls = []
+
+    def work():
+        calls.append(1)
+        db.session.add(ActivityLog(action="retry-test", details=str(len(calls))))
+        if len(calls) < 3:
+            raise _locked()
+        return len(calls)
+
+    assert run_in_transaction(work) == 3
+    assert len(no_sleep) == 2
+    # the rolled-back attempts left nothing behind
+    assert [a.details for a in ActivityLog.query.filter_by(action="retry-test")] == ["3"]
+
+
+def test_gives_up_with_database_busy_and_passes_other_errors(app, no_sleep):
+    def locked():
+        raise _locked()
+
+    with pytest.raises(DatabaseBusy):
+        run_in_transaction(locked, retries=2)
+    assert len(no_sleep) == 2
+
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise OperationalError("SELECT", {}, sqlite3.OperationalError("no such table: x"))
+
+    with pytest.raises(OperationalError):
+        run_in_transaction(broken)
+    assert len(calls) == 1
+
+
+def test_bulk_endpoint_retries_then_returns_503(app, admin_client, monkeypatch, no_sleep):
+    attempts = []
+
+    def flaky(ids, user):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise _locked()
+        return {i: (lifecycle.NOT_FOUND, "Not found.") for i in ids}
+
+    monkeypatch.setattr(lifecycle, "stock_orders", flaky)
+    resp = admin_client.post("/api/v1/orders/bulk/stock", json={"ids": [987654]})
+    assert resp.status_code == 200 and len(attempts) == 2
+
+    def always_locked(ids, user):
+        raise _locked()
+
+    monkeypatch.setattr(lifecycle, "stock_orders", always_locked)
+    resp = admin_client.post("/api/v1/orders/bulk/stock", json={"ids": [987654]})
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "1"
+    assert resp.get_json()["error"]["code"] == "SERVICE_UNAVAILABLE"
+
+
+def test_single_writer_serializes_units_of_work(app, monkeypatch):
+    monkeypatch.setitem(app.config, "SINGLE_WRITER", True)
+    active, peak = [0], [0]
+    guard = threading.Lock()
+
+    def work():
+        with guard:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with guard:
+            active[0] -= 1
+
+    def run():
+        with app.app_context():
+            try:
+                run_in_transaction(work)
+            finally:
+                db.session.remove()
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert peak[0] == 1
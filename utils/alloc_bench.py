@@ -0,0 +1,106 @@
+# alloc_bench.py — memory and objects of an order list, ORM entities vs projected Rows
+# Run:  python utils/alloc_bench.py                       (10000 orders)
+#       python utils/alloc_bench.py --rows 50000
+#
+# Builds the app on an in-memory database with --rows orders, then loads and
+# serializes all of them both ways, the way GET /api/v1/orders did before and
+# does now:
+#   entities   ScopedQuery(Order).all() + one dict per entity + to_iso() per date field
+#   rows       ScopedQuery(Order).project(*ORDER_COLUMNS).all() + serialize_order_row()
+# For each it prints the memory (tracemalloc) and GC-tracked objects still
+# held after the load, the peak during load + serialize, and the wall time.
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.update({
+    "DATABASE_URL": "sqlite://", "ARCHIVE_DATABASE_URL": "sqlite://", "SECRET_KEY": "bench",
+    "DEMO_MODE": "false", "AUTO_SEED_ON_EMPTY": "false", "USE_SEED_BOOT": "false",
+    "STATUS_RECOMPUTE_DAILY": "false",
+})
+from app import create_app  # noqa: E402
+from app.api.v1.schemas import ISO_FIELDS, ORDER_COLUMNS, ORDER_FIELDS, serialize_order_row, to_iso  # noqa: E402
+from app.database import db  # noqa: E402
+from app.models import Order, User  # noqa: E402
+from app.scoped_query import ScopedQuery  # noqa: E402
+
+
+def seed(rows):
+    db.session.execute(db.insert(User), [{"id": 1, "username": "bench", "role": "admin"}])
+    db.session.execute(db.insert(Order), [
+        {"user_id": 1, "order_date": f"{1 + i % 28:02d}.{1 + i % 12:02d}.24", "order_number": f"PO-{i:07d}",
+         "product_name": f"Item {i % 97}", "buyer": f"Buyer {i % 40}", "responsible": "Anna", "quantity": str(i % 50),
+         "required_delivery": "", "terms_of_delivery": "FOB", "payment_date": "",
+         "etd": f"{1 + i % 28:02d}.{1 + i % 12:02d}.24", "eta": f"{1 + (i + 9) % 28:02d}.{1 + i % 12:02d}.24",
+         "ata": None, "transit_status": "en route", "transport": "sea"}
+        for i in range(rows)
+    ])
+    db.session.commit()
+
+
+def load_entities():
+    return ScopedQuery(Order).all()
+
+
+def serialize_entities(orders):
+    data = []
+    for o in orders:
+        item = {name: getattr(o, name) for name in ORDER_FIELDS}
+        for fld in ISO_FIELDS:
+            item[fld] = to_iso(item[fld])
+        data.append(item)
+    return data
+
+
+def load_rows():
+    return ScopedQuery(Order).project(*ORDER_COLUMNS).all()
+
+
+def serialize_rows(rows):
+    return [serialize_order_row(r) for r in rows]
+
+
+def measure(load, serialize):
+    db.session.expunge_all()
+    gc.collect()
+    objects = len(gc.get_objects())
+    tracemalloc.start()
+    start = time.perf_counter()
+    loaded = load()
+    held, _ = tracemalloc.get_traced_memory()
+    held_objects = len(gc.get_objects()) - objects
+    data = serialize(loaded)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(data) == len(loaded)
+    del loaded, data
+    return held, held_objects, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10000)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        seed(args.rows)
+        measure(load_rows, serialize_rows)  # warm statement caches and to_iso
+        print(f"{args.rows} orders")
+        print(f"{'variant':<9} {'held after load':>16} {'GC objects':>11} {'peak':>10} {'time':>8}")
+        for name, load, serialize in (("entities", load_entities, serialize_entities),
+                                      ("rows", load_rows, serialize_rows)):
+            held, objects, peak, elapsed = measure(load, serialize)
+            print(f"{name:<9} {held / 2**20:>13.1f} MB {objects:>11} {peak / 2**20:>7.1f} MB {elapsed * 1000:>6.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
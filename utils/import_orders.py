@@ -1,42 +1,53 @@
-import pandas as pd
-from app import create_app, db
-from app.models import Order
-
-app = create_app()
-
-def format_date(date):
-    try:
-        if pd.isnull(date):
-            return ''
-        parsed = pd.to_datetime(date, errors='coerce')
-        if pd.isnull(parsed):
-            return str(date).strip()  # fallback to raw string like "mid May"
-        return parsed.strftime('%d.%m.%y')
-    except:
-        return str(date).strip()
-
-
-with app.app_context():
-    df = pd.read_excel("data/orders_2025.xlsx")
-
-    for _, row in df.iterrows():
-        order = Order(
-            user_id=2,  # Replace with actual user ID if needed
-            order_date=format_date(row['order_date']),
-            order_number=row['order_number'],
-            product_name=row['product_name'],
-            buyer=row['buyer'],
-            responsible=row['responsible'],
-            quantity=row['quantity'],
-            required_delivery=row['required_delivery'],
-            terms_of_delivery=row['terms_of_delivery'],
-            payment_date=format_date(row['payment_date']),
-            etd=format_date(row['etd']),
-            eta=format_date(row['eta']),
-            ata=format_date(row['ata']),
-            transit_status=row['transit_status'],
-            transport=row['transport']
-        )
-        db.session.add(order)
-    db.session.commit()
-    print("✅ Orders imported successfully from data/orders_2025.xlsx.")
+# import_orders.py — bulk-load orders from .xlsx / .csv into the Order table
+# Run:  python -m utils.import_orders --user 2                      (data/orders_2025.xlsx)
+#       python -m utils.import_orders data/orders.csv --user alice --chunk-size 5000
+#       python -m utils.import_orders data/orders_2025.xlsx --user 2 --dry-run
+#       python -m utils.import_orders data/orders_2025.xlsx --user 2 --upsert   (re-runnable)
+
+import argparse
+import sys
+
+from app import create_app
+from app.models import User
+from app.utils.order_import import import_orders
+
+
+def resolve_user(value: str) -> User:
+    """Accept a numeric user id or a username."""
+    user = User.query.get(int(value)) if value.isdigit() else None
+    if user is None:
+        user = User.query.filter_by(username=value).first()
+    if user is None:
+        raise SystemExit(f"❌ User not found: {value}")
+    return user
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-import orders from an .xlsx or .csv file.")
+    parser.add_argument("path", nargs="?", default="data/orders_2025.xlsx", help="Source file (.xlsx or .csv).")
+    parser.add_argument("--user", required=True, help="Target user id or username (owner of the orders).")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Rows per INSERT batch / transaction.")
+    parser.add_argument("--dry-run", action="store_true", help="Validate and report without writing.")
+    parser.add_argument("--upsert", action="store_true",
+                        help="Match existing orders by order_number; update changed rows, skip unchanged.")
+    parser.add_argument("--show-rejected", type=int, default=20, help="How many rejected rows to print.")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        user = resolve_user(args.user)
+        print(f"📥 Importing {args.path} for user #{user.id} ({user.username})"
+              f"{' [dry run]' if args.dry_run else ''}")
+        report = import_orders(args.path, user.id, chunk_size=args.chunk_size,
+                               dry_run=args.dry_run, upsert=args.upsert)
+
+    print(f"✅ {report.summary()}")
+    for n, reason in report.rejected[:args.show_rejected]:
+        print(f"   ! row {n}: {reason}")
+    if len(report.rejected) > args.show_rejected:
+        print(f"   … {len(report.rejected) - args.show_rejected} more rejected rows")
+    return 1 if report.rejected and not (report.inserted or report.updated or report.unchanged) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+# query_bench.py — per-call cost of the scoped listing query, legacy Model.query chain vs ScopedQuery
+# Run:  python utils/query_bench.py                       (2000 rows, 3000 calls per variant)
+#       python utils/query_bench.py --rows 20000 --calls 5000
+#
+# Builds the app on an in-memory database, seeds warehouse rows for a few
+# users, then runs the /warehouse listing shape (scope, is_archived, search,
+# sort, one page of 25 plus the count) with parameters that change on every
+# call. "legacy" is the Query chain the views used before; "scoped" is
+# app.scoped_query.ScopedQuery. It prints microseconds per call, and the same
+# with a LIMIT 0 page, which leaves mostly the Python side (statement build,
+# cache key, compile lookup, result setup).
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.update({
+    "DATABASE_URL": "sqlite://", "ARCHIVE_DATABASE_URL": "sqlite://", "SECRET_KEY": "bench",
+    "DEMO_MODE": "false", "AUTO_SEED_ON_EMPTY": "false", "USE_SEED_BOOT": "false",
+    "STATUS_RECOMPUTE_DAILY": "false",
+})
+from sqlalchemy import func, or_  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.database import db  # noqa: E402
+from app.models import User, WarehouseStock  # noqa: E402
+from app.scoped_query import ScopedQuery  # noqa: E402
+
+USERS = 5
+SORTS = [WarehouseStock.ata, WarehouseStock.order_number, WarehouseStock.client]
+
+
+def seed(rows):
+    db.session.execute(db.insert(User), [{"id": 1 + u, "username": f"bench-{u}", "role": "user"} for u in range(USERS)])
+    db.session.execute(db.insert(WarehouseStock), [
+        {"user_id": 1 + i % USERS, "order_number": f"PO-{i:07d}", "product_name": f"Item {i % 97}",
+         "quantity": "1", "ata": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}", "notes": f"note {i % 13}",
+         "client": f"Client {i % 31}", "is_archived": i % 10 == 0}
+        for i in range(rows)
+    ])
+    db.session.commit()
+
+
+def legacy(user_id, term, column, desc, limit):
+    query = WarehouseStock.query.filter_by(is_archived=False, user_id=user_id)
+    if term:
+        like = f"%{term}%"
+        query = query.filter(or_(func.lower(WarehouseStock.notes).like(like),
+                                 func.lower(WarehouseStock.client).like(like)))
+    query = query.order_by(column.desc() if desc else column.asc())
+    return query.count(), query.limit(limit).all()
+
+
+def scoped(user_id, term, column, desc, limit):
+    query = ScopedQuery(WarehouseStock, user_id)
+    query.where(lambda s: s.where(WarehouseStock.is_archived.is_(False)))
+    if term:
+        like = f"%{term}%"
+        query.where(lambda s: s.where(or_(func.lower(WarehouseStock.notes).like(like),
+                                          func.lower(WarehouseStock.client).like(like))))
+    if desc:
+        query.order_by(lambda s: s.order_by(column.desc()))
+    else:
+        query.order_by(lambda s: s.order_by(column.asc()))
+    return query.count(), query.page(0, limit)
+
+
+def run(fn, calls, limit):
+    fn(1, "", SORTS[0], True, limit)  # warm the statement caches
+    start = time.perf_counter()
+    for i in range(calls):
+        fn(1 + i % USERS, "note 1" if i % 3 else "", SORTS[i % len(SORTS)], bool(i % 2), limit)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--calls", type=int, default=3000)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        seed(args.rows)
+        print(f"{args.rows} rows, {args.calls} calls per variant")
+        print(f"{'variant':<8} {'page of 25':>12} {'LIMIT 0':>12}")
+        for name, fn in (("legacy", legacy), ("scoped", scoped)):
+            full = run(fn, args.calls, 25)
+            bare = run(fn, args.calls, 0)
+            print(f"{name:<8} {full:>10.0f}us {bare:>10.0f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# sqlite_bench.py — read/write throughput of concurrent processes, default SQLite vs the app's pragma profile
+# Run:  python utils/sqlite_bench.py                      (4 readers, 2 writers, 5 s per profile)
+#       python utils/sqlite_bench.py --readers 8 --writers 4 --seconds 10
+#       python utils/sqlite_bench.py --rows 100000 --dir /tmp
+#
+# Each profile gets a fresh database file with an order-like table. Reader
+# processes run indexed range queries plus a COUNT, while writer processes
+# run short UPDATE transactions, all until the deadline. The script prints
+# operations per second and the number of "database is locked" errors.
+# "default" is what SQLAlchemy used before: rollback journal and the sqlite3
+# module's 5 s timeout. "profile" adds app.sqlite_profile.DEFAULT_PRAGMAS.
+
+import argparse
+import multiprocessing as mp
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app.sqlite_profile import DEFAULT_PRAGMAS, apply_pragmas  # noqa: E402
+
+PROFILES = {"default": {}, "profile": DEFAULT_PRAGMAS}
+
+
+def connect(path, pragmas):
+    conn = sqlite3.connect(path, timeout=5.0)
+    apply_pragmas(conn, pragmas)
+    return conn
+
+
+def seed(path, pragmas, rows):
+    conn = connect(path, pragmas)
+    conn.executescript("""
+        CREATE TABLE orders (
+            id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, order_number TEXT,
+            buyer TEXT, eta TEXT, quantity REAL, transit_status TEXT
+        );
+        CREATE INDEX ix_orders_user ON orders (user_id, eta);
+    """)
+    conn.executemany(
+        "INSERT INTO orders (user_id, order_number, buyer, eta, quantity, transit_status) VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            (i % 20, f"PO-{i:07d}", f"Buyer {i % 300}", f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}",
+             float(i % 50), "en route")
+            for i in range(rows)
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+def reader(path, pragmas, deadline, out):
+    conn = connect(path, pragmas)
+    ops = errors = 0
+    while time.time() < deadline:
+        try:
+            uid = random.randrange(20)
+            conn.execute("SELECT id, order_number, eta FROM orders WHERE user_id = ? ORDER BY eta DESC LIMIT 50",
+                         (uid,)).fetchall()
+            conn.execute("SELECT COUNT(*), SUM(quantity) FROM orders WHERE user_id = ?", (uid,)).fetchone()
+            ops += 1
+        except sqlite3.OperationalError:
+            errors += 1
+    conn.close()
+    out.put(("read", ops, errors))
+
+
+def writer(path, pragmas, deadline, rows, out):
+    conn = connect(path, pragmas)
+    ops = errors = 0
+    while time.time() < deadline:
+        try:
+            with conn:
+                for _ in range(5):
+                    conn.execute("UPDATE orders SET quantity = quantity + 1, transit_status = ? WHERE id = ?",
+                                 (random.choice(("en route", "arrived")), random.randrange(1, rows + 1)))
+            ops += 1
+        except sqlite3.OperationalError:
+            errors += 1
+    conn.close()
+    out.put(("write", ops, errors))
+
+
+def run(name, pragmas, args, workdir):
+    path = os.path.join(workdir, f"bench_{name}.db")
+    seed(path, pragmas, args.rows)
+    out = mp.Queue()
+    deadline = time.time() + 1 + args.seconds  # 1 s for the processes to start
+    procs = [mp.Process(target=reader, args=(path, pragmas, deadline, out)) for _ in range(args.readers)]
+    procs += [mp.Process(target=writer, args=(path, pragmas, deadline, args.rows, out)) for _ in range(args.writers)]
+    for p in procs:
+        p.start()
+    totals = {"read": [0, 0], "write": [0, 0]}
+    for _ in procs:
+        kind, ops, errors = out.get()
+        totals[kind][0] += ops
+        totals[kind][1] += errors
+    for p in procs:
+        p.join()
+    return {kind: (ops / args.seconds, errors) for kind, (ops, errors) in totals.items()}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="SQLite concurrency benchmark: default settings vs the app pragma profile.")
+    ap.add_argument("--readers", type=int, default=4)
+    ap.add_argument("--writers", type=int, default=2)
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--rows", type=int, default=20000)
+    ap.add_argument("--dir", default=None, help="Directory for the scratch databases (default: a temp dir).")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as workdir:
+        print(f"{args.readers} readers, {args.writers} writers (5 updates per transaction), "
+              f"{args.seconds:g} s, {args.rows} rows")
+        print(f"{'profile':<10}{'reads/s':>12}{'read errors':>14}{'write tx/s':>14}{'write errors':>15}")
+        for name, pragmas in PROFILES.items():
+            res = run(name, pragmas, args, workdir)
+            print(f"{name:<10}{res['read'][0]:>12.0f}{res['read'][1]:>14}{res['write'][0]:>14.0f}{res['write'][1]:>15}")
+
+
+if __name__ == "__main__":
+    main()